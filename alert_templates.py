@@ -0,0 +1,147 @@
+import html
+from datetime import datetime
+from functools import lru_cache
+from string import Template
+
+# Alert Templates
+# One renderer for every dispatcher. Templates are compiled once at import,
+# the static shell around the signal sections is pre-rendered per
+# (brand, industries) and cached, and identical signal sections are rendered
+# once. All model output is HTML-escaped before it reaches the email.
+
+SECTION_CACHE_SIZE = 4096
+SHELL_CACHE_SIZE = 256
+
+BRANDS = {
+    # Premium briefing (dispatch_scored_alerts.py, vta_run.py)
+    "aiyoda": {
+        "from": "Aiyoda Intelligence <alerts@aiyoda.app>",
+        "subject": Template("🚨 PRIORITY [$score/10]: $industries Intelligence Alert"),
+        "subject_multi": Template("🚨 PRIORITY [$score/10]: $count Intelligence Alerts ($industries)"),
+        "head": Template("""
+    <div style="background-color: #f4f7f9; padding: 40px 10px; font-family: 'Helvetica Neue', Helvetica, Arial, sans-serif;">
+        <div style="max-width: 600px; margin: 0 auto; background-color: #ffffff; border-radius: 8px; overflow: hidden; box-shadow: 0 4px 12px rgba(0,0,0,0.05); border-top: 6px solid #1a2a40;">
+            <div style="padding: 30px; background-color: #ffffff;">
+                <p style="text-transform: uppercase; letter-spacing: 2px; color: #64748b; font-size: 12px; margin: 0 0 10px 0; font-weight: 700;">
+                    Aiyoda Municipal Intelligence
+                </p>
+                <h1 style="color: #1a2a40; font-size: 24px; margin: 0; font-weight: 800;">
+                    Executive Briefing: $industries
+                </h1>
+            </div>"""),
+        "section": Template("""
+            <div style="background-color: #1a2a40; padding: 20px 30px; color: #ffffff; display: flex;">
+                <div style="background-color: #e2e8f0; color: #1a2a40; border-radius: 4px; padding: 4px 12px; font-weight: 800; font-size: 14px; margin-right: 15px; height: fit-content;">
+                    RELEVANCE: $score/10
+                </div>
+                <div style="font-size: 13px; font-weight: 500; color: #94a3b8; text-transform: uppercase; padding-top: 4px;">
+                    $industry
+                </div>
+            </div>
+            <div style="padding: 30px; color: #334155; line-height: 1.8; font-size: 16px;">
+                <div style="background-color: #f8fafc; border-radius: 6px; padding: 20px; border-left: 4px solid #cbd5e1;">
+                    <strong style="display: block; color: #1e293b; margin-bottom: 8px; font-size: 14px; text-transform: uppercase;">Summary of Impact</strong>
+                    $analysis
+                </div>
+            </div>"""),
+        "tail": Template("""
+            <div style="padding: 0 30px 30px 30px; color: #334155;">
+                <p style="font-size: 14px; color: #64748b;">
+                    <strong>Source Authority:</strong> Vancouver City Records<br>
+                    <strong>Timestamp:</strong> $timestamp
+                </p>
+            </div>
+            <div style="padding: 0 30px 40px 30px; text-align: center;">
+                <a href="https://vancouverwa.portal.civicclerk.com/"
+                   style="background-color: #1a2a40; color: #ffffff; padding: 14px 28px; text-decoration: none; border-radius: 5px; font-weight: 700; font-size: 14px; display: inline-block;">
+                    View Original Document
+                </a>
+            </div>
+            <div style="padding: 20px; background-color: #f8fafc; text-align: center; border-top: 1px solid #e2e8f0;">
+                <p style="font-size: 11px; color: #94a3b8; margin: 0;">
+                    © 2025 Aiyoda Transparency Agent. All rights reserved.<br>
+                    This is a private intelligence briefing for authorized subscribers only.
+                </p>
+            </div>
+        </div>
+    </div>"""),
+    },
+    # Plain briefing (send_alerts.py)
+    "vta": {
+        "from": "VTA Intelligence <alerts@aiyoda.app>",
+        "subject": Template("🚨 ACTION REQUIRED: $industries Update"),
+        "subject_multi": Template("🚨 ACTION REQUIRED: $count $industries Updates"),
+        "head": Template("""
+    <div style="font-family: sans-serif; max-width: 600px; margin: auto; border: 1px solid #eee; border-top: 4px solid #2c3e50; padding: 20px; color: #333;">
+        <h2 style="color: #2c3e50; margin-top: 0;">Vancouver Transparency Agent</h2>
+        <p style="color: #7f8c8d; font-size: 14px; margin-bottom: 20px;">Bespoke Intelligence Briefing for $industries</p>"""),
+        "section": Template("""
+        <div style="background-color: #f9f9f9; padding: 15px; border-radius: 5px; line-height: 1.6; margin-bottom: 15px;">
+            <strong style="color: #2c3e50;">$industry ($score/10)</strong><br>
+            $analysis
+        </div>"""),
+        "tail": Template("""
+        <p style="margin-top: 25px; font-size: 13px; color: #95a5a6;">
+            <em>Source: Vancouver Municipal Portal (CivicClerk)</em>
+        </p>
+        <hr style="border: 0; border-top: 1px solid #eee; margin: 20px 0;">
+        <footer style="font-size: 11px; color: #bdc3c7; text-align: center;">
+            You received this because your Interest Profile matches recent City Council activity.
+            Manage your alerts at <a href="https://aiyoda.app" style="color: #3498db; text-decoration: none;">aiyoda.app</a>
+        </footer>
+    </div>"""),
+    },
+}
+
+
+def _escape(text):
+    return html.escape(str(text)).replace("\n", "<br>")
+
+
+@lru_cache(maxsize=SHELL_CACHE_SIZE)
+def _shell_head(brand: str, industries: str):
+    """Pre-rendered static header for a brand and industry line."""
+    return BRANDS[brand]["head"].substitute(industries=_escape(industries))
+
+
+@lru_cache(maxsize=SECTION_CACHE_SIZE)
+def render_section(brand: str, industry: str, score, analysis: str):
+    return BRANDS[brand]["section"].substitute(
+        industry=_escape(industry), score=_escape(score), analysis=_escape(analysis))
+
+
+def render_alert(brand: str, signals, now=None):
+    """Renders one briefing for `signals` (highest score first). Returns (subject, html)."""
+    t = BRANDS[brand]
+    industries = ", ".join(dict.fromkeys(str(s.get("industry") or "General Intelligence") for s in signals))
+    score = signals[0].get("score", 0)
+
+    head = _shell_head(brand, industries)
+    sections = "".join(
+        render_section(brand, str(s.get("industry") or "General Intelligence"), s.get("score", 0), s.get("analysis", ""))
+        for s in signals
+    )
+    timestamp = (now or datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
+    body = head + sections + t["tail"].substitute(timestamp=timestamp)
+
+    subject_t = t["subject_multi"] if len(signals) > 1 else t["subject"]
+    subject = subject_t.substitute(score=score, count=len(signals), industries=industries)
+    return subject, body
+
+
+def build_email(brand: str, sub_data: dict, jobs):
+    """
+    Resend params for one coalesced briefing (the delivery engine's `build_email`).
+    The timestamp is the batch's, so a resent batch renders byte-for-byte the same.
+    """
+    subject, body = render_alert(brand, [job["signal"] for job in jobs], now=jobs[0].get("batched_at"))
+    return {
+        "from": BRANDS[brand]["from"],
+        "to": [sub_data.get("email")],
+        "subject": subject,
+        "html": body,
+    }
+
+
+def cache_stats():
+    return {"sections": render_section.cache_info(), "shells": _shell_head.cache_info()}
@@ -0,0 +1,36 @@
+import time
+import random
+from alert_templates import render_alert, cache_stats
+
+# Micro-benchmark: renders per second for coalesced briefings.
+#   python bench_alert_templates.py
+
+INDUSTRIES = ["Civil Engineering & Construction", "Roadside Coffee Retail", "Telecom", "Real Estate"]
+ANALYSES = [
+    f"SCORE: {s}\nREASON: Item {i} affects <operations> & permits.\nANALYSIS: " + "Council approved changes. " * 40
+    for i, s in enumerate(range(7, 11))
+]
+
+
+def make_signals(rng, count):
+    signals = [{"industry": rng.choice(INDUSTRIES), "score": rng.randint(7, 10), "analysis": rng.choice(ANALYSES)}
+               for _ in range(count)]
+    return sorted(signals, key=lambda s: s["score"], reverse=True)
+
+
+def bench(brand, iterations=20000):
+    rng = random.Random(7)
+    workload = [make_signals(rng, rng.randint(1, 4)) for _ in range(iterations)]
+    started = time.perf_counter()
+    for signals in workload:
+        render_alert(brand, signals)
+    elapsed = time.perf_counter() - started
+    print(f"   {brand:<7} {iterations / elapsed:>10,.0f} renders/s")
+
+
+if __name__ == "__main__":
+    print("⏱️  Alert template renders per second (1-4 sections per briefing):")
+    for brand in ("aiyoda", "vta"):
+        bench(brand)
+    for name, info in cache_stats().items():
+        print(f"   cache[{name}]: {info.hits} hits / {info.misses} misses")
@@ -0,0 +1,135 @@
+import os
+from datetime import datetime, timedelta
+from google.cloud.firestore_v1.base_query import FieldFilter
+from outbox import increment
+
+# Adaptive Board Cadence
+# Each board has a schedule doc in `board_schedule` with a weekday x hour
+# histogram of when new content was found (seeded from `meeting_records`).
+# Inside a board's usual publication windows (agenda drops, post-meeting
+# minutes) it is checked every MIN_INTERVAL; outside them the interval doubles
+# after every unchanged check, up to MAX_INTERVAL, and resets on a change.
+# A per-portal request budget caps how hard one city's portal is hit.
+
+SCHEDULE_COLLECTION = "board_schedule"
+MIN_INTERVAL_MINUTES = int(os.getenv("VTA_CADENCE_MIN_MINUTES", "30"))
+MAX_INTERVAL_MINUTES = int(os.getenv("VTA_CADENCE_MAX_MINUTES", "1440"))
+WINDOW_HOURS = 2 # A hot window extends this far either side of a historical change
+HOT_SHARE = 0.1 # Share of a board's changes that must fall in a window for it to be hot
+MIN_HISTORY = 3 # Changes needed before windows are trusted
+PORTAL_REQUESTS_PER_HOUR = int(os.getenv("VTA_PORTAL_REQUESTS_PER_HOUR", "12"))
+
+
+def schedule_id(org_id: str, board_key: str):
+    return f"{org_id}__{board_key}"
+
+
+def bucket(when: datetime):
+    return f"{when.weekday()}-{when.hour}"
+
+
+def _naive(value):
+    return value.replace(tzinfo=None) if value else None
+
+
+def is_hot(histogram: dict, when: datetime):
+    """True if `when` falls within WINDOW_HOURS of the hours this board usually publishes."""
+    total = sum(histogram.values())
+    if total < MIN_HISTORY:
+        return False
+    near = sum(histogram.get(bucket(when + timedelta(hours=h)), 0) for h in range(-WINDOW_HOURS, WINDOW_HOURS + 1))
+    return near / total >= HOT_SHARE
+
+
+def next_check(histogram: dict, interval_minutes: int, now: datetime):
+    """`now + interval`, pulled forward to the start of the next hot window if one comes first."""
+    due = now + timedelta(minutes=interval_minutes)
+    hour = now.replace(minute=0, second=0, microsecond=0)
+    while hour < due:
+        hour += timedelta(hours=1)
+        if is_hot(histogram, hour):
+            return min(due, hour)
+    return due
+
+
+class PortalBudget:
+    """
+    Sliding one-hour request budget per portal URL, kept in the lease store
+    (board_leases.lease_store) so all scout workers share it.
+    """
+
+    def __init__(self, store, per_hour=PORTAL_REQUESTS_PER_HOUR):
+        self.store = store
+        self.per_hour = per_hour
+
+    def try_acquire(self, portal: str, cost: int = 1):
+        return self.store.take_budget(portal, cost, self.per_hour)
+
+
+class BoardCadence:
+    """Reads every board schedule once per cycle; queues updates through the outbox."""
+
+    def __init__(self, db, outbox):
+        self.db = db
+        self.outbox = outbox
+        self._schedules = {snap.id: snap.to_dict() for snap in db.collection(SCHEDULE_COLLECTION).stream()}
+
+    def _schedule(self, org_id: str, board_key: str, board_name: str):
+        sid = schedule_id(org_id, board_key)
+        if sid not in self._schedules:
+            # First sight of this board: learn its rhythm from the meetings already on file
+            query = (self.db.collection("meeting_records")
+                     .where(filter=FieldFilter("org_id", "==", org_id))
+                     .where(filter=FieldFilter("board_name", "==", board_name))
+                     .select(["timestamp"]))
+            histogram = {}
+            for snap in query.stream():
+                ts = _naive(snap.to_dict().get("timestamp"))
+                if ts:
+                    histogram[bucket(ts)] = histogram.get(bucket(ts), 0) + 1
+            self._schedules[sid] = {"histogram": histogram, "interval_minutes": MIN_INTERVAL_MINUTES,
+                                    "next_check_at": None, "seeded": True}
+        return self._schedules[sid]
+
+    def is_due(self, org_id: str, board_key: str, board_name: str, now=None):
+        due = _naive(self._schedule(org_id, board_key, board_name).get("next_check_at"))
+        return due is None or due <= (now or datetime.now())
+
+    def overdue_order(self, org_id: str, boards: dict, now=None):
+        """Board keys sorted most-overdue first, so a tight budget goes to the stalest boards."""
+        now = now or datetime.now()
+        def lateness(item):
+            due = _naive(self._schedule(org_id, item[0], item[1]).get("next_check_at"))
+            return (now - due).total_seconds() if due else float("inf")
+        return sorted(boards.items(), key=lateness, reverse=True)
+
+    def record_check(self, org_id: str, board_key: str, board_name: str, changed: bool, now=None):
+        now = now or datetime.now()
+        state = self._schedule(org_id, board_key, board_name)
+        histogram = state.setdefault("histogram", {})
+        if changed:
+            histogram[bucket(now)] = histogram.get(bucket(now), 0) + 1
+            interval = MIN_INTERVAL_MINUTES
+        elif is_hot(histogram, now):
+            interval = MIN_INTERVAL_MINUTES
+        else:
+            interval = min(MAX_INTERVAL_MINUTES, state.get("interval_minutes", MIN_INTERVAL_MINUTES) * 2)
+        state["interval_minutes"] = interval
+        state["next_check_at"] = next_check(histogram, interval, now)
+
+        update = {
+            "org_id": org_id,
+            "board_key": board_key,
+            "interval_minutes": interval,
+            "next_check_at": state["next_check_at"],
+            "last_checked_at": now,
+            "checks": increment(1),
+        }
+        if changed:
+            update["last_changed_at"] = now
+            update["histogram"] = {bucket(now): increment(1)}
+        if state.pop("seeded", False):
+            # Persist the learned history once; later changes are increments on top of it
+            update["histogram"] = dict(histogram)
+        self.outbox.set(SCHEDULE_COLLECTION, schedule_id(org_id, board_key), update, merge=True)
+        return state["next_check_at"]
@@ -0,0 +1,261 @@
+import os
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from firebase_admin import firestore
+from dispatch_queue import default_owner
+
+# Board Leases
+# Lets any number of scout workers share the org/board set. A worker processes
+# a board only while it holds that board's lease:
+#
+#   free/expired -> held (owner, token, expires_at) -> released
+#
+# The holder heartbeats every HEARTBEAT_SECONDS; a worker that dies simply
+# stops renewing and the lease expires. A holder whose heartbeat keeps failing
+# gives the lease up itself once its local expiry passes. Each acquisition
+# bumps a fencing `token`, so a worker whose lease was taken over cannot renew
+# or release it, and the outbox drops writes journaled under an older token.
+#
+# The store also keeps the per-portal request budgets, so every worker draws
+# from the same hourly budget.
+#
+# Backends: Firestore (`board_leases`, `portal_budgets`, for workers on
+# different machines) or SQLite (VTA_LEASE_BACKEND=sqlite, for several
+# processes on one machine).
+
+LEASE_COLLECTION = "board_leases"
+BUDGET_COLLECTION = "portal_budgets"
+BUDGET_WINDOW_SECONDS = 3600
+LEASE_BACKEND = os.getenv("VTA_LEASE_BACKEND", "firestore")
+LEASE_PATH = os.getenv("VTA_LEASE_PATH", "leases.db")
+LEASE_SECONDS = int(os.getenv("VTA_BOARD_LEASE_SECONDS", "600"))
+HEARTBEAT_SECONDS = LEASE_SECONDS // 4
+
+
+def board_lease_id(org_id: str, board_key: str):
+    return f"{org_id}__{board_key}"
+
+
+def portal_budget_id(portal: str):
+    return hashlib.sha256(str(portal).encode()).hexdigest()[:24]
+
+
+def _naive(value):
+    return value.replace(tzinfo=None) if value else None
+
+
+@firestore.transactional
+def _acquire(transaction, ref, owner, now, seconds):
+    snap = ref.get(transaction=transaction)
+    lease = snap.to_dict() if snap.exists else {}
+    expires = _naive(lease.get("expires_at"))
+    if lease.get("owner") and lease["owner"] != owner and expires and expires > now:
+        return None  # Another worker holds a live lease
+    token = lease.get("token", 0) + 1
+    transaction.set(ref, {
+        "owner": owner,
+        "token": token,
+        "acquired_at": now,
+        "heartbeat_at": now,
+        "expires_at": now + timedelta(seconds=seconds),
+    })
+    return token
+
+
+@firestore.transactional
+def _renew(transaction, ref, owner, token, now, seconds):
+    snap = ref.get(transaction=transaction)
+    lease = snap.to_dict() if snap.exists else {}
+    if lease.get("owner") != owner or lease.get("token") != token:
+        return False
+    transaction.update(ref, {"heartbeat_at": now, "expires_at": now + timedelta(seconds=seconds)})
+    return True
+
+
+@firestore.transactional
+def _release(transaction, ref, owner, token, now):
+    snap = ref.get(transaction=transaction)
+    lease = snap.to_dict() if snap.exists else {}
+    if lease.get("owner") != owner or lease.get("token") != token:
+        return False
+    transaction.update(ref, {"owner": None, "expires_at": None, "released_at": now})
+    return True
+
+
+@firestore.transactional
+def _take_budget(transaction, ref, portal, cost, per_hour, now):
+    snap = ref.get(transaction=transaction)
+    recent = [t for t in (snap.to_dict() or {}).get("requests", []) if now - t < BUDGET_WINDOW_SECONDS] if snap.exists else []
+    if len(recent) + cost > per_hour:
+        return False
+    transaction.set(ref, {"portal": portal, "requests": recent + [now] * cost})
+    return True
+
+
+class FirestoreLeaseStore:
+    def __init__(self, db):
+        self.db = db
+
+    def _ref(self, lease_id):
+        return self.db.collection(LEASE_COLLECTION).document(lease_id)
+
+    def acquire(self, lease_id, owner, seconds=LEASE_SECONDS):
+        return _acquire(self.db.transaction(), self._ref(lease_id), owner, datetime.now(), seconds)
+
+    def renew(self, lease_id, owner, token, seconds=LEASE_SECONDS):
+        return _renew(self.db.transaction(), self._ref(lease_id), owner, token, datetime.now(), seconds)
+
+    def release(self, lease_id, owner, token):
+        return _release(self.db.transaction(), self._ref(lease_id), owner, token, datetime.now())
+
+    def current_token(self, lease_id):
+        snap = self._ref(lease_id).get(field_paths=["token"])
+        return (snap.to_dict() or {}).get("token", 0) if snap.exists else 0
+
+    def take_budget(self, portal, cost, per_hour):
+        ref = self.db.collection(BUDGET_COLLECTION).document(portal_budget_id(portal))
+        return _take_budget(self.db.transaction(), ref, str(portal), cost, per_hour, time.time())
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    id TEXT PRIMARY KEY,
+    owner TEXT,
+    token INTEGER NOT NULL DEFAULT 0,
+    expires_at REAL,
+    heartbeat_at REAL
+);
+CREATE TABLE IF NOT EXISTS portal_requests (
+    portal TEXT NOT NULL,
+    at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS portal_requests_portal ON portal_requests (portal, at);
+"""
+
+
+class SQLiteLeaseStore:
+    """Same contract as FirestoreLeaseStore; BEGIN IMMEDIATE serializes competing processes."""
+
+    def __init__(self, path=LEASE_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def _transaction(self, fn):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+                self._conn.execute("COMMIT")
+                return result
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def acquire(self, lease_id, owner, seconds=LEASE_SECONDS):
+        def claim(conn):
+            now = time.time()
+            row = conn.execute("SELECT owner, token, expires_at FROM leases WHERE id = ?", (lease_id,)).fetchone()
+            holder, token, expires = row or (None, 0, None)
+            if holder and holder != owner and expires and expires > now:
+                return None
+            conn.execute(
+                "INSERT INTO leases (id, owner, token, expires_at, heartbeat_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET owner = excluded.owner, token = excluded.token, "
+                "expires_at = excluded.expires_at, heartbeat_at = excluded.heartbeat_at",
+                (lease_id, owner, token + 1, now + seconds, now),
+            )
+            return token + 1
+        return self._transaction(claim)
+
+    def renew(self, lease_id, owner, token, seconds=LEASE_SECONDS):
+        def extend(conn):
+            now = time.time()
+            cur = conn.execute("UPDATE leases SET expires_at = ?, heartbeat_at = ? WHERE id = ? AND owner = ? AND token = ?",
+                               (now + seconds, now, lease_id, owner, token))
+            return cur.rowcount == 1
+        return self._transaction(extend)
+
+    def release(self, lease_id, owner, token):
+        def free(conn):
+            cur = conn.execute("UPDATE leases SET owner = NULL, expires_at = NULL WHERE id = ? AND owner = ? AND token = ?",
+                               (lease_id, owner, token))
+            return cur.rowcount == 1
+        return self._transaction(free)
+
+    def current_token(self, lease_id):
+        with self._lock:
+            row = self._conn.execute("SELECT token FROM leases WHERE id = ?", (lease_id,)).fetchone()
+        return row[0] if row else 0
+
+    def take_budget(self, portal, cost, per_hour):
+        def take(conn):
+            now = time.time()
+            conn.execute("DELETE FROM portal_requests WHERE portal = ? AND at <= ?", (str(portal), now - BUDGET_WINDOW_SECONDS))
+            used = conn.execute("SELECT COUNT(*) FROM portal_requests WHERE portal = ?", (str(portal),)).fetchone()[0]
+            if used + cost > per_hour:
+                return False
+            conn.executemany("INSERT INTO portal_requests (portal, at) VALUES (?, ?)", [(str(portal), now)] * cost)
+            return True
+        return self._transaction(take)
+
+    def close(self):
+        self._conn.close()
+
+
+def lease_store(db, backend=LEASE_BACKEND):
+    return SQLiteLeaseStore() if backend == "sqlite" else FirestoreLeaseStore(db)
+
+
+class BoardLease:
+    """A held lease with a background heartbeat. `lost` is set if it is taken over or runs out."""
+
+    def __init__(self, store, lease_id, owner, token, expires_at):
+        self.store = store
+        self.lease_id = lease_id
+        self.owner = owner
+        self.token = token
+        self.expires_at = expires_at  # time.monotonic() deadline, from before the last successful renewal
+        self.lost = asyncio.Event()
+        self._heartbeat = asyncio.create_task(self._beat())
+
+    async def _beat(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            started = time.monotonic()
+            try:
+                renewed = await asyncio.to_thread(self.store.renew, self.lease_id, self.owner, self.token)
+            except Exception as e:
+                if time.monotonic() >= self.expires_at:
+                    print(f"   ⚠️ [Lease] {self.lease_id} expired while its heartbeat was failing: {e}")
+                    self.lost.set()
+                    return
+                print(f"   ⚠️ [Lease] Heartbeat for {self.lease_id} failed: {e}")
+                continue  # Transient; the lease still has time left
+            if not renewed:
+                print(f"   ⚠️ [Lease] Lost {self.lease_id} to another worker.")
+                self.lost.set()
+                return
+            self.expires_at = started + LEASE_SECONDS
+
+    async def release(self):
+        self._heartbeat.cancel()
+        if not self.lost.is_set():
+            await asyncio.to_thread(self.store.release, self.lease_id, self.owner, self.token)
+
+
+class BoardLeases:
+    def __init__(self, db, owner=None, backend=LEASE_BACKEND):
+        self.store = lease_store(db, backend)
+        self.owner = owner or default_owner()
+
+    async def claim(self, lease_id):
+        """A BoardLease, or None if another worker is on this board."""
+        started = time.monotonic()
+        token = await asyncio.to_thread(self.store.acquire, lease_id, self.owner)
+        return BoardLease(self.store, lease_id, self.owner, token, started + LEASE_SECONDS) if token else None
@@ -0,0 +1,112 @@
+import os
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from metrics import BROWSER_ACTIVE, BROWSER_CAPACITY, BROWSER_PAGES, BROWSER_RESTARTS
+
+# Browser Pool
+# One warm Chromium shared by every job in a long-lived process. Each job gets
+# a fresh, isolated context (cookies, storage) and page, closed when it is
+# done. Chromium leaks memory over long sessions, so the browser is replaced
+# after BROWSER_MAX_PAGES pages or BROWSER_MAX_AGE_MINUTES, once it is idle.
+
+MAX_PAGES = int(os.getenv("VTA_BROWSER_PAGES", "2")) # Concurrent pages
+BROWSER_MAX_PAGES = int(os.getenv("VTA_BROWSER_MAX_PAGES", "200"))
+BROWSER_MAX_AGE_MINUTES = int(os.getenv("VTA_BROWSER_MAX_AGE_MINUTES", "60"))
+
+
+class BrowserPool:
+    def __init__(self, max_pages=MAX_PAGES, headless=True):
+        self.headless = headless
+        self._gate = asyncio.Semaphore(max_pages)
+        self._lock = asyncio.Lock()
+        self._playwright = None
+        self._browser = None
+        self._started = 0.0
+        self._served = 0
+        self._active = 0
+        self.restarts = 0
+        BROWSER_CAPACITY.set(max_pages)
+
+    async def _launch(self):
+        if self._playwright is None:
+            from playwright.async_api import async_playwright # Imported with the first page, not the module
+            self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(headless=self.headless)
+        self._started = time.monotonic()
+        self._served = 0
+
+    def _worn_out(self):
+        age = time.monotonic() - self._started
+        return self._served >= BROWSER_MAX_PAGES or age >= BROWSER_MAX_AGE_MINUTES * 60
+
+    async def _ensure_browser(self):
+        async with self._lock:
+            if self._browser and not self._browser.is_connected():
+                self._browser = None  # Crashed; relaunch below
+                BROWSER_RESTARTS.inc()
+            if self._browser and self._active == 0 and self._worn_out():
+                await self._close_browser()
+                self.restarts += 1
+                BROWSER_RESTARTS.inc()
+            if self._browser is None:
+                await self._launch()
+            return self._browser
+
+    async def _close_browser(self):
+        if self._browser:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+
+    @asynccontextmanager
+    async def page(self, **context_options):
+        """A new page in its own browser context, e.g. `storage_state=` for a saved session."""
+        async with self._gate:
+            browser = await self._ensure_browser()
+            self._active += 1
+            self._served += 1
+            BROWSER_ACTIVE.set(self._active)
+            BROWSER_PAGES.inc()
+            context = await browser.new_context(**context_options)
+            try:
+                yield await context.new_page()
+            finally:
+                self._active -= 1
+                BROWSER_ACTIVE.set(self._active)
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+
+    async def restart(self):
+        """Replaces the browser now if no page is open (used by the memory guard)."""
+        async with self._lock:
+            if self._active == 0:
+                await self._close_browser()
+                self.restarts += 1
+                BROWSER_RESTARTS.inc()
+                return True
+            return False
+
+    async def close(self):
+        async with self._lock:
+            await self._close_browser()
+            if self._playwright:
+                await self._playwright.stop()
+                self._playwright = None
+
+
+@asynccontextmanager
+async def pool_or_new(pool=None):
+    """Yields `pool`, or a private pool closed on exit for standalone runs."""
+    if pool is not None:
+        yield pool
+        return
+    own = BrowserPool()
+    try:
+        yield own
+    finally:
+        await own.close()
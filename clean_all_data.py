@@ -1,11 +1,4 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
-
-# Initialize
-if not firebase_admin._apps:
-    cred = credentials.Certificate("serviceAccount.json")
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
+from vta_core import db
 
 def delete_all_signals():
     """Recursively deletes all documents in the signals collection."""
@@ -1,12 +1,7 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
 from datetime import datetime
-
-# Initialize Firestore
-if not firebase_admin._apps:
-    cred = credentials.Certificate("serviceAccount.json")
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
+from dispatch_queue import enqueue_dispatch
+from dashboard_views import add_to_feed
+from vta_core import db
 
 # This signal is 'unread' and has a score of 10, so it WILL trigger the dispatcher.
 dummy_signal = {
@@ -18,5 +13,8 @@ dummy_signal = {
     "timestamp": datetime.now()
 }
 
-db.collection("signals").add(dummy_signal)
-print("🚀 High-value signal created for Chloe. Ready for dispatch.")
\ No newline at end of file
+_, sig_ref = db.collection("signals").add(dummy_signal)
+enqueue_dispatch(db, sig_ref.id, dummy_signal)
+add_to_feed(db, sig_ref.id, dummy_signal)
+print("🚀 High-value signal created for Chloe. Ready for dispatch.")
+
@@ -0,0 +1,63 @@
+import json
+import time
+import hashlib
+
+# Cycle Journal
+# Checkpoints each board's progress through the production cycle so a run that
+# dies halfway resumes where it stopped:
+#
+#   scraped -> archived -> profile:<id> (one per Watchdog profile) -> bookmarked
+#
+# A board run is identified by the fingerprint it is processing. Checkpoints
+# live in the outbox's SQLite file and are written inside the same
+# transaction as the writes they cover, so a stage is either fully journaled
+# (writes and checkpoint) or not at all. Completed stages keep their results
+# (text hash, Librarian output, Watchdog scores), so resuming never repeats a
+# model call or a signal.
+
+RETAIN_DAYS = 14
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cycle_journal (
+    run_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    data TEXT,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (run_id, stage)
+)
+"""
+
+
+def board_run_id(org_id: str, board_key: str, fingerprint: str):
+    return f"{org_id}__{board_key}__{hashlib.sha256(fingerprint.encode()).hexdigest()[:16]}"
+
+
+class CycleJournal:
+    def __init__(self, outbox):
+        self.outbox = outbox
+        with outbox.transaction() as conn:
+            conn.execute(_SCHEMA)
+
+    def stages(self, run_id: str):
+        """Completed stages of a board run: {stage: data}."""
+        with self.outbox.transaction() as conn:
+            rows = conn.execute("SELECT stage, data FROM cycle_journal WHERE run_id = ?", (run_id,)).fetchall()
+        return {stage: json.loads(data) if data else None for stage, data in rows}
+
+    def mark(self, run_id: str, stage: str, data=None):
+        """Records a completed stage. Call inside `outbox.transaction()` together with the stage's writes."""
+        with self.outbox.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cycle_journal (run_id, stage, data, created_at) VALUES (?, ?, ?, ?)",
+                (run_id, stage, json.dumps(data) if data is not None else None, time.time()),
+            )
+
+    def forget_board(self, lease_id: str):
+        """Drops every run of a board (runs are `<lease_id>__<hash>`), e.g. once its journaled writes were fenced off."""
+        prefix = lease_id + "__"
+        with self.outbox.transaction() as conn:
+            conn.execute("DELETE FROM cycle_journal WHERE substr(run_id, 1, ?) = ?", (len(prefix), prefix))
+
+    def prune(self, days=RETAIN_DAYS):
+        with self.outbox.transaction() as conn:
+            conn.execute("DELETE FROM cycle_journal WHERE created_at < ?", (time.time() - days * 86400,))
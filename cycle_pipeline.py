@@ -0,0 +1,137 @@
+import os
+import time
+import asyncio
+from tracing import span
+from metrics import STAGE_DEPTH, STAGE_ITEMS
+
+# Staged Pipeline
+# A chain of stages joined by bounded queues. Each stage has its own worker
+# pool; a worker takes an item, runs the stage handler and passes whatever the
+# handler emits to the next stage. A full downstream queue blocks the emit, so
+# a fast stage waits for a slow one instead of piling up work (backpressure).
+#
+#   source -> [scout] -> [scrape] -> [analyze] -> [persist] -> [dispatch]
+#
+# Per stage it counts items in and out, errors, queue depth (now and peak),
+# busy time and time spent blocked on the next stage. Every handled item is
+# also a `stage.<name>` tracing span.
+
+QUEUE_SIZE = int(os.getenv("VTA_STAGE_QUEUE", "4"))
+
+
+class Stage:
+    def __init__(self, name: str, handler, workers: int = 1, maxsize: int = QUEUE_SIZE, on_error=None):
+        """
+        `handler(item, emit)` is a coroutine; `await emit(x)` hands x to the next stage.
+        `on_error(item, exc)` (optional coroutine) cleans up after a handler raises.
+        """
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.on_error = on_error
+        self.queue = asyncio.Queue(maxsize)
+        self.downstream = None
+        self._tasks = []
+        self.received = 0
+        self.processed = 0
+        self.emitted = 0
+        self.errors = 0
+        self.peak_depth = 0
+        self.busy = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+
+    @property
+    def depth(self):
+        return self.queue.qsize()
+
+    async def put(self, item):
+        await self.queue.put(item)
+        self.received += 1
+        self.peak_depth = max(self.peak_depth, self.queue.qsize())
+        STAGE_DEPTH.set(self.queue.qsize(), stage=self.name)
+
+    async def emit(self, item):
+        if self.downstream is None:
+            return
+        started = time.perf_counter()
+        await self.downstream.put(item)
+        self.blocked_seconds += time.perf_counter() - started
+        self.emitted += 1
+
+    async def _work(self):
+        while True:
+            item = await self.queue.get()
+            STAGE_DEPTH.set(self.queue.qsize(), stage=self.name)
+            self.busy += 1
+            started = time.perf_counter()
+            try:
+                with span(f"stage.{self.name}"):
+                    await self.handler(item, self.emit)
+                self.processed += 1
+                STAGE_ITEMS.inc(stage=self.name, outcome="ok")
+            except Exception as e:
+                self.errors += 1
+                STAGE_ITEMS.inc(stage=self.name, outcome="error")
+                print(f"   ❌ [{self.name}] {e!r}")
+                if self.on_error:
+                    try:
+                        await self.on_error(item, e)
+                    except Exception as cleanup:
+                        print(f"   ❌ [{self.name}] Cleanup failed: {cleanup!r}")
+            finally:
+                self.busy -= 1
+                self.busy_seconds += time.perf_counter() - started
+                self.queue.task_done()
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def summary(self, elapsed: float):
+        rate = self.processed / elapsed * 60 if elapsed else 0.0
+        return (f"{self.name:<9} in {self.received:>4}  out {self.emitted:>4}  err {self.errors:>3}  "
+                f"depth {self.depth} (peak {self.peak_depth})  {rate:5.1f}/min  "
+                f"busy {self.busy_seconds:6.1f}s  blocked {self.blocked_seconds:6.1f}s  x{self.workers}")
+
+
+class Pipeline:
+    def __init__(self, *stages: Stage):
+        self.stages = stages
+        for upstream, downstream in zip(stages, stages[1:]):
+            upstream.downstream = downstream
+        self.started = None
+        self.elapsed = 0.0
+
+    def stage(self, name: str):
+        return next(s for s in self.stages if s.name == name)
+
+    async def run(self, source):
+        """Feeds every item of `source` (iterable or async iterable) through and waits for all stages to empty."""
+        self.started = time.perf_counter()
+        for stage in self.stages:
+            stage.start()
+        try:
+            if hasattr(source, "__aiter__"):
+                async for item in source:
+                    await self.stages[0].put(item)
+            else:
+                for item in source:
+                    await self.stages[0].put(item)
+            # Each stage emits before marking an item done, so joining in order drains the chain
+            for stage in self.stages:
+                await stage.queue.join()
+        finally:
+            for stage in self.stages:
+                await stage.stop()
+            self.elapsed = time.perf_counter() - self.started
+
+    def report(self):
+        lines = [f"📊 [Pipeline] {self.elapsed:.1f}s"]
+        lines += [f"   {stage.summary(self.elapsed)}" for stage in self.stages]
+        return "\n".join(lines)
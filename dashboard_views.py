@@ -0,0 +1,199 @@
+import re
+from datetime import datetime
+from firebase_admin import firestore
+from outbox import increment, delete_field
+
+# Dashboard Views
+# Pre-computed documents in `dashboard_views`, maintained as each cycle
+# persists its results, so a dashboard page is a single document read:
+#
+#   meetings__<org_id>     latest N meeting cards per board
+#   feed__<subscriber_id>  unread count + top FEED_TOP_N unread signals by score
+#   topics__<YYYY-Www>     Librarian topic histogram for the week
+#
+# Counter updates are journaled under keys derived from the record or signal
+# they count, and the outbox applies Increments exactly once, so replaying the
+# journal never counts anything twice.
+
+VIEWS_COLLECTION = "dashboard_views"
+LATEST_MEETINGS = 10
+FEED_TOP_N = 20
+EXCERPT_CHARS = 280
+
+
+def meetings_view_id(org_id: str):
+    return f"meetings__{org_id}"
+
+
+def feed_view_id(subscriber_id: str):
+    return f"feed__{subscriber_id}"
+
+
+def topics_view_id(when: datetime):
+    return f"topics__{when.strftime('%G-W%V')}"
+
+
+def topic_key(topic: str):
+    return re.sub(r'\W+', '_', topic.strip().lower()).strip('_') or "other"
+
+
+class DashboardViews:
+    """Queues incremental view updates alongside the cycle's own writes."""
+
+    def __init__(self, db, outbox):
+        self.db = db
+        self.outbox = outbox
+        self._meetings = {}  # org_id -> {board_key: [cards]}, read once per cycle
+        self._feeds = {}  # subscriber_id -> {signal_id: {score, timestamp}}, read once per cycle
+
+    def _meeting_boards(self, org_id: str):
+        if org_id not in self._meetings:
+            snap = self.db.collection(VIEWS_COLLECTION).document(meetings_view_id(org_id)).get()
+            self._meetings[org_id] = (snap.to_dict() or {}).get("boards", {}) if snap.exists else {}
+        return self._meetings[org_id]
+
+    def _feed(self, subscriber_id: str):
+        if subscriber_id not in self._feeds:
+            snap = self.db.collection(VIEWS_COLLECTION).document(feed_view_id(subscriber_id)).get()
+            top = (snap.to_dict() or {}).get("top_signals", {}) if snap.exists else {}
+            self._feeds[subscriber_id] = {sid: _rank_fields(e) for sid, e in top.items()}
+        return self._feeds[subscriber_id]
+
+    def prefetch_meeting(self, org_id: str):
+        """Loads what `record_meeting` reads, so it can run inside an outbox transaction without I/O."""
+        self._meeting_boards(org_id)
+
+    def prefetch_signal(self, signal: dict):
+        """Loads what `record_signal` reads, so it can run inside an outbox transaction without I/O."""
+        if signal.get("status") == "unread":
+            self._feed(signal["subscriber_id"])
+
+    def record_meeting(self, org_id: str, board_key: str, record_id: str, record: dict):
+        boards = self._meeting_boards(org_id)
+        card = {
+            "record_id": record_id,
+            "board_name": record.get("board_name"),
+            "timestamp": record.get("timestamp"),
+            "summary": record.get("summary"),
+            "topics": record.get("topics") or [],
+            "keywords": record.get("keywords") or [],
+            "score": record.get("score", 0),
+            "analysis": record.get("analysis", ""),
+        }
+        cards = [c for c in boards.get(board_key, []) if c.get("record_id") != record_id]
+        boards[board_key] = ([card] + cards)[:LATEST_MEETINGS]
+
+        self.outbox.set(VIEWS_COLLECTION, meetings_view_id(org_id), {
+            "org_id": org_id,
+            "boards": {board_key: boards[board_key]},
+            "updated_at": datetime.now(),
+        }, merge=True)
+
+        topics = record.get("topics") or []
+        if topics:
+            when = record.get("timestamp") or datetime.now()
+            self.outbox.set(VIEWS_COLLECTION, topics_view_id(when), {
+                "week": when.strftime('%G-W%V'),
+                "counts": {topic_key(str(t)): increment(1) for t in topics},
+                "labels": {topic_key(str(t)): str(t) for t in topics},
+                "updated_at": datetime.now(),
+            }, merge=True, key=f"topics__{record_id}")
+
+    def record_signal(self, signal_id: str, signal: dict, board_name: str = None):
+        if signal.get("status") != "unread":
+            return
+        evicted = _push_feed(self._feed(signal["subscriber_id"]), signal_id, signal)
+        self.outbox.set(VIEWS_COLLECTION, feed_view_id(signal["subscriber_id"]),
+                        _feed_update(signal_id, signal, board_name, increment(1), evicted, delete_field()),
+                        merge=True, key=f"feed__{signal_id}")
+
+
+def _rank_fields(entry: dict):
+    return {"score": entry.get("score", 0), "timestamp": entry.get("timestamp")}
+
+
+def _rank(item):
+    ts = item[1].get("timestamp")
+    return item[1].get("score", 0), ts.timestamp() if ts else 0
+
+
+def _push_feed(top: dict, signal_id: str, signal: dict):
+    """
+    Adds the signal to `top` ({signal_id: rank fields}) and trims it to the
+    FEED_TOP_N best by score, newest first on ties. Returns the evicted IDs,
+    which include `signal_id` if it did not make the cut.
+    """
+    top[signal_id] = _rank_fields(signal)
+    ranked = sorted(top.items(), key=_rank, reverse=True)
+    evicted = [sid for sid, _ in ranked[FEED_TOP_N:]]
+    for sid in evicted:
+        del top[sid]
+    return evicted
+
+
+def _feed_update(signal_id: str, signal: dict, board_name, unread_delta, evicted, delete):
+    top_signals = {sid: delete for sid in evicted if sid != signal_id}
+    if signal_id not in evicted:
+        top_signals[signal_id] = {
+            "score": signal.get("score", 0),
+            "industry": signal.get("industry"),
+            "board_name": board_name,
+            "related_meeting_id": signal.get("related_meeting_id"),
+            "excerpt": signal.get("analysis", "")[:EXCERPT_CHARS],
+            "timestamp": signal.get("timestamp"),
+        }
+    return {
+        "subscriber_id": signal["subscriber_id"],
+        "unread_count": unread_delta,
+        "top_signals": top_signals,
+        "updated_at": datetime.now(),
+    }
+
+
+@firestore.transactional
+def _add_to_feed(transaction, ref, signal_id, signal, board_name):
+    snap = ref.get(transaction=transaction)
+    top = (snap.to_dict() or {}).get("top_signals", {}) if snap.exists else {}
+    evicted = _push_feed({sid: _rank_fields(e) for sid, e in top.items()}, signal_id, signal)
+    transaction.set(ref, _feed_update(signal_id, signal, board_name, firestore.Increment(1),
+                                      evicted, firestore.DELETE_FIELD), merge=True)
+
+
+def add_to_feed(db, signal_id: str, signal: dict, board_name: str = None):
+    """Direct-write variant of `DashboardViews.record_signal` for scripts without an outbox."""
+    if signal.get("status") != "unread":
+        return
+    ref = db.collection(VIEWS_COLLECTION).document(feed_view_id(signal["subscriber_id"]))
+    _add_to_feed(db.transaction(), ref, signal_id, signal, board_name)
+
+
+@firestore.transactional
+def _refresh_meeting_card(transaction, ref, record_id, fields):
+    snap = ref.get(transaction=transaction)
+    boards = (snap.to_dict() or {}).get("boards", {}) if snap.exists else {}
+    for board_key, cards in boards.items():
+        if any(c.get("record_id") == record_id for c in cards):
+            cards = [{**c, **fields} if c.get("record_id") == record_id else c for c in cards]
+            transaction.set(ref, {"boards": {board_key: cards}, "updated_at": datetime.now()}, merge=True)
+            return True
+    return False
+
+
+def refresh_meeting_card(db, org_id: str, record_id: str, fields: dict):
+    """
+    Direct-write counterpart of `DashboardViews.record_meeting` for rewriting a
+    record that is already archived: updates its card in place, wherever it
+    sits, and leaves the topic histogram alone. Returns False if the card has
+    already dropped out of the latest LATEST_MEETINGS.
+    """
+    ref = db.collection(VIEWS_COLLECTION).document(meetings_view_id(org_id))
+    return _refresh_meeting_card(db.transaction(), ref, record_id, fields)
+
+
+def feed_clear_update(signal_id: str):
+    """Merge-set payload that removes a delivered signal from its subscriber's feed."""
+    return {
+        "unread_count": firestore.Increment(-1),
+        "top_signals": {signal_id: firestore.DELETE_FIELD},
+        "updated_at": datetime.now(),
+    }
@@ -0,0 +1,154 @@
+import os
+import asyncio
+from near_dupe import minhash, similarity
+
+# Digest Map-Reduce
+# Condenses a week of signals into digest notes that fit one model call:
+#
+#   0. SELECT  the best MAX_ITEMS_PER_GROUP signals of each (industry, board)
+#              group; only those have their analysis text loaded
+#   1. DEDUPE  near-identical write-ups (one agenda item scored for several
+#              profiles) collapse to the highest-scoring copy
+#   2. MAP     each (industry, board) group is packed into prompts under the
+#              per-call token budget and summarized in parallel
+#   3. REDUCE  notes are re-packed and summarized again until they fit
+#
+# The final synthesis into the newsletter template happens in the writer.
+# Every call is recorded per stage in a TokenLedger.
+
+CALL_TOKEN_BUDGET = int(os.getenv("VTA_DIGEST_CALL_TOKENS", "12000")) # Input tokens per call
+CHARS_PER_TOKEN = 4 # Rough estimate for English prose
+MAP_CONCURRENCY = int(os.getenv("VTA_DIGEST_CONCURRENCY", "4"))
+DUPLICATE_SIMILARITY = 0.7
+MAX_REDUCE_LEVELS = 4
+MAX_ITEMS_PER_GROUP = int(os.getenv("VTA_DIGEST_ITEMS_PER_GROUP", "25"))
+
+MAP_PROMPT = """
+You are condensing municipal intelligence signals for a weekly newsletter.
+Industry: {industry}. Board: {board}.
+Summarize the items below into at most 6 bullet points. Keep numbers, dates,
+project names and locations. Drop anything repeated. Plain text only.
+
+ITEMS:
+{items}
+"""
+
+REDUCE_PROMPT = """
+Merge these weekly digest notes into a shorter set of notes. Keep each
+TOPIC/BOARD heading, merge overlapping points, keep numbers, dates and names.
+Plain text only.
+
+NOTES:
+{items}
+"""
+
+
+def estimate_tokens(text: str):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class TokenLedger:
+    """Per-stage call and token counts. Uses the provider's usage metadata when present."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def record(self, stage: str, prompt: str, response):
+        usage = getattr(response, "usage_metadata", None)
+        tokens_in = getattr(usage, "prompt_token_count", None) or estimate_tokens(prompt)
+        tokens_out = getattr(usage, "candidates_token_count", None) or estimate_tokens(response.text or "")
+        calls, total_in, total_out = self.stages.get(stage, (0, 0, 0))
+        self.stages[stage] = (calls + 1, total_in + tokens_in, total_out + tokens_out)
+
+    def report(self):
+        lines = [f"   {stage:<8} {calls:>3} calls  {tokens_in:>8} in  {tokens_out:>7} out"
+                 for stage, (calls, tokens_in, tokens_out) in self.stages.items()]
+        return "🧮 Digest tokens by stage:\n" + "\n".join(lines)
+
+
+def signal_line(record):
+    when = record.timestamp.strftime('%Y-%m-%d') if record.timestamp else "?"
+    return f"[{when}] SCORE {record.score}: {' '.join(str(record.analysis or '').split())}"
+
+
+def dedupe(records):
+    """Drops records whose analysis nearly duplicates a higher-scoring one in the same industry."""
+    kept = []
+    for record in sorted(records, key=lambda r: r.score, reverse=True):
+        sig = minhash(str(record.analysis or ""))
+        if any(k[0] == record.industry and similarity(sig, k[1]) >= DUPLICATE_SIMILARITY for k in kept):
+            continue
+        kept.append((record.industry, sig, record))
+    return [k[2] for k in kept]
+
+
+def group_records(records):
+    groups = {}
+    for record in records:
+        groups.setdefault((record.industry or "General", record.board or "Unknown Board"), []).append(record)
+    return groups
+
+
+def select_top(records, per_group=MAX_ITEMS_PER_GROUP):
+    """The highest-scoring records of each (industry, board) group: the ones that can make the digest."""
+    chosen = []
+    for group in group_records(records).values():
+        chosen += sorted(group, key=lambda r: r.score, reverse=True)[:per_group]
+    return chosen
+
+
+def pack(lines, budget=CALL_TOKEN_BUDGET):
+    """Splits `lines` into chunks whose estimated size stays under `budget` tokens."""
+    max_chars = budget * CHARS_PER_TOKEN
+    chunks, current, size = [], [], 0
+    for line in lines:
+        line = line[:max_chars]
+        if current and size + len(line) > max_chars:
+            chunks.append(current)
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def _call(generate, ledger, stage, prompt, gate):
+    async with gate:
+        response = await asyncio.to_thread(generate, prompt)
+    ledger.record(stage, prompt, response)
+    return (response.text or "").strip()
+
+
+async def condense_signals(records, generate, ledger, budget=CALL_TOKEN_BUDGET):
+    """
+    Map-reduces `records` (signal_records.SignalRecord, analysis loaded) into
+    digest notes of at most `budget` tokens. `generate(prompt)` is a blocking
+    model call returning a response with `.text`.
+    """
+    gate = asyncio.Semaphore(MAP_CONCURRENCY)
+    unique = dedupe(records)
+    print(f"🧹 [Digest] {len(records)} signals, {len(unique)} after de-duplication.")
+
+    # Leave room in each call for the instructions themselves
+    item_budget = budget - estimate_tokens(MAP_PROMPT)
+    calls, headings = [], []
+    for (industry, board), group in group_records(unique).items():
+        for chunk in pack([signal_line(r) for r in group], item_budget):
+            prompt = MAP_PROMPT.format(industry=industry, board=board, items="\n".join(chunk))
+            calls.append(_call(generate, ledger, "map", prompt, gate))
+            headings.append(f"TOPIC: {industry} | BOARD: {board}")
+    summaries = await asyncio.gather(*calls)
+    notes = [f"{heading}\n{summary}" for heading, summary in zip(headings, summaries)]
+
+    level = 0
+    while estimate_tokens("\n---\n".join(notes)) > budget and level < MAX_REDUCE_LEVELS:
+        level += 1
+        chunks = pack(notes, budget - estimate_tokens(REDUCE_PROMPT))
+        notes = list(await asyncio.gather(*(
+            _call(generate, ledger, f"reduce{level}", REDUCE_PROMPT.format(items="\n---\n".join(chunk)), gate)
+            for chunk in chunks
+        )))
+
+    text = "\n---\n".join(notes)
+    return text[:budget * CHARS_PER_TOKEN]
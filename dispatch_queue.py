@@ -0,0 +1,250 @@
+import os
+import socket
+import random
+from datetime import datetime, timedelta
+from firebase_admin import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+from retention import expire_at
+
+# Dispatch Queue
+# Every alert-worthy signal gets a small companion doc in `dispatch_queue`
+# (same ID as the signal). Dispatchers lease pages of these instead of
+# scanning the whole `signals` history.
+#
+#   pending -> leased -> sent
+#                     -> failed -> (next_attempt_at passes) -> leased ...
+#                     -> dead     (MAX_ATTEMPTS reached, or unrecoverable)
+#
+# A failed entry is retried with exponential backoff; after MAX_ATTEMPTS it is
+# parked as `dead` for a human to look at. A lease that is never resolved
+# (crashed dispatcher) expires and the entry becomes claimable again.
+#
+# The first time entries are sent they are grouped into a batch
+# (`dispatch_batches/<batch_id>`, with the entries stamped `batch_id`) that
+# records which briefings went into one provider request. From then on the
+# batch is the unit of leasing and retry: claiming any of its entries claims
+# the batch and all of its entries, and they succeed or fail together, so a
+# retry resends the same request under the same idempotency key.
+#
+# Only unread signals scoring DISPATCH_MIN_SCORE or more are queued, so every
+# dispatcher (send_alerts included, which used to mail every unread signal)
+# sends only those. Lower-scoring unread signals stay visible in the app.
+
+QUEUE_COLLECTION = "dispatch_queue"
+BATCH_COLLECTION = "dispatch_batches"
+DISPATCH_MIN_SCORE = 7
+LEASE_SECONDS = 300
+PAGE_SIZE = 50
+MAX_ATTEMPTS = int(os.getenv("VTA_DISPATCH_MAX_ATTEMPTS", "5"))
+BACKOFF_BASE_SECONDS = 60
+BACKOFF_MAX_SECONDS = 6 * 3600
+
+
+def default_owner():
+    """Identifies this dispatcher instance in lease records."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def build_queue_entry(signal_id: str, signal: dict):
+    """The compact queue payload for a freshly created signal."""
+    return {
+        "signal_id": signal_id,
+        "subscriber_id": signal.get("subscriber_id"),
+        "industry": signal.get("industry"),
+        "score": signal.get("score", 0),
+        "status": "pending",
+        "created_at": datetime.now(),
+        "attempts": 0,
+        "next_attempt_at": None,
+        "lease_owner": None,
+        "lease_expires_at": None,
+        "batch_id": None,
+    }
+
+
+def new_batch(briefing_ids, owner, lease_expires_at, attempts=0, created_at=None):
+    """A batch doc for one provider request: `briefing_ids` lists each briefing's entry IDs, in send order."""
+    return {
+        "briefings": [{"entries": list(ids)} for ids in briefing_ids],
+        "status": "leased",
+        "created_at": created_at or datetime.now(),
+        "attempts": attempts,
+        "next_attempt_at": None,
+        "lease_owner": owner,
+        "lease_expires_at": lease_expires_at,
+    }
+
+
+def batch_entry_ids(batch: dict):
+    return [entry_id for briefing in batch.get("briefings", []) for entry_id in briefing["entries"]]
+
+
+def should_enqueue(signal: dict):
+    return signal.get("status") == "unread" and signal.get("score", 0) >= DISPATCH_MIN_SCORE
+
+
+def enqueue_dispatch(db, signal_id: str, signal: dict):
+    """Adds a pending entry for the signal if it is alert-worthy."""
+    if not should_enqueue(signal):
+        return False
+    db.collection(QUEUE_COLLECTION).document(signal_id).set(build_queue_entry(signal_id, signal))
+    return True
+
+
+def _is_due(moment, now):
+    return moment is None or moment.replace(tzinfo=None) <= now
+
+
+def is_claimable(entry: dict, now):
+    status = entry.get("status")
+    if status == "pending":
+        return True
+    if status == "leased":
+        return _is_due(entry.get("lease_expires_at"), now) # Abandoned by a dead dispatcher
+    if status == "failed":
+        return _is_due(entry.get("next_attempt_at"), now) # Backoff elapsed
+    return False
+
+
+def backoff_seconds(attempts: int):
+    """Exponential backoff with jitter: 1m, 2m, 4m, ... capped at 6h."""
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** max(0, attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def lease_update(owner, expires_at):
+    return {"status": "leased", "lease_owner": owner, "lease_expires_at": expires_at}
+
+
+@firestore.transactional
+def _claim(transaction, ref, owner, now, lease_seconds):
+    snap = ref.get(transaction=transaction)
+    if not snap.exists:
+        return None
+    entry = snap.to_dict()
+    if entry.get("batch_id") or not is_claimable(entry, now):
+        return None  # Batched (claimed through its batch), held by someone else, resolved or backing off
+
+    transaction.update(ref, lease_update(owner, now + timedelta(seconds=lease_seconds)))
+    entry["id"] = snap.id
+    return entry
+
+
+@firestore.transactional
+def _claim_batch(transaction, ref, owner, now, lease_seconds):
+    snap = ref.get(transaction=transaction)
+    if not snap.exists or not is_claimable(snap.to_dict(), now):
+        return None
+    transaction.update(ref, lease_update(owner, now + timedelta(seconds=lease_seconds)))
+    return snap.to_dict()
+
+
+def lease_batch(db, batch_id: str, owner, now, lease_seconds=LEASE_SECONDS):
+    """
+    Claims a batch and every entry still waiting in it. The batch doc is the
+    lock: entries carrying a `batch_id` are never claimed on their own.
+    """
+    batch = _claim_batch(db.transaction(), db.collection(BATCH_COLLECTION).document(batch_id), owner, now, lease_seconds)
+    if batch is None:
+        return []
+    update = lease_update(owner, now + timedelta(seconds=lease_seconds))
+    refs = [db.collection(QUEUE_COLLECTION).document(entry_id) for entry_id in batch_entry_ids(batch)]
+    writes = db.batch()
+    entries = []
+    for snap in db.get_all(refs):
+        entry = snap.to_dict() if snap.exists else None
+        if entry and entry.get("batch_id") == batch_id and entry.get("status") in ("failed", "leased"):
+            writes.update(snap.reference, update)
+            entries.append({**entry, "id": snap.id})
+    writes.commit()
+    return entries
+
+
+def _due(queue, status, field, now, limit):
+    """
+    Up to `limit` entries in `status` whose `field` time has passed.
+    Needs the composite index (status ASC, <field> ASC) on dispatch_queue.
+    """
+    scan = (queue.where(filter=FieldFilter("status", "==", status))
+            .where(filter=FieldFilter(field, "<=", now))
+            .order_by(field)
+            .limit(limit))
+    return list(scan.select(["status", "lease_expires_at", "next_attempt_at", "batch_id"]).stream())
+
+
+def lease_pending(db, owner=None, page_size=PAGE_SIZE, lease_seconds=LEASE_SECONDS):
+    """
+    Claims up to `page_size` queue entries for this owner, plus the rest of
+    any batch one of them belongs to. Each claim is a transaction (on the
+    entry, or on its batch), so concurrent dispatchers never get the same entry.
+    """
+    owner = owner or default_owner()
+    now = datetime.now()
+    queue = db.collection(QUEUE_COLLECTION)
+
+    candidates = list(queue.where(filter=FieldFilter("status", "==", "pending")).limit(page_size).stream())
+    # Then retries whose backoff has elapsed, oldest first
+    if len(candidates) < page_size:
+        candidates += _due(queue, "failed", "next_attempt_at", now, page_size - len(candidates))
+    # And leases abandoned by dead dispatchers
+    if len(candidates) < page_size:
+        candidates += _due(queue, "leased", "lease_expires_at", now, page_size - len(candidates))
+
+    leased, batch_ids = [], []
+    for snap in candidates:
+        batch_id = snap.to_dict().get("batch_id")
+        if batch_id:
+            if batch_id not in batch_ids:
+                batch_ids.append(batch_id)
+            continue
+        entry = _claim(db.transaction(), snap.reference, owner, now, lease_seconds)
+        if entry:
+            leased.append(entry)
+    for batch_id in batch_ids:
+        leased += lease_batch(db, batch_id, owner, now, lease_seconds)
+    return leased
+
+
+def iter_leased_pages(db, owner=None, page_size=PAGE_SIZE, lease_seconds=LEASE_SECONDS):
+    """Yields leased pages until the queue is drained."""
+    owner = owner or default_owner()
+    while True:
+        page = lease_pending(db, owner, page_size, lease_seconds)
+        if not page:
+            return
+        yield page
+
+
+def sent_update():
+    return {
+        "status": "sent",
+        "sent_at": datetime.now(),
+        "expire_at": expire_at(QUEUE_COLLECTION, "sent"),
+        "lease_owner": None,
+        "lease_expires_at": None,
+    }
+
+
+def failed_update(entry: dict, error, permanent=False):
+    """Records a failed attempt: schedules a retry, or dead-letters the entry."""
+    attempts = entry.get("attempts", 0) + 1
+    dead = permanent or attempts >= MAX_ATTEMPTS
+    status = "dead" if dead else "failed"
+    return {
+        "status": status,
+        "attempts": attempts,
+        "error": str(error)[:500],
+        "failed_at": datetime.now(),
+        "next_attempt_at": None if dead else datetime.now() + timedelta(seconds=backoff_seconds(attempts)),
+        "expire_at": expire_at(QUEUE_COLLECTION, status),
+        "lease_owner": None,
+        "lease_expires_at": None,
+    }
+
+
+def mark_sent(db, entry_id: str):
+    db.collection(QUEUE_COLLECTION).document(entry_id).update(sent_update())
+
+
+def mark_failed(db, entry: dict, error, permanent=False):
+    db.collection(QUEUE_COLLECTION).document(entry["id"]).update(failed_update(entry, error, permanent))
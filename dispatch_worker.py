@@ -0,0 +1,61 @@
+import asyncio
+from datetime import datetime
+from google.cloud.firestore_v1.base_query import FieldFilter
+from dispatch_queue import QUEUE_COLLECTION
+from email_delivery import run_dispatch
+from alert_templates import build_email
+import metrics
+from vta_core import db
+
+# Real-Time Dispatch Worker
+# Long-running process that delivers high-score alerts seconds after the
+# scout's outbox flushes them into `dispatch_queue`, instead of waiting for
+# the end of the cycle. It listens to pending queue entries with on_snapshot
+# and falls back to a periodic poll. Claims go through the same lease
+# transactions as the batch dispatchers, so both can run side by side.
+#
+#   python dispatch_worker.py
+
+# 1. SETUP
+DEBOUNCE_SECONDS = 3 # Let a burst from one meeting land so it coalesces into one briefing
+POLL_SECONDS = 60 # Safety net if the listener drops or misses a change
+
+def build_briefing(sub_data, jobs):
+    return build_email("aiyoda", sub_data, jobs)
+
+
+async def run_worker():
+    print(f"👂 [{datetime.now().strftime('%H:%M:%S')}] Dispatch worker listening for pending alerts...")
+    metrics.serve() # Only if VTA_METRICS_PORT is set
+    loop = asyncio.get_running_loop()
+    wake = asyncio.Event()
+
+    def on_pending(snapshots, changes, read_time):
+        # Runs on the listener's thread
+        if any(change.type.name == "ADDED" for change in changes):
+            loop.call_soon_threadsafe(wake.set)
+
+    pending = db.collection(QUEUE_COLLECTION).where(filter=FieldFilter("status", "==", "pending"))
+    watch = pending.on_snapshot(on_pending)
+
+    try:
+        while True:
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=POLL_SECONDS)
+                await asyncio.sleep(DEBOUNCE_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            wake.clear()
+
+            try:
+                stats = await run_dispatch(db, build_briefing)
+                if stats.requests or stats.dead:
+                    print(f"   📬 [{datetime.now().strftime('%H:%M:%S')}] {stats.summary()}")
+            except Exception as e:
+                print(f"   ❌ Worker pass failed: {e}")
+    finally:
+        watch.unsubscribe()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_worker())
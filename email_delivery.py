@@ -0,0 +1,420 @@
+import os
+import time
+import asyncio
+import hashlib
+import itertools
+from datetime import datetime, timedelta
+from dispatch_queue import (iter_leased_pages, sent_update, failed_update, lease_update, new_batch, batch_entry_ids,
+                            default_owner, QUEUE_COLLECTION, BATCH_COLLECTION, LEASE_SECONDS)
+from retention import expire_at
+from dashboard_views import VIEWS_COLLECTION, feed_view_id, feed_clear_update
+from fair_scheduler import FairScheduler, tier_of
+from tracing import span
+from vta_core import email as resend # The configured `resend` module, imported on first send
+from metrics import EMAILS, EMAIL_SECONDS, DISPATCH_ENTRIES
+
+# Delivery Engine
+# Shared by every dispatcher. Leased queue entries are loaded with batched
+# reads, coalesced into one briefing per subscriber, rendered by the
+# dispatcher's `build_email`, sent through Resend's batch endpoint (up to 100
+# emails per request) with bounded concurrency and a token-bucket rate limit,
+# and their state changes are committed in bulk.
+#
+# Before a batch is first sent its composition is recorded (see the batches in
+# dispatch_queue.py) and its idempotency key is derived from it. A retry, in
+# this run or a later one, by this dispatcher or another, resends the same
+# briefings in the same request under the same key, rendered with the batch's
+# timestamp, so a batch that was delivered but timed out is not delivered
+# twice. Throttled batches are retried in-run with backoff; other failures go
+# back to the queue, which reschedules the whole batch.
+#
+# Entries are leased for LEASE_SECONDS while a round is leased and loaded;
+# just before sending, the round's leases are extended to cover every send
+# (see round_lease_seconds). A round that took too long to assemble is not
+# sent; its leases run out and the entries are picked up again.
+
+BATCH_SIZE = 100 # Resend batch endpoint limit
+PAGE_SIZE = BATCH_SIZE # Queue entries leased per page
+MAX_CONCURRENCY = int(os.getenv("VTA_EMAIL_CONCURRENCY", "4"))
+REQUESTS_PER_SECOND = float(os.getenv("VTA_EMAIL_RPS", "2")) # Resend default rate limit
+WRITE_BATCH_OPS = 450 # Firestore caps a write batch at 500 operations
+COALESCE_WINDOW_MINUTES = int(os.getenv("VTA_COALESCE_WINDOW_MINUTES", "360")) # One scout cycle
+MAX_SECTIONS = 10 # Signals per briefing
+THROTTLE_RETRIES = 4 # In-run retries of a throttled send before handing it back to the queue
+THROTTLE_BACKOFF_SECONDS = 2
+LEASE_MARGIN_SECONDS = 60 # Leases must have this long left when a round's sends start
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursting up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class DispatchStats:
+    """Per-run delivery counters. Signal counts, except `emails` and `requests`."""
+
+    FIELDS = ("sent", "skipped", "retrying", "dead", "emails", "requests", "throttled")
+
+    def __init__(self):
+        for name in self.FIELDS:
+            setattr(self, name, 0)
+        self.by_tier = {}
+        self.started = time.monotonic()
+
+    def summary(self):
+        elapsed = time.monotonic() - self.started
+        tiers = "".join(f", {tier}: {n}" for tier, n in sorted(self.by_tier.items()))
+        return (f"{self.sent} sent in {self.emails} emails, {self.skipped} skipped, "
+                f"{self.retrying} scheduled for retry, {self.dead} dead-lettered "
+                f"({self.requests} requests, {self.throttled} throttled{tiers}, {elapsed:.1f}s)")
+
+
+def batch_key(briefing_ids):
+    """A batch's ID and idempotency key: the same briefings, in the same order, always map to the same key."""
+    joined = "|".join(",".join(ids) for ids in briefing_ids)
+    return "batch-" + hashlib.sha256(joined.encode()).hexdigest()[:32]
+
+
+def round_lease_seconds(requests: int):
+    """
+    How long a round's leases must last once its sends start: every request
+    at the rate limit with all its throttle retries and backoff, plus
+    LEASE_SECONDS of slack for the requests themselves and the commit.
+    """
+    attempts = requests * (THROTTLE_RETRIES + 1)
+    backoff = THROTTLE_BACKOFF_SECONDS * (2 ** THROTTLE_RETRIES - 1)
+    return LEASE_SECONDS + attempts / REQUESTS_PER_SECOND + backoff
+
+
+def is_throttled(error):
+    return getattr(error, "code", None) == 429 or "rate_limit" in str(error).lower()
+
+
+def load_jobs(db, page):
+    """
+    Resolves a leased page into jobs {entry, signal, subscriber} with two batched reads.
+    Entries whose signal or subscriber is gone are returned as unrecoverable.
+    """
+    sig_refs = [db.collection("signals").document(e["signal_id"]) for e in page]
+    signals = {s.id: s.to_dict() for s in db.get_all(sig_refs) if s.exists}
+
+    sub_ids = {s.get("subscriber_id") for s in signals.values() if s.get("subscriber_id")}
+    sub_refs = [db.collection("subscribers").document(sid) for sid in sub_ids]
+    subscribers = {s.id: s.to_dict() for s in db.get_all(sub_refs) if s.exists} if sub_refs else {}
+
+    jobs, missing = [], []
+    for entry in page:
+        sig = signals.get(entry["signal_id"])
+        if sig is None:
+            missing.append((entry, "signal missing"))
+            continue
+        sub = subscribers.get(sig.get("subscriber_id"))
+        if sub is None:
+            missing.append((entry, "subscriber missing"))
+            continue
+        jobs.append({"entry": entry, "signal": sig, "subscriber": sub})
+    return jobs, missing
+
+
+def load_batches(db, page):
+    """{batch_id: batch doc} for the batches the leased entries belong to."""
+    ids = {e["batch_id"] for e in page if e.get("batch_id")}
+    if not ids:
+        return {}
+    refs = [db.collection(BATCH_COLLECTION).document(batch_id) for batch_id in ids]
+    return {s.id: s.to_dict() for s in db.get_all(refs) if s.exists}
+
+
+async def deliver(requests, keys, stats=None, concurrency=MAX_CONCURRENCY, rate=REQUESTS_PER_SECOND):
+    """
+    Sends each of `requests` (a list of up to BATCH_SIZE Resend params) as one
+    batch request under its key in `keys`. Returns one error per request, in
+    order (None = accepted by the provider). The batch endpoint is all-or-nothing.
+    """
+    stats = stats or DispatchStats()
+    bucket = TokenBucket(rate)
+    gate = asyncio.Semaphore(concurrency)
+    errors = [None] * len(requests)
+
+    async def send_batch(i):
+        async with gate:
+            for attempt in range(THROTTLE_RETRIES + 1):
+                await bucket.acquire()
+                stats.requests += 1
+                try:
+                    with span("email.send", emails=len(requests[i]), attempt=attempt), EMAIL_SECONDS.time():
+                        await asyncio.to_thread(resend.Batch.send, requests[i], {"idempotency_key": keys[i]})
+                    return
+                except Exception as e:
+                    if is_throttled(e) and attempt < THROTTLE_RETRIES:
+                        stats.throttled += 1
+                        await asyncio.sleep(THROTTLE_BACKOFF_SECONDS * 2 ** attempt)
+                        continue
+                    errors[i] = e
+                    return
+
+    await asyncio.gather(*(send_batch(i) for i in range(len(requests))))
+    return errors
+
+
+def _batch_jobs(batch):
+    return [job for group in batch["briefings"] for job in group]
+
+
+def _commit(db, ops):
+    for start in range(0, len(ops), WRITE_BATCH_OPS):
+        batch = db.batch()
+        for kind, ref, data in ops[start:start + WRITE_BATCH_OPS]:
+            if kind == "update":
+                batch.update(ref, data)
+            else:
+                batch.set(ref, data, merge=True)
+        with span("firestore.batch", ops=min(WRITE_BATCH_OPS, len(ops) - start)):
+            batch.commit()
+
+
+def open_round(db, batches, owner, lease_expires_at, abandoned=None):
+    """
+    Before the round's first send: records each new batch and stamps its
+    entries with the batch ID, and extends every batch's lease to
+    `lease_expires_at`. `abandoned` ({batch_id: doc}) are earlier batches
+    that can no longer be resent as they were; they are dead-lettered.
+    """
+    ops = []
+    lease = lease_update(owner, lease_expires_at)
+    for batch in batches:
+        ref = db.collection(BATCH_COLLECTION).document(batch["id"])
+        if batch["new"]:
+            ids = [[job["entry"]["id"] for job in group] for group in batch["briefings"]]
+            ops.append(("set", ref, new_batch(ids, owner, lease_expires_at, batch["attempts"], batch["created_at"])))
+        else:
+            ops.append(("update", ref, lease))
+        for job in _batch_jobs(batch):
+            ops.append(("update", db.collection(QUEUE_COLLECTION).document(job["entry"]["id"]),
+                        {**lease, "batch_id": batch["id"]}))
+    for batch_id, doc in (abandoned or {}).items():
+        ops.append(("update", db.collection(BATCH_COLLECTION).document(batch_id),
+                    failed_update(doc, "batch members missing; re-batched", permanent=True)))
+    _commit(db, ops)
+
+
+def commit_results(db, sent, failed, skipped=(), dead=(), log_writes=()):
+    """
+    Applies every state change from one round in bulk: `sent` batches and
+    `skipped` jobs -> signals notified, queue entries sent, feed entries
+    cleared; `failed` (batch, error) -> the batch and all its entries failed
+    or dead together; `dead` (entry, error) -> dead; plus any extra
+    (ref, data) `log_writes` from the dispatcher.
+    Returns the failed updates, one per entry, so the caller can count retries and dead letters.
+    """
+    ops = []
+    for job in [job for batch in sent for job in _batch_jobs(batch)] + list(skipped):
+        entry, sig = job["entry"], job["signal"]
+        ops.append(("update", db.collection("signals").document(entry["signal_id"]), {
+            "status": "notified",
+            "expire_at": expire_at("signals", "notified"),
+        }))
+        ops.append(("update", db.collection(QUEUE_COLLECTION).document(entry["id"]), sent_update()))
+        ops.append(("set", db.collection(VIEWS_COLLECTION).document(feed_view_id(sig["subscriber_id"])),
+                    feed_clear_update(entry["signal_id"])))
+    for batch in sent:
+        ops.append(("update", db.collection(BATCH_COLLECTION).document(batch["id"]), sent_update()))
+    for ref, data in log_writes:
+        ops.append(("set", ref, data))
+    updates = []
+    for batch, error in failed:
+        # One backoff for the whole batch, so its entries come due (and are resent) together
+        update = failed_update(batch, error)
+        ops.append(("update", db.collection(BATCH_COLLECTION).document(batch["id"]), update))
+        updates += [(job["entry"], update) for job in _batch_jobs(batch)]
+    for entry, error in dead:
+        updates.append((entry, failed_update(entry, error, permanent=True)))
+    for entry, update in updates:
+        ops.append(("update", db.collection(QUEUE_COLLECTION).document(entry["id"]), update))
+    _commit(db, ops)
+    return [update for _, update in updates]
+
+
+def coalesce(jobs, window_minutes=COALESCE_WINDOW_MINUTES, max_sections=MAX_SECTIONS):
+    """
+    Groups jobs into briefings: one per subscriber for signals created within
+    `window_minutes` of each other. Each briefing's jobs are ordered by score.
+    """
+    by_subscriber = {}
+    for job in jobs:
+        by_subscriber.setdefault(job["signal"]["subscriber_id"], []).append(job)
+
+    window = timedelta(minutes=window_minutes)
+    briefings = []
+    for sub_jobs in by_subscriber.values():
+        sub_jobs.sort(key=lambda j: j["signal"]["timestamp"].timestamp() if j["signal"].get("timestamp") else 0)
+        group, group_start = [], None
+        for job in sub_jobs:
+            ts = job["signal"].get("timestamp")
+            if group and (len(group) >= max_sections or (ts and group_start and ts - group_start > window)):
+                briefings.append(group)
+                group, group_start = [], None
+            group.append(job)
+            group_start = group_start or ts
+        briefings.append(group)
+
+    for group in briefings:
+        group.sort(key=lambda j: j["signal"].get("score", 0), reverse=True)
+    return briefings
+
+
+def fair_order(briefings):
+    """
+    Orders briefings by tier-weighted fair share so pro subscribers go out
+    first when the provider is the bottleneck, without starving basic ones.
+    """
+    queue = FairScheduler()
+    for group in briefings:
+        sub = group[0]["subscriber"]
+        stamps = [j["signal"]["timestamp"].timestamp() for j in group if j["signal"].get("timestamp")]
+        queue.push(group, group[0]["signal"]["subscriber_id"], tier_of(sub), queued_at=min(stamps, default=None))
+    return list(queue.drain())
+
+
+def _rounds(pages, per_round):
+    """
+    Merges leased pages so one round keeps every concurrent sender busy.
+    Yields (started, entries); `started` is the time.monotonic() at which the
+    round's first lease was requested.
+    """
+    pages = iter(pages)
+    while True:
+        started = time.monotonic()
+        merged = [entry for page in itertools.islice(pages, per_round) for entry in page]
+        if not merged:
+            return
+        yield started, merged
+
+
+def plan_round(jobs, batch_docs, should_send=None):
+    """
+    Splits a round's jobs into batches to send: earlier batches rebuilt
+    exactly as recorded, then new ones for everything else (coalesced,
+    fair-ordered and cut into BATCH_SIZE briefings). A recorded batch with a
+    member missing cannot be resent as it was; it is returned as abandoned
+    and its remaining members are batched anew.
+    Returns (batches, skipped, abandoned).
+    """
+    by_id = {job["entry"]["id"]: job for job in jobs}
+    batches, abandoned = [], {}
+    for batch_id, doc in batch_docs.items():
+        if all(entry_id in by_id for entry_id in batch_entry_ids(doc)):
+            created = doc.get("created_at")
+            batches.append({
+                "id": batch_id,
+                "briefings": [[by_id.pop(entry_id) for entry_id in b["entries"]] for b in doc["briefings"]],
+                "attempts": doc.get("attempts", 0),
+                "created_at": created.replace(tzinfo=None) if created else None,
+                "new": False,
+            })
+        else:
+            abandoned[batch_id] = doc
+
+    to_send, skipped = [], []
+    for job in by_id.values():
+        # Jobs of an earlier batch were checked when it was first sent
+        (to_send if should_send is None or job["entry"].get("batch_id") or should_send(job) else skipped).append(job)
+    briefings = fair_order(coalesce(to_send))
+    now = datetime.now()
+    for start in range(0, len(briefings), BATCH_SIZE):
+        chunk = briefings[start:start + BATCH_SIZE]
+        batches.append({
+            "id": batch_key([[job["entry"]["id"] for job in group] for group in chunk]),
+            "briefings": chunk,
+            "attempts": max(job["entry"].get("attempts", 0) for group in chunk for job in group),
+            "created_at": now,
+            "new": True,
+        })
+    return batches, skipped, abandoned
+
+
+async def run_dispatch(db, build_email, should_send=None, log_sent=None):
+    """
+    Drains the dispatch queue. `build_email(subscriber, jobs)` returns Resend
+    params for one briefing covering `jobs` (highest score first); each job
+    carries `batched_at`, the time to print in the briefing.
+    `should_send(job)` may return False to mark a job notified without
+    sending it (e.g. a duplicate). `log_sent(jobs)` is called after each
+    round with the jobs that were delivered (possibly none) and may return
+    extra (ref, data) writes for them; they are committed with the round's
+    results. Returns the run's DispatchStats.
+    """
+    stats = DispatchStats()
+    owner = default_owner()
+    rounds = _rounds(iter_leased_pages(db, owner, page_size=PAGE_SIZE), MAX_CONCURRENCY)
+    while True:
+        # Lease transactions, reads, dedupe checks and commits block on Firestore; they run
+        # in threads so a shared event loop (scheduler, scout cycle) keeps going meanwhile
+        leased = await asyncio.to_thread(next, rounds, None)
+        if leased is None:
+            break
+        started, page = leased
+        jobs, dead = await asyncio.to_thread(load_jobs, db, page)
+        batch_docs = await asyncio.to_thread(load_batches, db, page)
+        if time.monotonic() - started > LEASE_SECONDS - LEASE_MARGIN_SECONDS:
+            print(f"   ⚠️ Round took too long to assemble; leaving {len(page)} entries to expire and be retried.")
+            continue
+        batches, skipped, abandoned = await asyncio.to_thread(plan_round, jobs, batch_docs, should_send)
+        lease_expires_at = datetime.now() + timedelta(seconds=round_lease_seconds(len(batches)))
+        await asyncio.to_thread(open_round, db, batches, owner, lease_expires_at, abandoned)
+
+        requests, keys = [], []
+        for batch in batches:
+            emails = []
+            for group in batch["briefings"]:
+                for job in group:
+                    job["batched_at"] = batch["created_at"]
+                emails.append(build_email(group[0]["subscriber"], group))
+            requests.append(emails)
+            keys.append(batch["id"])
+
+        errors = await deliver(requests, keys, stats)
+        sent, failed = [], []
+        for batch, emails, err in zip(batches, requests, errors):
+            if err is None:
+                sent.append(batch)
+                stats.emails += len(emails)
+                EMAILS.inc(len(emails), result="sent")
+                for group, email in zip(batch["briefings"], emails):
+                    tier = tier_of(group[0]["subscriber"])
+                    stats.by_tier[tier] = stats.by_tier.get(tier, 0) + 1
+                    print(f"   ✅ Sent {len(group)}-signal briefing to {email['to'][0]}")
+            else:
+                failed.append((batch, err))
+                EMAILS.inc(len(emails), result="failed")
+                print(f"   ❌ Dispatch Error (batch of {len(emails)} emails): {err}")
+
+        sent_jobs = [job for batch in sent for job in _batch_jobs(batch)]
+        log_writes = await asyncio.to_thread(log_sent, sent_jobs) if log_sent else []
+        updates = await asyncio.to_thread(commit_results, db, sent, failed, skipped, dead, log_writes)
+        stats.sent += len(sent_jobs)
+        stats.skipped += len(skipped)
+        stats.dead += sum(u["status"] == "dead" for u in updates)
+        stats.retrying += sum(u["status"] == "failed" for u in updates)
+        DISPATCH_ENTRIES.inc(len(sent_jobs), status="sent")
+        DISPATCH_ENTRIES.inc(len(skipped), status="skipped")
+        DISPATCH_ENTRIES.inc(sum(u["status"] == "failed" for u in updates), status="retrying")
+        DISPATCH_ENTRIES.inc(sum(u["status"] == "dead" for u in updates), status="dead")
+    return stats
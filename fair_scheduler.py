@@ -0,0 +1,94 @@
+import os
+import time
+from collections import deque
+
+# Tier-Aware Fair Scheduler
+# Weighted fair queuing across subscribers. Every subscriber is a flow whose
+# weight comes from its tier, so under load a pro subscriber is served
+# `pro/basic` times as often as a basic one, yet basic flows keep moving.
+# Each tier also has a latency target: work that has waited past it jumps
+# ahead (earliest deadline first) so nobody starves behind a busy tier.
+#
+#   VTA_TIER_SHARES="pro:4,basic:1"  VTA_TIER_LATENCY="pro:60,basic:900"
+
+DEFAULT_TIER = "basic"
+
+
+def _parse_tiers(raw: str, cast):
+    pairs = (item.split(":", 1) for item in raw.split(",") if ":" in item)
+    return {name.strip(): cast(value) for name, value in pairs}
+
+
+TIER_SHARES = _parse_tiers(os.getenv("VTA_TIER_SHARES", "pro:4,basic:1"), float)
+TIER_LATENCY_SECONDS = _parse_tiers(os.getenv("VTA_TIER_LATENCY", "pro:60,basic:900"), float)
+
+
+def tier_of(subscriber: dict):
+    tier = (subscriber or {}).get("tier") or DEFAULT_TIER
+    return tier if tier in TIER_SHARES else DEFAULT_TIER
+
+
+class FairScheduler:
+    """
+    Orders work items by weighted virtual finish time, promoting items that
+    have overrun their tier's latency target. `push` then `pop` until empty.
+    """
+
+    def __init__(self, shares=None, latency=None):
+        self.shares = shares or TIER_SHARES
+        self.latency = latency or TIER_LATENCY_SECONDS
+        self.virtual_time = 0.0
+        self._flows = {}  # flow id -> deque of (finish, seq, deadline, tier, queued_at, item)
+        self._last_finish = {}
+        self._seq = 0
+        self.served = {}
+        self.max_wait = {}
+        self.missed = {}
+
+    def __len__(self):
+        return sum(len(q) for q in self._flows.values())
+
+    def push(self, item, flow: str, tier: str = DEFAULT_TIER, cost: float = 1.0, queued_at=None):
+        """Queues `item` for `flow` (a subscriber). `queued_at` is a time.time() value."""
+        tier = tier if tier in self.shares else DEFAULT_TIER
+        queued_at = queued_at or time.time()
+        start = max(self.virtual_time, self._last_finish.get(flow, 0.0))
+        finish = start + cost / self.shares.get(tier, 1.0)
+        self._last_finish[flow] = finish
+        deadline = queued_at + self.latency.get(tier, float("inf"))
+        self._seq += 1
+        self._flows.setdefault(flow, deque()).append((finish, self._seq, deadline, tier, queued_at, item))
+
+    def pop(self):
+        now = time.time()
+        heads = [(q[0], flow) for flow, q in self._flows.items() if q]
+        if not heads:
+            raise IndexError("pop from an empty FairScheduler")
+
+        overdue = [h for h in heads if h[0][2] <= now]
+        if overdue:
+            head, flow = min(overdue, key=lambda h: (h[0][2], h[0][1]))
+        else:
+            head, flow = min(heads, key=lambda h: (h[0][0], h[0][1]))
+        self._flows[flow].popleft()
+        if not self._flows[flow]:
+            del self._flows[flow]
+
+        finish, _, deadline, tier, queued_at, item = head
+        self.virtual_time = max(self.virtual_time, finish)
+        self.served[tier] = self.served.get(tier, 0) + 1
+        self.max_wait[tier] = max(self.max_wait.get(tier, 0.0), now - queued_at)
+        if now > deadline:
+            self.missed[tier] = self.missed.get(tier, 0) + 1
+        return item
+
+    def drain(self):
+        while self._flows:
+            yield self.pop()
+
+    def summary(self):
+        return ", ".join(
+            f"{tier}: {count} served, max wait {self.max_wait.get(tier, 0):.0f}s"
+            f" (target {self.latency.get(tier, 0):.0f}s, {self.missed.get(tier, 0)} late)"
+            for tier, count in sorted(self.served.items())
+        )
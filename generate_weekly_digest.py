@@ -1,49 +1,82 @@
-import os
-import resend
+import asyncio
 from datetime import datetime, timedelta
-from google import genai
-from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, firestore
-from google.cloud.firestore_v1.base_query import FieldFilter
+from weekly_aggregate import AGGREGATE_COLLECTION, last_closed_week_id
+from digest_pipeline import TokenLedger, condense_signals, select_top, estimate_tokens, CALL_TOKEN_BUDGET, CHARS_PER_TOKEN
+from signal_records import iter_signals, load_analyses
+from vta_core import db, llm as client
 
 # 1. SETUP
-load_dotenv()
-resend.api_key = os.getenv("RESEND_API_KEY")
 MODEL_ID = "gemini-2.5-flash-lite-preview-09-2025"
 
-if not firebase_admin._apps:
-    cred = credentials.Certificate("serviceAccount.json")
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
-client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+def generate(prompt):
+    return client.models.generate_content(model=MODEL_ID, contents=prompt)
+
+def synthesize(prompt_head, notes, prompt_tail, ledger):
+    """Final synthesis call; trims the notes so the whole prompt stays within the call budget."""
+    room = CALL_TOKEN_BUDGET - estimate_tokens(prompt_head + prompt_tail)
+    prompt = prompt_head + notes[:max(0, room) * CHARS_PER_TOKEN] + prompt_tail
+    response = generate(prompt)
+    ledger.record("final", prompt, response)
+    # Clean up any Markdown fences if the model adds them
+    return response.text.replace("```html", "").replace("```", "").strip()
+
+def fetch_weekly_aggregate(week_id=None):
+    """The rolling aggregate the scout cycles maintained for the week that just closed."""
+    week_id = week_id or last_closed_week_id()
+    snap = db.collection(AGGREGATE_COLLECTION).document(week_id).get()
+    return snap.to_dict() if snap.exists else None
+
+def format_aggregate(agg):
+    """Compact digest input: counts, score distribution, per-industry paragraphs and top items."""
+    if not agg or not agg.get("total"):
+        return ""
+    ind_labels = agg.get("industry_labels", {})
+    board_labels = agg.get("board_labels", {})
+    hist = agg.get("score_hist", {})
+
+    lines = [
+        f"WEEK ENDING: {agg.get('week_id')}",
+        f"TOTAL SIGNALS: {agg['total']}",
+        "SCORE DISTRIBUTION: " + ", ".join(f"{s}/10 x{hist[s]}" for s in sorted(hist, key=int, reverse=True)),
+        "BY BOARD: " + ", ".join(f"{board_labels.get(k, k)} ({n})" for k, n in sorted(agg.get("by_board", {}).items(), key=lambda kv: -kv[1])),
+        "---",
+    ]
+    for key, count in sorted(agg.get("by_industry", {}).items(), key=lambda kv: -kv[1]):
+        lines.append(f"TOPIC: {ind_labels.get(key, key)} ({count} signals)")
+        if agg.get("summaries", {}).get(key):
+            lines.append(f"SUMMARY: {agg['summaries'][key]}")
+        for e in agg.get("top_industry", {}).get(key, []):
+            lines.append(f"- [{e.get('score', 0)}/10] {e.get('board_name')}: {e.get('excerpt', '')}")
+        lines.append("---")
+    return "\n".join(lines)
+
+def weekly_digest_input():
+    """
+    Reads the week's aggregate (one document). For weeks the aggregate does
+    not cover, map-reduces the raw signals into notes within the token budget.
+    Returns (notes, ledger); pass the ledger on to the write_* call of the same run.
+    """
+    ledger = TokenLedger() # Token usage of this run, by stage
+    text = format_aggregate(fetch_weekly_aggregate())
+    if text:
+        print("📚 Using the weekly aggregate for the Insider Brief...")
+        return text, ledger
+    chosen = select_top(fetch_weekly_signals())
+    if not chosen:
+        return "", ledger
+    load_analyses(db, chosen) # Full text only for the signals that can make the digest
+    return asyncio.run(condense_signals(chosen, generate, ledger)), ledger
 
 def fetch_weekly_signals():
+    """Yields the week's signals as compact records, without their analysis text."""
     print("📚 Gathering history for the Insider Brief...")
     start_date = datetime.now() - timedelta(days=7)
-    
-    # Fetch Signals
-    query = db.collection("signals").where(filter=FieldFilter("timestamp", ">=", start_date))
-    docs = query.stream()
-    
-    signals_text = []
-    for doc in docs:
-        data = doc.to_dict()
-        entry = (
-            f"DATE: {data['timestamp'].strftime('%Y-%m-%d')}\n"
-            f"TOPIC: {data.get('industry', 'General')}\n"
-            f"ANALYSIS: {data.get('analysis', '')}\n"
-            f"SCORE: {data.get('score', 0)}\n"
-            "---"
-        )
-        signals_text.append(entry)
-    
-    return "\n".join(signals_text)
+    return iter_signals(db, start_date)
 
-def write_insider_brief(raw_signals):
+def write_insider_brief(raw_signals, ledger):
     print("✍️  Drafting the Insider Brief...")
     
-    prompt = f"""
+    prompt_head = f"""
     You are the "VTA Insider," writing a high-stakes intelligence brief for Vancouver business leaders.
     
     CRITICAL FORMATTING INSTRUCTION:
@@ -112,16 +145,35 @@ def write_insider_brief(raw_signals):
     </div>
 
     CONTENT TO ADAPT:
-    {raw_signals}
+    """
+    prompt_tail = """
     
     If data is empty, write about the "Calm Before the Storm" in January.
     """
+    return synthesize(prompt_head, raw_signals, prompt_tail, ledger)
 
-    response = client.models.generate_content(model=MODEL_ID, contents=prompt)
-    
-    # Clean up any Markdown fences if the model adds them
-    clean_html = response.text.replace("```html", "").replace("```", "").strip()
-    return clean_html
+def write_hcr_letter(raw_signals, ledger):
+    """The long-form civic letter published to Substack."""
+    print("✍️  Drafting the weekly letter...")
+
+    prompt_head = f"""
+    You write "The Machinery of Democracy", a weekly letter about Vancouver, WA
+    city government in the style of a historian's evening letter: calm,
+    precise, first person plural, connecting this week's decisions to how
+    the city actually works. No hype, no Markdown.
+
+    Return raw HTML only, using <h2>, <h3>, <p>, <ul>/<li>, <strong> and
+    <blockquote>. Open with a dated line ({datetime.now().strftime('%B %d, %Y')}),
+    cover the most consequential items first, name the boards that acted,
+    and close with what to watch next week.
+
+    NOTES FROM THIS WEEK:
+    """
+    prompt_tail = """
+
+    If the notes are empty, write a short letter about what the city has on deck.
+    """
+    return synthesize(prompt_head, raw_signals, prompt_tail, ledger)
 
 def save_and_publish_digest(content):
     """
@@ -153,6 +205,7 @@ def save_and_publish_digest(content):
     print("💾 Insider Brief saved to Firestore.")
 
 if __name__ == "__main__":
-    signals = fetch_weekly_signals()
-    letter = write_insider_brief(signals)
-    save_and_publish_digest(letter)
\ No newline at end of file
+    signals, ledger = weekly_digest_input()
+    letter = write_insider_brief(signals, ledger)
+    save_and_publish_digest(letter)
+    print(ledger.report())
\ No newline at end of file
@@ -0,0 +1,77 @@
+import os
+import gzip
+import json
+import hashlib
+
+# Meeting Archive
+# Full scraped text, gzip-compressed and content-addressed on local disk.
+# `meeting_records` only keeps the SHA-256 of the text (`raw_text_hash`);
+# large packets are split into chunks that are stored (and deduped) separately.
+#
+#   <ARCHIVE_DIR>/manifests/<text hash>.json
+#   <ARCHIVE_DIR>/chunks/<ab>/<chunk hash>.gz
+
+ARCHIVE_DIR = os.getenv("VTA_ARCHIVE_DIR", "meeting_archive")
+CHUNK_BYTES = 1024 * 1024
+
+
+def _sha256(data: bytes):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _manifest_path(text_hash: str):
+    return os.path.join(ARCHIVE_DIR, "manifests", f"{text_hash}.json")
+
+
+def _chunk_path(chunk_hash: str):
+    return os.path.join(ARCHIVE_DIR, "chunks", chunk_hash[:2], f"{chunk_hash}.gz")
+
+
+def _atomic_write(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def has_text(text_hash: str):
+    return os.path.exists(_manifest_path(text_hash))
+
+
+def put_text(text: str):
+    """Stores `text` and returns its hash. Re-storing identical text is a no-op."""
+    data = text.encode("utf-8")
+    text_hash = _sha256(data)
+    if has_text(text_hash):
+        return text_hash
+
+    chunks = []
+    for start in range(0, len(data), CHUNK_BYTES):
+        piece = data[start:start + CHUNK_BYTES]
+        chunk_hash = _sha256(piece)
+        if not os.path.exists(_chunk_path(chunk_hash)):
+            _atomic_write(_chunk_path(chunk_hash), gzip.compress(piece))
+        chunks.append(chunk_hash)
+
+    manifest = {"size": len(data), "encoding": "gzip", "chunks": chunks}
+    _atomic_write(_manifest_path(text_hash), json.dumps(manifest).encode("utf-8"))
+    return text_hash
+
+
+def get_text(text_hash: str):
+    """Loads archived text by hash, or None if it was never archived."""
+    if not has_text(text_hash):
+        return None
+    with open(_manifest_path(text_hash), "rb") as f:
+        manifest = json.loads(f.read())
+
+    parts = []
+    for chunk_hash in manifest["chunks"]:
+        with open(_chunk_path(chunk_hash), "rb") as f:
+            parts.append(gzip.decompress(f.read()))
+    data = b"".join(parts)
+
+    if _sha256(data) != text_hash:
+        raise ValueError(f"Archive corruption detected for {text_hash}")
+    return data.decode("utf-8")
@@ -0,0 +1,244 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+# Runtime Metrics
+# In-process counters, gauges and histograms for the long-running services
+# (scheduler, dispatch worker, MCP server), served in the Prometheus text
+# exposition format on a local HTTP endpoint:
+#
+#   VTA_METRICS_PORT=9464 python scheduler.py
+#   curl localhost:9464/metrics
+#
+# Without VTA_METRICS_PORT nothing listens; recording still works and costs a
+# dict update. Standard library only.
+
+METRICS_PORT = os.getenv("VTA_METRICS_PORT")
+METRICS_HOST = os.getenv("VTA_METRICS_HOST", "127.0.0.1")
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 5e6)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                     for k, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_labels(self.label_names, k)} {_number(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._functions = {}
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_function(self, fn, **labels):
+        """Reads the value from `fn()` at scrape time."""
+        with self._lock:
+            self._functions[self._key(labels)] = fn
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, fn in functions.items():
+            try:
+                values[key] = fn()
+            except Exception:
+                continue
+        return self._header() + [f"{self.name}{_labels(self.label_names, k)} {_number(v)}"
+                                 for k, v in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, (list(c), s)) for k, (c, s) in self._values.items())
+        lines = self._header()
+        names = self.label_names + ("le",)
+        for key, (counts, total) in items:
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_labels(names, key + (_number(bound),))} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {counts[-1]}")
+        return lines
+
+
+REGISTRY = []
+
+# --- Scout cycle ---
+BOARDS_SCOUTED = Counter("vta_boards_scouted_total", "Boards checked by the scout, by outcome "
+                         "(changed, unchanged, hidden, deferred, locked).", ["outcome"])
+SCRAPE_BYTES = Histogram("vta_scrape_bytes", "Size of scraped meeting packets.", buckets=SIZE_BUCKETS)
+LLM_CALLS = Counter("vta_llm_calls_total", "Model calls by stage and outcome (ok, no_signal, error).",
+                    ["stage", "outcome"])
+LLM_SECONDS = Histogram("vta_llm_call_seconds", "Model call latency.", ["stage"])
+LLM_TOKENS = Counter("vta_llm_tokens_total", "Model tokens by stage and kind (prompt, output).", ["stage", "kind"])
+CACHE_REQUESTS = Counter("vta_cache_requests_total", "Cache lookups by cache and result (hit, miss).",
+                         ["cache", "result"])
+SIGNALS = Counter("vta_signals_total", "Signals written, by score bucket.", ["score"])
+STAGE_DEPTH = Gauge("vta_stage_queue_depth", "Items waiting in each pipeline stage's queue.", ["stage"])
+STAGE_ITEMS = Counter("vta_stage_items_total", "Items handled per pipeline stage, by outcome.", ["stage", "outcome"])
+OUTBOX_PENDING = Gauge("vta_outbox_pending", "Journaled Firestore writes not yet flushed.")
+
+# --- Delivery ---
+EMAILS = Counter("vta_emails_total", "Briefing emails by result (sent, failed).", ["result"])
+EMAIL_SECONDS = Histogram("vta_email_send_seconds", "Resend send request latency.")
+DISPATCH_ENTRIES = Counter("vta_dispatch_entries_total", "Dispatch queue entries settled, by status "
+                           "(sent, skipped, retrying, dead).", ["status"])
+
+# --- Browser pool ---
+BROWSER_ACTIVE = Gauge("vta_browser_pages_active", "Pages open in the shared browser.")
+BROWSER_CAPACITY = Gauge("vta_browser_pages_capacity", "Concurrent page limit of the browser pool.")
+BROWSER_PAGES = Counter("vta_browser_pages_total", "Pages served by the browser pool.")
+BROWSER_RESTARTS = Counter("vta_browser_restarts_total", "Browser replacements (wear, crash or memory guard).")
+
+# --- Services ---
+JOB_RUNS = Counter("vta_job_runs_total", "Scheduler job runs by job and outcome.", ["job", "outcome"])
+JOB_SECONDS = Histogram("vta_job_seconds", "Scheduler job duration.", ["job"],
+                        buckets=(1, 5, 15, 60, 300, 900, 1800, 3600))
+RSS_MB = Gauge("vta_process_resident_memory_mb", "Memory of this process and its browser children.")
+
+
+def score_bucket(score: int):
+    if score >= 9:
+        return "9-10"
+    if score >= 7:
+        return "7-8"
+    return "4-6" if score >= 4 else "1-3"
+
+
+class _Call:
+    response = None
+    outcome = "ok"
+
+
+@contextmanager
+def llm_call(stage: str):
+    """Times a model call; set `.response` for token counts and `.outcome` if not "ok"."""
+    call = _Call()
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        call.outcome = "error"
+        raise
+    finally:
+        LLM_SECONDS.observe(time.perf_counter() - started, stage=stage)
+        LLM_CALLS.inc(stage=stage, outcome=call.outcome)
+        usage = getattr(call.response, "usage_metadata", None)
+        if usage:
+            LLM_TOKENS.inc(getattr(usage, "prompt_token_count", None) or 0, stage=stage, kind="prompt")
+            LLM_TOKENS.inc(getattr(usage, "candidates_token_count", None) or 0, stage=stage, kind="output")
+
+
+def render():
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+def _handler():
+    from http.server import BaseHTTPRequestHandler # Only services that serve metrics pay for it
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Scrapes every few seconds would drown the service's own log
+    return _Handler
+
+
+_server = None
+
+
+def serve(port=METRICS_PORT, host=METRICS_HOST):
+    """Starts the metrics endpoint on a daemon thread (once per process). No-op without a port."""
+    global _server
+    if _server is not None or not port:
+        return _server
+    from http.server import ThreadingHTTPServer
+    _server = ThreadingHTTPServer((host, int(port)), _handler())
+    threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+    print(f"📈 Metrics on http://{host}:{port}/metrics")
+    return _server
@@ -0,0 +1,128 @@
+import re
+import random
+import hashlib
+from datetime import datetime, timedelta
+
+# Near-Duplicate Suppression
+# MinHash signatures over the content words of a signal's analysis. Two LLM
+# write-ups of the same agenda item share most of their vocabulary even when
+# wording and sentence order differ, so their estimated Jaccard similarity is
+# high; unrelated signals that share a boilerplate opening score near zero.
+#
+# Signatures live in one bounded doc per subscriber (`dedupe_index/<sub>`):
+# at most MAX_ENTRIES signatures from the last WINDOW_DAYS.
+
+INDEX_COLLECTION = "dedupe_index"
+NUM_PERM = 64
+MIN_SIMILARITY = 0.5 # Estimated Jaccard at or above which two signals are duplicates
+WINDOW_DAYS = 14
+MAX_ENTRIES = 200
+
+_MERSENNE = (1 << 61) - 1
+_rng = random.Random(20251222) # Fixed seed: signatures must stay comparable across runs
+_PERMS = [(_rng.randrange(1, _MERSENNE), _rng.randrange(0, _MERSENNE)) for _ in range(NUM_PERM)]
+
+# Format labels every Watchdog answer shares; they would make everything look alike
+_BOILERPLATE = re.compile(r"\b(score|reason|analysis)\s*:\s*(\[?\d+(/10)?\]?)?", re.IGNORECASE)
+_WORD = re.compile(r"[a-z0-9$%]+")
+_STOPWORDS = frozenset(
+    "a an the and or of to for on in at by with will be is are was were this that these those from as "
+    "it its their should can may into over under after before than then there here have has had not "
+    "no but if so about".split()
+)
+
+
+def _features(text: str):
+    return [w for w in _WORD.findall(_BOILERPLATE.sub(" ", text.lower())) if w not in _STOPWORDS]
+
+
+def minhash(text: str):
+    """NUM_PERM 32-bit minimums, one per hash permutation."""
+    bases = {int.from_bytes(hashlib.blake2b(w.encode(), digest_size=8).digest(), "big") for w in _features(text)}
+    if not bases:
+        return [0xFFFFFFFF] * NUM_PERM
+    return [min((a * h + b) % _MERSENNE for h in bases) & 0xFFFFFFFF for a, b in _PERMS]
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of the two word sets."""
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / NUM_PERM
+
+
+def _pack(sig):
+    return "".join(f"{v:08x}" for v in sig)
+
+
+def _unpack(packed: str):
+    return [int(packed[i:i + 8], 16) for i in range(0, len(packed), 8)]
+
+
+class NearDupeIndex:
+    """Per-run cache of subscriber signature sets, backed by `dedupe_index`."""
+
+    def __init__(self, db, min_similarity=MIN_SIMILARITY, window_days=WINDOW_DAYS):
+        self.db = db
+        self.min_similarity = min_similarity
+        self.window = timedelta(days=window_days)
+        self._entries = {}
+        self._held = {}  # subscriber_id -> entries accepted this run, not yet known to be delivered
+
+    def _load(self, subscriber_id: str):
+        if subscriber_id not in self._entries:
+            snap = self.db.collection(INDEX_COLLECTION).document(subscriber_id).get()
+            entries = (snap.to_dict() or {}).get("entries", []) if snap.exists else []
+            cutoff = datetime.now() - self.window
+            self._entries[subscriber_id] = [
+                {**e, "sig": _unpack(e["sig"])} for e in entries
+                if e.get("at") and e["at"].replace(tzinfo=None) >= cutoff
+            ]
+        return self._entries[subscriber_id]
+
+    def find(self, subscriber_id: str, signal_id: str, text: str):
+        """Returns (entry, similarity) for the most similar earlier or held signal over the threshold, or None."""
+        return self._best(subscriber_id, signal_id, minhash(text))
+
+    def claim(self, subscriber_id: str, signal_id: str, text: str):
+        """
+        Like `find`, but a signal with no match is held, so later candidates
+        in this run are compared against it too. `remember` keeps the held
+        signals that were delivered; `release_held` drops the rest.
+        """
+        sig = minhash(text)
+        match = self._best(subscriber_id, signal_id, sig)
+        if match is None:
+            self._held.setdefault(subscriber_id, []).append({"sig": sig, "signal_id": signal_id, "at": datetime.now()})
+        return match
+
+    def release_held(self):
+        self._held.clear()
+
+    def _best(self, subscriber_id: str, signal_id: str, sig):
+        best = None
+        for entry in self._load(subscriber_id) + self._held.get(subscriber_id, []):
+            if entry.get("signal_id") == signal_id:
+                continue  # A retry of the same signal is not a duplicate of itself
+            score = similarity(sig, entry["sig"])
+            if score >= self.min_similarity and (best is None or score > best[1]):
+                best = (entry, score)
+        return best
+
+    def remember(self, subscriber_id: str, signals):
+        """
+        Adds the signatures of delivered `signals` [(signal_id, text)] and
+        returns the one (ref, data) write that persists the subscriber's
+        trimmed index, for the dispatcher's bulk commit.
+        """
+        entries = self._load(subscriber_id)
+        held = self._held.get(subscriber_id, [])
+        for signal_id, text in signals:
+            entry = next((e for e in held if e["signal_id"] == signal_id), None)
+            if entry:
+                held.remove(entry)
+            entries.append(entry or {"sig": minhash(text), "signal_id": signal_id, "at": datetime.now()})
+        del entries[:-MAX_ENTRIES]
+        ref = self.db.collection(INDEX_COLLECTION).document(subscriber_id)
+        return ref, {
+            "entries": [{**e, "sig": _pack(e["sig"])} for e in entries],
+            "updated_at": datetime.now(),
+        }
@@ -0,0 +1,332 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+from firebase_admin import firestore
+from google.api_core import exceptions
+from retention import EXPIRE_FIELD, expire_at
+from tracing import span
+from metrics import OUTBOX_PENDING
+
+# Write-Ahead Outbox
+# The production cycle appends its Firestore writes to a local SQLite journal
+# and keeps going. A background flusher drains the journal in order, retrying
+# with backoff. Entries left behind by a crash are replayed on the next start.
+#
+# Every append is its own entry (a unique key unless the caller passes one;
+# appends with a repeated explicit key are ignored). Ops are `set`/`update` on
+# explicit document IDs, so re-applying a plain entry after a partial flush
+# rewrites the same values. An entry holding an `increment()` would count
+# twice, so it is journaled "once": the flusher applies it in a Firestore
+# transaction together with a marker doc (`outbox_applied/<key>`) and skips
+# it if the marker already exists.
+#
+# Entries journaled inside `fenced(lease_id, token)` carry that board lease's
+# fencing token. Before applying them the flusher checks the lease's current
+# token; if another worker has acquired the lease since, they are dropped.
+#
+# A failing entry holds back only later entries for the same document. After
+# MAX_ATTEMPTS tries, or at once if Firestore rejects it outright (e.g. an
+# update of a deleted doc), it is dead-lettered: kept in the journal with its
+# error for a human to look at, and no longer blocks anything.
+
+OUTBOX_PATH = os.getenv("VTA_OUTBOX_PATH", "outbox.db")
+MAX_BACKOFF_SECONDS = 300
+MAX_ATTEMPTS = int(os.getenv("VTA_OUTBOX_MAX_ATTEMPTS", "10"))
+POLL_SECONDS = 1.0
+APPLIED_COLLECTION = "outbox_applied"
+PERMANENT_ERRORS = (exceptions.NotFound, exceptions.InvalidArgument, exceptions.FailedPrecondition)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT UNIQUE NOT NULL,
+    op TEXT NOT NULL,
+    collection TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    flushed_at REAL,
+    once INTEGER NOT NULL DEFAULT 0,
+    dead_at REAL,
+    fence_id TEXT,
+    fence_token INTEGER
+)
+"""
+# Journals from older versions
+_ADDED_COLUMNS = {"once": "INTEGER NOT NULL DEFAULT 0", "dead_at": "REAL", "fence_id": "TEXT", "fence_token": "INTEGER"}
+
+_fence = contextvars.ContextVar("outbox_fence", default=None) # (lease_id, token) for appends in fenced()
+
+
+# Firestore transforms can't be JSON-encoded, so callers journal these markers instead
+def increment(amount=1):
+    return {"__increment__": amount}
+
+
+def delete_field():
+    return {"__delete__": True}
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    raise TypeError(f"Outbox cannot journal {type(value).__name__}")
+
+
+def _decode(obj):
+    if "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    if "__increment__" in obj:
+        return firestore.Increment(obj["__increment__"])
+    if "__delete__" in obj:
+        return firestore.DELETE_FIELD
+    return obj
+
+
+def _has_increment(value):
+    if isinstance(value, dict):
+        return "__increment__" in value or any(_has_increment(v) for v in value.values())
+    return False
+
+
+@firestore.transactional
+def _apply_once(transaction, marker, ref, op, data):
+    if marker.get(transaction=transaction).exists:
+        return  # Applied before the journal recorded it
+    if op == "update":
+        transaction.update(ref, data)
+    else:
+        transaction.set(ref, data, merge=(op == "merge"))
+    transaction.set(marker, {"applied_at": datetime.now(), EXPIRE_FIELD: expire_at(APPLIED_COLLECTION)})
+
+
+class Outbox:
+    def __init__(self, db, path=OUTBOX_PATH):
+        self.db = db
+        self.fence_check = None  # lease_id -> current token; set by the cycle
+        self.on_fenced = None  # Called with a lease_id whose stale entries were dropped
+        self._lock = threading.RLock() # Re-entrant so appends can run inside transaction()
+        self._flush_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(outbox)")}
+        for name, decl in _ADDED_COLUMNS.items():
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE outbox ADD COLUMN {name} {decl}")
+
+    # --- Journal ---
+
+    def new_id(self, collection: str):
+        """A Firestore auto-ID generated locally, so adds become idempotent sets."""
+        return self.db.collection(collection).document().id
+
+    def _append(self, op, collection, doc_id, data, key=None):
+        payload = json.dumps(data, default=_encode, sort_keys=True)
+        key = key or uuid.uuid4().hex
+        once = _has_increment(data) # Not idempotent: apply exactly once
+        fence_id, fence_token = _fence.get() or (None, None)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO outbox (key, op, collection, doc_id, payload, created_at, once, "
+                "fence_id, fence_token) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, op, collection, doc_id, payload, time.time(), int(once), fence_id, fence_token),
+            )
+        return doc_id
+
+    def set(self, collection: str, doc_id: str, data: dict, merge=False, key=None):
+        return self._append("merge" if merge else "set", collection, doc_id, data, key)
+
+    def update(self, collection: str, doc_id: str, data: dict, key=None):
+        return self._append("update", collection, doc_id, data, key)
+
+    def add(self, collection: str, data: dict, key=None):
+        """Journals a new document and returns its (pre-assigned) ID."""
+        return self.set(collection, self.new_id(collection), data, key=key)
+
+    @contextmanager
+    def fenced(self, lease_id: str, token: int):
+        """Appends in the block (this task and threads it starts) are only applied while `token` holds the lease."""
+        reset = _fence.set((lease_id, token))
+        try:
+            yield
+        finally:
+            _fence.reset(reset)
+
+    def refence(self, lease_id: str, token: int):
+        """
+        Moves our pending entries from the directly preceding token to `token`
+        after we re-acquire a lease nobody else held in between.
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET fence_token = ? WHERE fence_id = ? AND fence_token = ? AND flushed_at IS NULL",
+                (token, lease_id, token - 1),
+            )
+
+    @contextmanager
+    def transaction(self):
+        """
+        Commits every append in the block, plus any rows written on the yielded
+        connection (e.g. cycle checkpoints), atomically. Nested blocks join the
+        outer one. Do not await inside the block.
+        """
+        with self._lock:
+            outer = not self._conn.in_transaction
+            if outer:
+                self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                if outer:
+                    self._conn.execute("ROLLBACK")
+                raise
+            if outer:
+                self._conn.execute("COMMIT")
+
+    def pending_count(self, fence=None):
+        """Live unflushed entries; only those journaled under `fence` (lease_id, token) if given."""
+        query, params = "SELECT COUNT(*) FROM outbox WHERE flushed_at IS NULL AND dead_at IS NULL", ()
+        if fence:
+            query, params = query + " AND fence_id = ? AND fence_token = ?", tuple(fence)
+        with self._lock:
+            return self._conn.execute(query, params).fetchone()[0]
+
+    def dead_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE dead_at IS NOT NULL").fetchone()[0]
+
+    # --- Flusher ---
+
+    def _apply(self, op, collection, doc_id, data, key=None, once=False):
+        ref = self.db.collection(collection).document(doc_id)
+        with span("firestore.write", op=op, collection=collection, once=once):
+            if once:
+                marker = self.db.collection(APPLIED_COLLECTION).document(key)
+                _apply_once(self.db.transaction(), marker, ref, op, data)
+            elif op == "update":
+                ref.update(data)
+            else:
+                ref.set(data, merge=(op == "merge"))
+
+    def flush_once(self):
+        """
+        Applies due entries oldest-first and returns how many were flushed.
+        Writes to one document keep their order: a failing entry holds back
+        the later entries for its document until it succeeds or is dead-lettered.
+        """
+        with self._flush_lock:
+            return self._flush_due()
+
+    def _flush_due(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, key, op, collection, doc_id, payload, attempts, next_attempt_at, once, "
+                "fence_id, fence_token FROM outbox WHERE flushed_at IS NULL AND dead_at IS NULL ORDER BY seq"
+            ).fetchall()
+
+        flushed = 0
+        blocked = set()  # (collection, doc_id) with an earlier entry still waiting
+        tokens = {}  # lease_id -> current token, read once per pass
+        for seq, key, op, collection, doc_id, payload, attempts, next_attempt_at, once, fence_id, fence_token in rows:
+            target = (collection, doc_id)
+            if target in blocked or next_attempt_at > time.time():
+                blocked.add(target)
+                continue
+            if fence_id and self.fence_check:
+                if fence_id not in tokens:
+                    try:
+                        tokens[fence_id] = self.fence_check(fence_id)
+                    except Exception as e:
+                        print(f"   ⚠️ [Outbox] Could not check lease {fence_id}: {e}")
+                        tokens[fence_id] = None
+                if tokens[fence_id] is None:
+                    blocked.add(target)
+                    continue
+                if tokens[fence_id] != fence_token:
+                    self._drop_fenced(fence_id, fence_token)
+                    continue
+            try:
+                self._apply(op, collection, doc_id, json.loads(payload, object_hook=_decode), key, bool(once))
+            except Exception as e:
+                attempts += 1
+                if isinstance(e, PERMANENT_ERRORS) or attempts >= MAX_ATTEMPTS:
+                    with self._lock:
+                        self._conn.execute(
+                            "UPDATE outbox SET attempts = ?, last_error = ?, dead_at = ? WHERE seq = ?",
+                            (attempts, str(e)[:500], time.time(), seq),
+                        )
+                    print(f"   ❌ [Outbox] {op} {collection}/{doc_id} dead-lettered after {attempts} attempt(s): {e}")
+                    continue
+                backoff = min(MAX_BACKOFF_SECONDS, 2 ** attempts)
+                with self._lock:
+                    self._conn.execute(
+                        "UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE seq = ?",
+                        (attempts, time.time() + backoff, str(e)[:500], seq),
+                    )
+                print(f"   ⚠️ [Outbox] {op} {collection}/{doc_id} failed (attempt {attempts}), retrying in {backoff}s: {e}")
+                blocked.add(target)
+                continue
+            with self._lock:
+                self._conn.execute("UPDATE outbox SET flushed_at = ? WHERE seq = ?", (time.time(), seq))
+            flushed += 1
+        return flushed
+
+    def _drop_fenced(self, lease_id, token):
+        with self._lock:
+            dropped = self._conn.execute(
+                "DELETE FROM outbox WHERE fence_id = ? AND fence_token = ? AND flushed_at IS NULL",
+                (lease_id, token),
+            ).rowcount
+        if dropped:
+            print(f"   🔒 [Outbox] Dropped {dropped} writes for {lease_id}: the lease moved on from token {token}.")
+            if self.on_fenced:
+                self.on_fenced(lease_id)
+
+    def prune(self):
+        """Drops journal rows that already reached Firestore (dead letters stay)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM outbox WHERE flushed_at IS NOT NULL")
+
+    async def run_flusher(self, stop: asyncio.Event):
+        """Background task: drains the journal until `stop` is set."""
+        while not stop.is_set():
+            flushed = await asyncio.to_thread(self.flush_once)
+            OUTBOX_PENDING.set(await asyncio.to_thread(self.pending_count))
+            if not flushed:
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def drain(self, timeout: float, fence=None):
+        """
+        Waits (up to `timeout` seconds) for every journaled write, or only the
+        ones journaled under `fence` (lease_id, token), to reach Firestore.
+        Returns how many of those are still pending.
+        """
+        deadline = time.monotonic() + timeout
+        # The journal lock can be held by a writer thread; never wait on it from the event loop
+        while await asyncio.to_thread(self.pending_count, fence) and time.monotonic() < deadline:
+            if not await asyncio.to_thread(self.flush_once):
+                await asyncio.sleep(POLL_SECONDS)
+        remaining = await asyncio.to_thread(self.pending_count, fence)
+        OUTBOX_PENDING.set(await asyncio.to_thread(self.pending_count))
+        if not remaining and fence is None:
+            await asyncio.to_thread(self.prune)
+        return remaining
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
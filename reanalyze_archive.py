@@ -0,0 +1,90 @@
+import argparse
+import re
+import time
+from datetime import datetime
+from google.cloud.firestore_v1.base_query import FieldFilter
+from meeting_archive import get_text
+from dashboard_views import refresh_meeting_card
+from vta_master import db, analyze_meeting_holistically, score_for_profile, MAX_SCRAPE_CHARS
+
+# Re-runs the Librarian (and optionally the Watchdog) over archived meeting
+# text. Nothing is scraped: the text comes from the local meeting archive.
+#
+#   python reanalyze_archive.py --since 2025-12-01 --watchdog --dry-run
+
+
+def iter_archived_records(board_key=None, since=None):
+    query = db.collection("meeting_records")
+    if since:
+        query = query.where(filter=FieldFilter("timestamp", ">=", since))
+    for doc in query.select(["board_name", "org_id", "raw_text_hash", "score"]).stream():
+        record = doc.to_dict()
+        if not record.get("raw_text_hash"):
+            continue  # Scraped before the archive existed
+        if board_key and doc.id.rsplit("_", 1)[0] != re.sub(r'\W+', '_', board_key):
+            continue
+        yield doc.id, record
+
+
+def reanalyze(board_key=None, since=None, watchdog=False, dry_run=False):
+    print(f"🔁 [{datetime.now().strftime('%H:%M:%S')}] Re-analyzing archived meetings...")
+    started = time.perf_counter()
+    profiles = []
+    if watchdog:
+        profiles = [(p.id, p.to_dict()) for p in
+                    db.collection("interest_profiles").where(filter=FieldFilter("active", "==", True)).stream()]
+
+    count = 0
+    for record_id, record in iter_archived_records(board_key, since):
+        full_text = get_text(record["raw_text_hash"])
+        if full_text is None:
+            print(f"   ⚠️ {record_id}: text {record['raw_text_hash'][:12]} missing from archive.")
+            continue
+        raw_text = full_text[:MAX_SCRAPE_CHARS]
+        count += 1
+
+        archive_data = analyze_meeting_holistically(record["board_name"], raw_text)
+        print(f"   🏛️  {record_id}: public score {record.get('score')} -> {archive_data.get('public_score')}")
+        if not dry_run:
+            fields = {
+                "summary": archive_data.get("summary"),
+                "topics": archive_data.get("topics"),
+                "keywords": archive_data.get("keywords"),
+                "score": archive_data.get("public_score", 0),
+                "analysis": archive_data.get("public_analysis", ""),
+            }
+            db.collection("meeting_records").document(record_id).update({
+                **fields, "reanalyzed_at": datetime.now()
+            })
+            # Keep the dashboard card in step with the record it shows
+            if record.get("org_id"):
+                refresh_meeting_card(db, record["org_id"], record_id,
+                                     {**fields, "topics": fields["topics"] or [], "keywords": fields["keywords"] or []})
+
+        for prof_id, prof in profiles:
+            result = score_for_profile(prof, raw_text)
+            score = result[0] if result else 0
+            print(f"      🧠 {prof['industry']}: {score}/10")
+            if dry_run:
+                continue
+            # Kept apart from `signals` so historical re-scores never trigger alerts
+            db.collection("reanalysis_results").document(f"{record_id}__{prof_id}").set({
+                "record_id": record_id,
+                "profile_id": prof_id,
+                "subscriber_id": prof.get("subscriber_id"),
+                "score": score,
+                "analysis": result[1] if result else "NO_SIGNAL",
+                "timestamp": datetime.now()
+            })
+
+    print(f"🏁 Re-analyzed {count} meetings in {time.perf_counter() - started:.1f}s.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-run analysis over the local meeting archive.")
+    parser.add_argument("--board", help="Only records for this board key (e.g. city_council)")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="Only records on/after this date")
+    parser.add_argument("--watchdog", action="store_true", help="Also re-score every active interest profile")
+    parser.add_argument("--dry-run", action="store_true", help="Print results without writing to Firestore")
+    args = parser.parse_args()
+    reanalyze(args.board, args.since, args.watchdog, args.dry_run)
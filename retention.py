@@ -0,0 +1,117 @@
+import os
+import sys
+from datetime import datetime, timedelta
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+# Retention Policy
+# Every expiring document carries an `expire_at` timestamp computed when it is
+# written. In production Firestore deletes them through a TTL policy:
+#
+#   gcloud firestore fields ttls update expire_at --collection-group=signals --enable-ttl
+#   gcloud firestore fields ttls update expire_at --collection-group=sent_notifications --enable-ttl
+#   gcloud firestore fields ttls update expire_at --collection-group=dispatch_queue --enable-ttl
+#   gcloud firestore fields ttls update expire_at --collection-group=dispatch_batches --enable-ttl
+#   gcloud firestore fields ttls update expire_at --collection-group=outbox_applied --enable-ttl
+#
+# The emulator and local runs have no TTL, so `python retention.py` sweeps the
+# same field by hand. Either way nothing runs inside the production cycle.
+
+EXPIRE_FIELD = "expire_at"
+# Notified signals were never deleted before; expiring them is opt-in
+NOTIFIED_SIGNAL_DAYS = int(os.getenv("VTA_NOTIFIED_SIGNAL_DAYS", "0")) or None
+
+# Days to keep a document, per collection and status. None = keep forever.
+RETENTION_DAYS = {
+    "signals": {
+        "archived": 21,
+        "notified": NOTIFIED_SIGNAL_DAYS, # None (keep) unless VTA_NOTIFIED_SIGNAL_DAYS is set
+        "unread": None,
+    },
+    "sent_notifications": { # Legacy prefix-hash log, superseded by dedupe_index
+        None: 90,
+    },
+    "dispatch_queue": {
+        "sent": 7,
+        "failed": None, # Still retrying
+        "dead": 30,
+        "pending": None,
+        "leased": None,
+    },
+    "dispatch_batches": { # Same lifecycle as the entries they group
+        "sent": 7,
+        "failed": None,
+        "dead": 30,
+        "leased": None,
+    },
+    "outbox_applied": { # Exactly-once markers; only needed while an entry may still be replayed
+        None: 30,
+    },
+}
+
+SWEEP_BATCH = 400
+
+
+def expire_at(collection: str, status=None, now=None):
+    """The `expire_at` value for a doc in `collection` with the given status."""
+    policy = RETENTION_DAYS.get(collection, {})
+    days = policy.get(status, policy.get(None))
+    if days is None:
+        return None
+    return (now or datetime.now()) + timedelta(days=days)
+
+
+def with_expiry(collection: str, data: dict, status=None):
+    """Returns `data` stamped with its `expire_at` field."""
+    status = status if status is not None else data.get("status")
+    return {**data, EXPIRE_FIELD: expire_at(collection, status)}
+
+
+def sweep_expired(db, collection: str, now=None):
+    """Deletes docs whose `expire_at` has passed. Mirrors the Firestore TTL policy."""
+    cutoff = now or datetime.now()
+    stale = db.collection(collection).where(filter=FieldFilter(EXPIRE_FIELD, "<", cutoff))
+
+    batch = db.batch()
+    count = 0
+    for doc in stale.select([]).stream(): # References only; the documents are never read
+        batch.delete(doc.reference)
+        count += 1
+        if count % SWEEP_BATCH == 0:
+            batch.commit()
+            batch = db.batch()
+    if count % SWEEP_BATCH:
+        batch.commit()
+    return count
+
+
+def backfill_expiry(db, collection: str):
+    """Stamps `expire_at` on legacy docs written before the retention policy existed."""
+    batch = db.batch()
+    count = 0
+    fields = [EXPIRE_FIELD, "status", "timestamp", "sent_at", "created_at"]
+    for doc in db.collection(collection).select(fields).stream():
+        data = doc.to_dict()
+        if EXPIRE_FIELD in data:
+            continue
+        base = data.get("timestamp") or data.get("sent_at") or data.get("created_at")
+        base = base.replace(tzinfo=None) if base else None
+        batch.update(doc.reference, {EXPIRE_FIELD: expire_at(collection, data.get("status"), now=base)})
+        count += 1
+        if count % SWEEP_BATCH == 0:
+            batch.commit()
+            batch = db.batch()
+    if count % SWEEP_BATCH:
+        batch.commit()
+    return count
+
+
+if __name__ == "__main__":
+    from vta_core import db
+
+    if "--backfill" in sys.argv:
+        for name in RETENTION_DAYS:
+            print(f"🏷️  [Retention] Backfilled {backfill_expiry(db, name)} docs in '{name}'.")
+
+    print("🧹 [Retention] Sweeping expired documents...")
+    for name in RETENTION_DAYS:
+        print(f"   {name}: deleted {sweep_expired(db, name)}")
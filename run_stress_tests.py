@@ -1,20 +1,9 @@
-import os
 import asyncio
 from datetime import datetime
-from google import genai
-from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, firestore
+from vta_core import db, llm as client
 
 # 1. Setup
 MODEL_ID = "gemini-2.5-flash-lite-preview-09-2025"
-load_dotenv()
-
-if not firebase_admin._apps:
-    cred = credentials.Certificate("serviceAccount.json")
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
-client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
 
 # 2. Define the Test Scenarios
 test_scenarios = [
@@ -1,9 +1,13 @@
+import os
+import gc
+import sys
 import time
 import schedule
-import subprocess
 import logging
 import asyncio
+import resource
 from datetime import datetime
+import metrics
 
 # Configure Logging
 logging.basicConfig(
@@ -15,78 +19,206 @@ logging.basicConfig(
     ]
 )
 
-def run_scout_process():
+# Long-lived async runner: every job is a coroutine in this process, sharing
+# the warm Firestore/Gemini/Resend clients and BrowserPool from vta_core
+# (warmed once at startup). A failing job is logged and never takes the
+# others down; a job that is still running is not started twice.
+MEMORY_CEILING_MB = int(os.getenv("VTA_MEMORY_CEILING_MB", "1500")) # This process plus its Chromium children
+MEMORY_CHECK_SECONDS = 30
+RECYCLE_COOLDOWN_SECONDS = int(os.getenv("VTA_RECYCLE_COOLDOWN_SECONDS", "300")) # Between recycle attempts
+DISPATCH_EVERY_MINUTES = int(os.getenv("VTA_DISPATCH_EVERY_MINUTES", "15"))
+SCOUT_TICK_MINUTES = int(os.getenv("VTA_SCOUT_TICK_MINUTES", "15")) # Each board's own cadence decides if it is checked
+TICK_SECONDS = 1
+
+pool = None # vta_core's shared BrowserPool, fetched inside the event loop
+running = {} # job name -> asyncio.Task
+last_memory_check = 0.0
+last_recycle = float("-inf")
+
+
+def _process_mb(pid):
+    """Proportional set size (shared pages split between sharers), or RSS on older kernels."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    with open(f"/proc/{pid}/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def tree_mb():
     """
-    Runs the main VTA Master loop in a separate process.
-    This ensures a clean Playwright/Browser session every time (prevents memory leaks).
+    Memory of this process and all its descendants: the Playwright driver and
+    every Chromium process (peak RSS of this process where /proc is unavailable).
     """
-    logging.info("🚀 [Job: Scout] Starting vta_master.py...")
+    if not os.path.isdir("/proc/self"):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue  # Exited while we looked
+        children.setdefault(ppid, []).append(int(entry))
+    total, todo = 0.0, [os.getpid()]
+    while todo:
+        pid = todo.pop()
+        try:
+            total += _process_mb(pid)
+        except OSError:
+            pass
+        todo.extend(children.get(pid, []))
+    return total
+
+async def run_job(name: str, job):
+    started = time.perf_counter()
+    logging.info(f"🚀 [Job: {name}] Starting...")
+    outcome = "ok"
     try:
-        # 'capture_output=True' allows us to log the script's print statements here
-        result = subprocess.run(["python", "vta_master.py"], capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            logging.info(f"✅ [Job: Scout] Success.\nOutput Snippet: {result.stdout[-200:]}") # Log last 200 chars
-        else:
-            logging.error(f"❌ [Job: Scout] Failed.\nError: {result.stderr}")
-            
+        await job()
+        logging.info(f"✅ [Job: {name}] Success in {time.perf_counter() - started:.1f}s.")
     except Exception as e:
-        logging.error(f"❌ [Job: Scout] Execution Exception: {e}")
+        outcome = "error"
+        logging.error(f"❌ [Job: {name}] Failed after {time.perf_counter() - started:.1f}s: {e!r}")
+    finally:
+        running.pop(name, None)
+        metrics.JOB_RUNS.inc(job=name, outcome=outcome)
+        metrics.JOB_SECONDS.observe(time.perf_counter() - started, job=name)
+
+def launch(name: str, job):
+    """`schedule` callback: starts the job as a task unless its previous run is still going."""
+    if name in running:
+        logging.info(f"⏭️  [Job: {name}] Previous run still in progress; skipping.")
+        return
+    running[name] = asyncio.get_running_loop().create_task(run_job(name, job))
 
-def run_weekly_digest_pipeline():
+async def run_scout():
+    """The VTA Master cycle, on the shared browser pool."""
+    import vta_master
+    logging.info(await vta_master.run_vta_production_cycle(pool))
+
+async def run_dispatch_job():
+    """Delivers anything the scout cycles queued (the realtime worker may run alongside)."""
+    from dispatch_scored_alerts import db, build_briefing
+    from email_delivery import run_dispatch
+    stats = await run_dispatch(db, build_briefing)
+    logging.info(f"   📬 {stats.summary()}")
+
+async def run_hygiene():
+    """
+    Sweeps documents whose `expire_at` has passed.
+    Firestore's TTL policy does this in production; this covers the emulator and local runs.
+    """
+    import retention
+    from vta_master import db
+    for name in retention.RETENTION_DAYS:
+        deleted = await asyncio.to_thread(retention.sweep_expired, db, name)
+        logging.info(f"   🧹 {name}: deleted {deleted}")
+
+async def run_weekly_digest_pipeline():
     """
     Orchestrates the Digest creation and Substack publishing.
-    Uses imports so we can pass the 'letter' text variable directly.
+    Passes the 'letter' text directly to the publisher.
     """
-    logging.info("☕ [Job: Digest] Starting Weekly Newsletter Pipeline...")
-    
-    try:
-        # Import here to avoid early initialization issues
-        import generate_weekly_digest
-        import vta_publisher
-
-        # 1. Generate the content
-        logging.info("   1. Fetching signals and writing letter...")
-        signals = generate_weekly_digest.fetch_weekly_signals()
-        
-        if not signals:
-            logging.info("   ℹ️ No signals found this week. Skipping publication.")
-            return
-
-        letter_html = generate_weekly_digest.write_hcr_letter(signals)
-        
-        # 2. Publish to Substack
-        title = f"The Machinery of Democracy: {datetime.now().strftime('%B %d, %Y')}"
-        logging.info(f"   2. Publishing draft '{title}' to Substack...")
-        
-        # We need a fresh event loop for this async call
-        asyncio.run(vta_publisher.post_to_substack(title, letter_html))
-        
-        logging.info("✅ [Job: Digest] Pipeline Complete. Draft saved.")
-        
-    except Exception as e:
-        logging.error(f"❌ [Job: Digest] Failed: {e}")
+    import generate_weekly_digest
+    import vta_publisher
+
+    # 1. Generate the content (blocking model calls run off the event loop)
+    logging.info("   1. Fetching signals and writing letter...")
+    signals, ledger = await asyncio.to_thread(generate_weekly_digest.weekly_digest_input)
+
+    if not signals:
+        logging.info("   ℹ️ No signals found this week. Skipping publication.")
+        return
+
+    letter_html = await asyncio.to_thread(generate_weekly_digest.write_hcr_letter, signals, ledger)
+    logging.info(ledger.report())
+
+    # 2. Publish to Substack
+    title = f"The Machinery of Democracy: {datetime.now().strftime('%B %d, %Y')}"
+    logging.info(f"   2. Publishing draft '{title}' to Substack...")
+    await vta_publisher.post_to_substack(title, letter_html, pool)
+
+async def check_memory():
+    """
+    Restarts the browser when over the ceiling; exits for the supervisor if that is not enough.
+    Measures every MEMORY_CHECK_SECONDS and recycles at most once per RECYCLE_COOLDOWN_SECONDS.
+    """
+    global last_memory_check, last_recycle
+    now = time.monotonic()
+    if now - last_memory_check < MEMORY_CHECK_SECONDS:
+        return
+    last_memory_check = now
+    used = await asyncio.to_thread(tree_mb)
+    metrics.RSS_MB.set(round(used, 1))
+    if used < MEMORY_CEILING_MB or now - last_recycle < RECYCLE_COOLDOWN_SECONDS:
+        return
+    last_recycle = now
+    logging.warning(f"⚠️  Memory {used:.0f} MB over the {MEMORY_CEILING_MB} MB ceiling; recycling.")
+    if not await pool.restart():
+        logging.info(f"   Browser busy; trying again in {RECYCLE_COOLDOWN_SECONDS}s.")
+    gc.collect()
+    if await asyncio.to_thread(tree_mb) >= MEMORY_CEILING_MB and not running:
+        logging.error("❌ Still over the memory ceiling while idle; exiting so the supervisor restarts us.")
+        await pool.close()
+        sys.exit(3)
 
 # --- SCHEDULE CONFIGURATION ---
 
-# 1. The Scout: Runs every 6 hours (00:00, 06:00, 12:00, 18:00 roughly)
-schedule.every(6).hours.do(run_scout_process)
+# 1. The Scout: Wakes every few minutes; only boards due under their adaptive cadence are checked
+schedule.every(SCOUT_TICK_MINUTES).minutes.do(launch, "Scout", run_scout)
 
-# 2. The Digest: Runs every Friday at 09:00 AM
+# 2. Dispatch: Sweeps the dispatch queue for anything not yet delivered
+schedule.every(DISPATCH_EVERY_MINUTES).minutes.do(launch, "Dispatch", run_dispatch_job)
+
+# 3. The Digest: Runs every Friday at 09:00 AM
 # Note: Ensure your server time is set correctly or adjust for UTC.
-schedule.every().friday.at("09:00").do(run_weekly_digest_pipeline)
+schedule.every().friday.at("09:00").do(launch, "Digest", run_weekly_digest_pipeline)
+
+# 4. Hygiene: Daily sweep of expired documents (kept out of the Scout's critical path)
+schedule.every().day.at("03:30").do(launch, "Hygiene", run_hygiene)
 
 # --- HEARTBEAT ---
 
+async def main():
+    global pool
+    import vta_core
+    pool = vta_core.browser_pool()
+    metrics.serve() # Only if VTA_METRICS_PORT is set
+
+    # Import the job modules (cheap: nothing connects at import) and build the clients now
+    import vta_master, dispatch_scored_alerts, generate_weekly_digest, vta_publisher # noqa: F401
+    for client in (vta_core.db, vta_core.llm, vta_core.email):
+        client.resolve()
+    logging.info("🔥 Clients warm; browser pool ready.")
+
+    # Optional: Run the Scout immediately on startup to prove it works
+    # launch("Scout", run_scout)
+
+    try:
+        while True:
+            schedule.run_pending()
+            await check_memory()
+            await asyncio.sleep(TICK_SECONDS)
+    finally:
+        await pool.close()
+
 if __name__ == "__main__":
     print(f"⏱️  VTA Scheduler Online at {datetime.now().strftime('%H:%M:%S')}")
-    print("    - Scout Job:    Every 6 hours")
+    print(f"    - Scout Job:    Every {SCOUT_TICK_MINUTES} minutes (per-board adaptive cadence)")
+    print(f"    - Dispatch Job: Every {DISPATCH_EVERY_MINUTES} minutes")
     print("    - Digest Job:   Fridays @ 09:00 AM")
+    print("    - Hygiene Job:  Daily @ 03:30 AM")
+    print(f"    - Memory Cap:   {MEMORY_CEILING_MB} MB")
     print("    - Logs:         scheduler.log")
+    if metrics.METRICS_PORT:
+        print(f"    - Metrics:      :{metrics.METRICS_PORT}/metrics")
 
-    # Optional: Run the Scout immediately on startup to prove it works
-    # run_scout_process()
-
-    while True:
-        schedule.run_pending()
-        time.sleep(60) # Check every minute
\ No newline at end of file
+    asyncio.run(main())
@@ -1,11 +1,5 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
 from datetime import datetime
-
-if not firebase_admin._apps:
-    cred = credentials.Certificate("serviceAccount.json")
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
+from vta_core import db
 
 def seed_subscribers():
     print("🌱 Seeding Multi-Tenant Test Data...")
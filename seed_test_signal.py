@@ -1,11 +1,7 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
 from datetime import datetime
-
-if not firebase_admin._apps:
-    cred = credentials.Certificate("serviceAccount.json")
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
+from dispatch_queue import enqueue_dispatch
+from dashboard_views import add_to_feed
+from vta_core import db
 
 test_signal = {
     'subscriber_id': 'sub_chloe',
@@ -16,5 +12,8 @@ test_signal = {
     'timestamp': datetime.now()
 }
 
-db.collection('signals').add(test_signal)
-print('🚀 High-Value Test Signal successfully seeded in Firestore.')
\ No newline at end of file
+# Dispatchers lease from the dispatch queue, so queue it (and show it in the feed) like the cycle does
+_, sig_ref = db.collection('signals').add(test_signal)
+enqueue_dispatch(db, sig_ref.id, test_signal)
+add_to_feed(db, sig_ref.id, test_signal)
+print('🚀 High-Value Test Signal successfully seeded in Firestore.')
@@ -1,110 +1,59 @@
-import os
-import hashlib
-import resend
+import asyncio
 from datetime import datetime
-from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, firestore
-from google.cloud.firestore_v1.base_query import FieldFilter
+from near_dupe import NearDupeIndex
+from email_delivery import run_dispatch
+from alert_templates import build_email
+from vta_core import db
 
 # 1. Setup & Environment
-load_dotenv()
-resend.api_key = os.getenv("RESEND_API_KEY")
-
-if not firebase_admin._apps:
-    cred = credentials.Certificate("serviceAccount.json")
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
-
-def get_content_hash(subscriber_id, analysis_text):
-    """Creates a unique fingerprint for a signal to prevent duplicates."""
-    # We hash the subscriber ID + the first 100 chars of analysis 
-    # to identify if we've sent this specific info to this specific person before.
-    combined = f"{subscriber_id}_{analysis_text[:100]}"
-    return hashlib.sha256(combined.encode()).hexdigest()
+# Near-duplicate index, loaded lazily per subscriber for this run
+dedupe = NearDupeIndex(db)
 
 def dispatch_alerts():
     print(f"📧 [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Starting Dispatcher...")
     
-    # Fetch all signals that are 'unread'
-    query = db.collection("signals").where(filter=FieldFilter("status", "==", "unread"))
-    new_signals = query.stream()
+    # Lease pending entries from the dispatch queue instead of scanning 'signals'.
+    # Only signals scoring DISPATCH_MIN_SCORE (7) or more are queued, so unread
+    # signals below that are no longer emailed from here
+    stats = asyncio.run(run_dispatch(db, build_alert, should_send=is_fresh, log_sent=remember_sent))
+
+    if stats.requests + stats.skipped + stats.dead == 0:
+        print("ℹ️  No unread signals found.")
+    else:
+        print(f"📬 Dispatch complete: {stats.summary()}")
+
+def is_fresh(job):
+    sig, sub_id = job['signal'], job['signal'].get('subscriber_id')
+    sig_id = job['entry']['signal_id']
     
-    count = 0
-    for doc in new_signals:
-        count += 1
-        sig = doc.to_dict()
-        sig_id = doc.id
-        sub_id = sig.get('subscriber_id')
-        
-        # A. Look up the subscriber
-        sub_doc = db.collection("subscribers").document(sub_id).get()
-        if not sub_doc.exists:
-            print(f"⚠️  Subscriber {sub_id} not found. Skipping.")
-            continue
-        
-        sub_data = sub_doc.to_dict()
-        email_address = sub_data.get("email")
-        
-        # B. DEDUPLICATION CHECK
-        # We check a 'sent_notifications' log to ensure this content is fresh for this user
-        content_hash = get_content_hash(sub_id, sig['analysis'])
-        log_ref = db.collection("sent_notifications").document(content_hash)
-        
-        if log_ref.get().exists:
-            print(f"⏭️  Already sent similar info to {email_address}. Marking notified and skipping email.")
-            db.collection("signals").document(sig_id).update({"status": "notified"})
-            continue
+    # B. DEDUPLICATION CHECK
+    # Compare against MinHash signatures of what this user received recently,
+    # and of what this run already accepted for them (e.g. earlier in the page)
+    match = dedupe.claim(sub_id, sig_id, sig['analysis'])
+    if match:
+        entry, score = match
+        print(f"⏭️  Already sent similar info to {job['subscriber'].get('email')} "
+              f"({score:.0%} like {entry.get('signal_id')}). Marking notified and skipping email.")
+        return False
+    return True
 
-        # C. SEND THE PROFESSIONAL BRIEFING
-        print(f"✉️  Dispatching to {email_address} (Industry: {sig.get('industry', 'General')})...")
-        
-        try:
-            resend.Emails.send({
-                "from": "VTA Intelligence <alerts@aiyoda.app>",
-                "to": [email_address],
-                "subject": f"🚨 ACTION REQUIRED: {sig.get('industry', 'New Signal')} Update",
-                "html": f"""
-                <div style="font-family: sans-serif; max-width: 600px; margin: auto; border: 1px solid #eee; border-top: 4px solid #2c3e50; padding: 20px; color: #333;">
-                    <h2 style="color: #2c3e50; margin-top: 0;">Vancouver Transparency Agent</h2>
-                    <p style="color: #7f8c8d; font-size: 14px; margin-bottom: 20px;">Bespoke Intelligence Briefing for {sig.get('industry')}</p>
-                    
-                    <div style="background-color: #f9f9f9; padding: 15px; border-radius: 5px; line-height: 1.6;">
-                        {sig['analysis'].replace('\n', '<br>')}
-                    </div>
-                    
-                    <p style="margin-top: 25px; font-size: 13px; color: #95a5a6;">
-                        <em>Source: Vancouver Municipal Portal (CivicClerk)</em>
-                    </p>
-                    
-                    <hr style="border: 0; border-top: 1px solid #eee; margin: 20px 0;">
-                    
-                    <footer style="font-size: 11px; color: #bdc3c7; text-align: center;">
-                        You received this because your Interest Profile matches recent City Council activity. 
-                        Manage your alerts at <a href="https://aiyoda.app" style="color: #3498db; text-decoration: none;">aiyoda.app</a>
-                    </footer>
-                </div>
-                """
-            })
-            
-            # D. LOG SUCCESS & UPDATE STATE
-            # Update the signal to notified
-            db.collection("signals").document(sig_id).update({"status": "notified"})
-            
-            # Log the hash so we never send this specific info to this user again
-            log_ref.set({
-                "subscriber_id": sub_id,
-                "sent_at": datetime.now(),
-                "signal_id": sig_id
-            })
-            
-            print(f"✅ Success! User notified and de-dupe log created.")
-            
-        except Exception as e:
-            print(f"❌ Resend Error: {e}")
+def remember_sent(sent):
+    # D. LOG SUCCESS: only signals whose email was accepted join the index,
+    # one write per subscriber, committed with the 'notified' updates.
+    # Signals held for a briefing that failed are dropped and retried later
+    by_subscriber = {}
+    for job in sent:
+        by_subscriber.setdefault(job['signal']['subscriber_id'], []).append(
+            (job['entry']['signal_id'], job['signal']['analysis']))
+    writes = [dedupe.remember(sub_id, signals) for sub_id, signals in by_subscriber.items()]
+    dedupe.release_held()
+    return writes
 
-    if count == 0:
-        print("ℹ️  No unread signals found.")
+def build_alert(sub_data, jobs):
+    # C. THE PROFESSIONAL BRIEFING (one per subscriber, highest score first)
+    industries = ", ".join(dict.fromkeys(job['signal'].get('industry', 'General') for job in jobs))
+    print(f"✉️  Dispatching {len(jobs)} signal(s) to {sub_data.get('email')} (Industry: {industries})...")
+    return build_email("vta", sub_data, jobs)
 
 if __name__ == "__main__":
     dispatch_alerts()
\ No newline at end of file
@@ -1,27 +1,13 @@
-import os
 import asyncio
 from datetime import datetime
 from fastmcp import FastMCP
 from playwright.async_api import async_playwright
-from google import genai
-from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, firestore
+import metrics
+from vta_core import db, llm as client
 
 # Configuration - Using the cheapest/efficient model per your instructions
 MODEL_ID = "gemini-2.5-flash-lite-preview-09-2025"
 
-load_dotenv()
-
-# Initialize Memory (Firestore)
-if not firebase_admin._apps:
-    cred = credentials.Certificate("serviceAccount.json")
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
-
-# Initialize Brain (Gemini 2.5)
-client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
-
 mcp = FastMCP("VancouverTransparencyAgent")
 
 async def scrape_portal(url: str, board_search_text: str):
@@ -104,10 +90,13 @@ async def run_intelligence_pass(org_id: str, board_id: str, user_id: str, indust
     {raw_text}
     """
     
-    response = client.models.generate_content(
-        model=MODEL_ID,
-        contents=prompt
-    )
+    with metrics.llm_call("mcp") as call:
+        response = call.response = client.models.generate_content(
+            model=MODEL_ID,
+            contents=prompt
+        )
+        if "NO_RELEVANT_SIGNAL" in response.text:
+            call.outcome = "no_signal"
     
     analysis = response.text
 
@@ -129,4 +118,5 @@ async def run_intelligence_pass(org_id: str, board_id: str, user_id: str, indust
     return f"ℹ️ No matches found for {board_name}."
 
 if __name__ == "__main__":
+    metrics.serve() # Only if VTA_METRICS_PORT is set
     mcp.run()
\ No newline at end of file
@@ -1,10 +1,4 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
-
-if not firebase_admin._apps:
-    cred = credentials.Certificate("serviceAccount.json")
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
+from vta_core import db
 
 def update_vancouver_boards():
     print("🔄 Updating Vancouver Organization with Planning Commission...")
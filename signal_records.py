@@ -0,0 +1,58 @@
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+# Compact Signal Reads
+# Digest and analytics readers page through `signals` with a field projection
+# that leaves out the long `analysis` text, and keep one small slotted record
+# per signal. The analysis is fetched afterwards, in batched reads, only for
+# the records that are actually used.
+
+SUMMARY_FIELDS = ["timestamp", "industry", "score", "related_meeting_id", "subscriber_id", "status"]
+READ_PAGE_SIZE = 500
+ANALYSIS_BATCH = 100
+
+
+class SignalRecord:
+    __slots__ = ("id", "timestamp", "industry", "board", "score", "subscriber_id", "status", "analysis")
+
+    def __init__(self, doc_id: str, data: dict):
+        self.id = doc_id
+        self.timestamp = data.get("timestamp")
+        self.industry = data.get("industry") or "General"
+        meeting_id = data.get("related_meeting_id") or ""
+        self.board = meeting_id.rsplit("_", 1)[0] or None # meeting_records ids are <board_key>_<YYYYMMDD>
+        self.score = data.get("score", 0)
+        self.subscriber_id = data.get("subscriber_id")
+        self.status = data.get("status")
+        self.analysis = None  # Loaded on demand by load_analyses
+
+
+def iter_signals(db, since, until=None, page_size=READ_PAGE_SIZE):
+    """Yields SignalRecords with `timestamp >= since` (and `< until`), one projected page at a time."""
+    query = db.collection("signals").where(filter=FieldFilter("timestamp", ">=", since))
+    if until:
+        query = query.where(filter=FieldFilter("timestamp", "<", until))
+    query = query.order_by("timestamp").select(SUMMARY_FIELDS).limit(page_size)
+
+    last = None
+    while True:
+        page = list((query.start_after(last) if last else query).stream())
+        for snap in page:
+            yield SignalRecord(snap.id, snap.to_dict())
+        if len(page) < page_size:
+            return
+        last = page[-1]
+
+
+def load_analyses(db, records):
+    """Fills `analysis` on `records` with batched, projected reads."""
+    by_id = {r.id: r for r in records if r.analysis is None}
+    ids = list(by_id)
+    for start in range(0, len(ids), ANALYSIS_BATCH):
+        refs = [db.collection("signals").document(i) for i in ids[start:start + ANALYSIS_BATCH]]
+        for snap in db.get_all(refs, field_paths=["analysis"]):
+            if snap.exists:
+                by_id[snap.id].analysis = (snap.to_dict() or {}).get("analysis", "")
+    for record in by_id.values():
+        if record.analysis is None:
+            record.analysis = ""
+    return records
@@ -1,17 +1,5 @@
-import os
 from datetime import datetime
-from google import genai
-from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, firestore
-
-load_dotenv()
-
-# Initialize Firestore
-if not firebase_admin._apps:
-    cred = credentials.Certificate("serviceAccount.json")
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
+from vta_core import db
 
 def test_save():
     print("🚀 Testing Firestore write...")
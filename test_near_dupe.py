@@ -0,0 +1,108 @@
+import asyncio
+from datetime import datetime, timedelta
+import email_delivery
+import send_alerts
+from near_dupe import NearDupeIndex
+
+# Unit test (no Firestore, no Resend): python -m pytest test_near_dupe.py
+
+SENT_ANALYSIS = "Council approves $4M fibre expansion along the Main Street corridor, tender closes in March."
+REWORDED_ANALYSIS = "Main Street corridor fibre expansion ($4M) approved by council; the tender closes in March."
+FAILED_ANALYSIS = "Planning board rezones the harbour lands for a 40-storey mixed-use tower; hearing set for June."
+
+
+class FakeSnapshot:
+    exists = False
+
+    def to_dict(self):
+        return None
+
+
+class FakeRef:
+    def __init__(self, path):
+        self.path = path
+
+    def get(self):
+        return FakeSnapshot()
+
+
+class FakeCollection:
+    def __init__(self, name):
+        self.name = name
+
+    def document(self, doc_id):
+        return FakeRef(f"{self.name}/{doc_id}")
+
+
+class FakeDb:
+    def collection(self, name):
+        return FakeCollection(name)
+
+
+def job(signal_id, analysis, timestamp):
+    return {
+        "entry": {"id": signal_id, "signal_id": signal_id},
+        "signal": {"subscriber_id": "sub-1", "analysis": analysis, "score": 8, "timestamp": timestamp},
+        "subscriber": {"email": "ops@example.com"},
+    }
+
+
+def dispatch_page(monkeypatch, db, jobs, failing=()):
+    """Runs send_alerts' dispatch over one leased page; returns what was committed."""
+    monkeypatch.setattr(send_alerts, "dedupe", NearDupeIndex(db))
+    monkeypatch.setattr(email_delivery, "iter_leased_pages", lambda db, owner, page_size: iter([[j["entry"] for j in jobs]]))
+    monkeypatch.setattr(email_delivery, "load_jobs", lambda db, page: (jobs, []))
+    monkeypatch.setattr(email_delivery, "open_round", lambda *args: None)
+
+    async def deliver(requests, keys, stats=None):
+        return [RuntimeError("boom") if key in failing else None for key in keys]
+    monkeypatch.setattr(email_delivery, "deliver", deliver)
+    monkeypatch.setattr(email_delivery, "batch_key", lambda briefing_ids: briefing_ids[0][0])
+
+    committed = {}
+
+    def commit_results(db, sent, failed, skipped=(), dead=(), log_writes=()):
+        committed.update(sent=[job for batch in sent for group in batch["briefings"] for job in group],
+                         failed=[(job["entry"], error) for batch, error in failed for group in batch["briefings"] for job in group],
+                         skipped=list(skipped), log_writes=list(log_writes))
+        return [{"status": "failed"} for _ in committed["failed"]]
+    monkeypatch.setattr(email_delivery, "commit_results", commit_results)
+
+    build = lambda sub, group: {"to": [sub["email"]], "sections": len(group)}
+    asyncio.run(email_delivery.run_dispatch(db, build, should_send=send_alerts.is_fresh,
+                                            log_sent=send_alerts.remember_sent))
+    return committed
+
+
+def test_failed_send_is_not_remembered(monkeypatch):
+    db = FakeDb()
+    now = datetime.now()
+    # Far enough apart to become two briefings; one per batch, and the second batch fails
+    monkeypatch.setattr(email_delivery, "BATCH_SIZE", 1)
+    jobs = [job("sig-sent", SENT_ANALYSIS, now - timedelta(days=1)), job("sig-failed", FAILED_ANALYSIS, now)]
+    committed = dispatch_page(monkeypatch, db, jobs, failing={"sig-failed"})
+
+    assert [j["entry"]["signal_id"] for j in committed["sent"]] == ["sig-sent"]
+    assert [entry["signal_id"] for entry, _ in committed["failed"]] == ["sig-failed"]
+    # One index write for the subscriber, holding only the delivered signal
+    assert len(committed["log_writes"]) == 1
+    ref, data = committed["log_writes"][0]
+    assert ref.path == "dedupe_index/sub-1"
+    assert [e["signal_id"] for e in data["entries"]] == ["sig-sent"]
+
+    # A later copy of the undelivered signal still goes out; a copy of the delivered one does not
+    assert send_alerts.is_fresh(job("sig-later", FAILED_ANALYSIS, now)) is True
+    assert send_alerts.is_fresh(job("sig-again", SENT_ANALYSIS, now)) is False
+
+
+def test_duplicates_in_one_page_are_sent_once(monkeypatch):
+    db = FakeDb()
+    now = datetime.now()
+    # One meeting, two matching profiles of the same subscriber: leased together
+    jobs = [job("sig-a", SENT_ANALYSIS, now), job("sig-b", REWORDED_ANALYSIS, now), job("sig-c", FAILED_ANALYSIS, now)]
+    committed = dispatch_page(monkeypatch, db, jobs)
+
+    assert sorted(j["entry"]["signal_id"] for j in committed["sent"]) == ["sig-a", "sig-c"]
+    assert [j["entry"]["signal_id"] for j in committed["skipped"]] == ["sig-b"]
+    _, data = committed["log_writes"][0]
+    assert sorted(e["signal_id"] for e in data["entries"]) == ["sig-a", "sig-c"]
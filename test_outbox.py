@@ -0,0 +1,217 @@
+import asyncio
+import time
+from firebase_admin import firestore
+from google.api_core import exceptions
+import outbox as outbox_module
+from outbox import Outbox, increment
+from board_leases import SQLiteLeaseStore
+
+# Unit test (no Firestore; local SQLite only): python -m pytest test_outbox.py
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+def _merge(target, data):
+    for field, value in data.items():
+        if value is firestore.DELETE_FIELD:
+            target.pop(field, None)
+        elif isinstance(value, firestore.Increment):
+            target[field] = target.get(field, 0) + value.value
+        elif isinstance(value, dict):
+            _merge(target.setdefault(field, {}), value)
+        else:
+            target[field] = value
+
+
+class FakeRef:
+    def __init__(self, db, path):
+        self.db = db
+        self.path = path
+        self.id = path.split("/")[-1]
+
+    def get(self, transaction=None):
+        return FakeSnapshot(self.id, self.db.docs.get(self.path))
+
+    def _check(self):
+        if self.db.failing.get(self.path):
+            raise self.db.failing[self.path].pop(0)
+
+    def set(self, data, merge=False):
+        self._check()
+        if not merge or self.path not in self.db.docs:
+            self.db.docs[self.path] = {}
+        _merge(self.db.docs[self.path], data)
+
+    def update(self, data):
+        self._check()
+        if self.path not in self.db.docs:
+            raise exceptions.NotFound(f"No document to update: {self.path}")
+        _merge(self.db.docs[self.path], data)
+
+
+class FakeCollection:
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+
+    def document(self, doc_id):
+        return FakeRef(self.db, f"{self.name}/{doc_id}")
+
+
+class FakeTransaction:
+    """Buffers writes until commit, like a Firestore transaction run by @firestore.transactional."""
+    _read_only = False
+    _max_attempts = 1
+    _id = b"fake"
+
+    def __init__(self):
+        self._writes = []
+
+    def _clean_up(self):
+        self._writes = []
+
+    def _begin(self, retry_id=None):
+        pass
+
+    def _commit(self):
+        for write in self._writes:
+            write()
+        self._clean_up()
+
+    def _rollback(self):
+        self._clean_up()
+
+    def set(self, ref, data, merge=False):
+        self._writes.append(lambda: ref.set(data, merge=merge))
+
+    def update(self, ref, data):
+        self._writes.append(lambda: ref.update(data))
+
+
+class FakeDb:
+    def __init__(self):
+        self.docs = {}
+        self.failing = {}  # path -> exceptions raised by the next writes to it
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def transaction(self):
+        return FakeTransaction()
+
+
+def test_replays_unflushed_writes_after_restart(tmp_path):
+    db, path = FakeDb(), str(tmp_path / "outbox.db")
+    box = Outbox(db, path)
+    box.set("meeting_records", "rec-1", {"summary": "Rezoning approved"})
+    box.update("meeting_records", "rec-1", {"score": 8})
+    box.close()  # Crash before the flusher ran
+
+    box = Outbox(db, path)
+    assert box.pending_count() == 2
+    assert box.flush_once() == 2
+    assert db.docs["meeting_records/rec-1"] == {"summary": "Rezoning approved", "score": 8}
+    assert box.pending_count() == 0
+    box.close()
+
+
+def test_increment_is_applied_once(tmp_path):
+    db = FakeDb()
+    box = Outbox(db, str(tmp_path / "outbox.db"))
+    box.set("weekly_aggregates", "2026-10-23", {"total": increment(1)}, merge=True, key="weekly__sig-1")
+    box.set("weekly_aggregates", "2026-10-23", {"total": increment(1)}, merge=True, key="weekly__sig-1")
+    assert box.pending_count() == 1  # A repeated key is ignored
+
+    assert box.flush_once() == 1
+    assert db.docs["weekly_aggregates/2026-10-23"] == {"total": 1}
+    assert "outbox_applied/weekly__sig-1" in db.docs
+
+    # Crash between the Firestore commit and recording the flush: the replay must not count again
+    with box.transaction() as conn:
+        conn.execute("UPDATE outbox SET flushed_at = NULL")
+    assert box.flush_once() == 1
+    assert db.docs["weekly_aggregates/2026-10-23"] == {"total": 1}
+    box.close()
+
+
+def test_stale_fence_is_dropped(tmp_path):
+    db = FakeDb()
+    leases = SQLiteLeaseStore(str(tmp_path / "leases.db"))
+    box = Outbox(db, str(tmp_path / "outbox.db"))
+    box.fence_check = leases.current_token
+    forgotten = []
+    box.on_fenced = forgotten.append
+
+    token = leases.acquire("org__board", "worker-a", seconds=0)
+    with box.fenced("org__board", token):
+        box.update("organizations", "org", {"last_processed.board": "fp-old"})
+    box.set("board_schedule", "org__board", {"checks": 1})  # Not fenced
+
+    # Worker A stalled; worker B took the board over
+    assert leases.acquire("org__board", "worker-b") == token + 1
+    assert leases.renew("org__board", "worker-a", token) is False
+    assert box.flush_once() == 1
+    assert "organizations/org" not in db.docs
+    assert db.docs["board_schedule/org__board"] == {"checks": 1}
+    assert forgotten == ["org__board"]
+    assert box.pending_count() == 0
+
+    # B's own writes carry over when B re-acquires with nobody in between
+    with box.fenced("org__board", token + 1):
+        box.set("organizations", "org", {"last_processed": {"board": "fp-new"}}, merge=True)
+    leases.release("org__board", "worker-b", token + 1)
+    box.refence("org__board", leases.acquire("org__board", "worker-b"))
+    assert box.flush_once() == 1
+    assert db.docs["organizations/org"] == {"last_processed": {"board": "fp-new"}}
+    box.close()
+    leases.close()
+
+
+def test_failing_write_blocks_only_its_document(tmp_path, monkeypatch):
+    monkeypatch.setattr(outbox_module, "MAX_ATTEMPTS", 2)
+    db = FakeDb()
+    box = Outbox(db, str(tmp_path / "outbox.db"))
+    db.failing["signals/sig-1"] = [exceptions.ServiceUnavailable("try again"), exceptions.ServiceUnavailable("still down")]
+    box.set("signals", "sig-1", {"status": "unread", "score": 8})
+    box.set("signals", "sig-1", {"status": "notified"}, merge=True)
+    box.set("signals", "sig-2", {"status": "unread"})
+    box.update("signals", "sig-3", {"status": "notified"})  # Deleted doc: rejected outright
+
+    assert box.flush_once() == 1
+    assert db.docs == {"signals/sig-2": {"status": "unread"}}
+    assert box.dead_count() == 1  # sig-3, at once
+    assert box.pending_count() == 2  # sig-1's writes, the second held back by the first
+
+    # The retry fails again and hits MAX_ATTEMPTS; the write behind it is no longer held back
+    with box.transaction() as conn:
+        conn.execute("UPDATE outbox SET next_attempt_at = 0")
+    assert box.flush_once() == 1
+    assert box.dead_count() == 2
+    assert box.pending_count() == 0
+    assert db.docs["signals/sig-1"] == {"status": "notified"}
+    box.close()
+
+
+def test_board_drain_ignores_unrelated_backlog(tmp_path):
+    db = FakeDb()
+    box = Outbox(db, str(tmp_path / "outbox.db"))
+    box.set("signals", "sig-1", {"status": "unread"})
+    with box.transaction() as conn:  # Unrelated write stuck in backoff
+        conn.execute("UPDATE outbox SET attempts = 3, next_attempt_at = ?", (time.time() + 3600,))
+    with box.fenced("org__board", 1):
+        box.set("organizations", "org", {"last_processed": {"board": "fp"}}, merge=True)
+
+    started = time.monotonic()
+    assert asyncio.run(box.drain(30, fence=("org__board", 1))) == 0
+    assert time.monotonic() - started < 5
+    assert db.docs["organizations/org"] == {"last_processed": {"board": "fp"}}
+    assert asyncio.run(box.drain(0)) == 1  # The stuck write is still there for the cycle-end drain
+    box.close()
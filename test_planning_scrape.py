@@ -1,10 +1,5 @@
-import os
 import asyncio
-from google import genai
-from dotenv import load_dotenv
-
-load_dotenv()
-client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+from vta_core import llm as client
 
 # Import your scrape_portal function here or use a dummy version for testing
 async def run_planning_test():
@@ -1,16 +1,5 @@
-import os
 from datetime import datetime
-from google import genai
-from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, firestore
-
-load_dotenv()
-if not firebase_admin._apps:
-    cred = credentials.Certificate("serviceAccount.json")
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
-client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+from vta_core import db, llm as client
 
 async def run_multitenant_loop():
     # 1. Get ALL Active Profiles
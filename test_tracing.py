@@ -0,0 +1,28 @@
+import os
+from tracing import JsonlExporter, Span, percentile
+
+# Unit test (no services): python -m pytest test_tracing.py
+
+
+def test_percentile_nearest_rank():
+    assert percentile([10, 20], 50) == 10  # round() would pick 20 here (banker's rounding)
+    assert percentile([10, 20, 30, 40], 50) == 20
+    assert percentile(list(range(1, 21)), 95) == 19
+    assert percentile(list(range(1, 101)), 95) == 95
+    assert percentile([7], 50) == percentile([7], 95) == 7
+    assert percentile([3, 1, 2], 0) == 1
+    assert percentile([3, 1, 2], 100) == 3
+
+
+def test_exporter_rotates_at_trace_end(tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    exporter = JsonlExporter(path, max_bytes=200, backups=2)
+    for round_ in range(4):
+        for _ in range(3):
+            span = Span(f"round{round_}", "t", None, {})
+            span.ms = 1.0
+            exporter.export(span)
+        exporter.flush()
+    assert sorted(os.listdir(tmp_path)) == ["traces.jsonl.1", "traces.jsonl.2"]
+    with open(path + ".1", encoding="utf-8") as f:
+        assert all('"round3"' in line for line in f)
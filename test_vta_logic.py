@@ -1,25 +1,12 @@
-import os
 import asyncio
 from datetime import datetime
 from playwright.async_api import async_playwright
-from google import genai
-from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, firestore
 from google.cloud.firestore_v1.base_query import FieldFilter
+from vta_core import db, llm as client
 
 # Configuration
 MODEL_ID = "gemini-2.5-flash-lite-preview-09-2025"
 
-load_dotenv()
-
-if not firebase_admin._apps:
-    cred = credentials.Certificate("serviceAccount.json")
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
-
-client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
-
 async def get_latest_meeting_title(url: str, board_search_text: str):
     """
     Peeks at the portal to grab the most recent meeting date/title string.
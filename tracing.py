@@ -0,0 +1,220 @@
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Tracing
+# Lightweight spans for the production cycle: one trace per cycle, with
+# nested spans for each stage, board, profile, browser step, model call,
+# Firestore write and email batch. The current span rides a contextvar, so
+# it follows `await` and `asyncio.to_thread` without being passed around.
+# Finished spans are appended to a JSONL file (VTA_TRACE_PATH), one object
+# per line. Past VTA_TRACE_MAX_MB the file is rotated at the end of a trace
+# (traces.jsonl.1, .2, ...), keeping VTA_TRACE_BACKUPS old files; processes
+# that never close a trace rotate at twice that size:
+#
+#   {"trace": .., "span": .., "parent": .., "name": "llm.watchdog",
+#    "start": 1718000000.1, "ms": 812.4, "attrs": {"prompt_tokens": 9120}}
+#
+#   python tracing.py [traces.jsonl]   # p50/p95 report for the latest cycle
+
+TRACE_PATH = os.getenv("VTA_TRACE_PATH", "traces.jsonl")
+TRACE_ENABLED = os.getenv("VTA_TRACE", "1") == "1"
+TRACE_MAX_BYTES = float(os.getenv("VTA_TRACE_MAX_MB", "50")) * 2**20
+TRACE_BACKUPS = int(os.getenv("VTA_TRACE_BACKUPS", "3"))
+
+_current = contextvars.ContextVar("vta_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attrs", "start", "ms")
+
+    def __init__(self, name, trace_id, parent_id, attrs):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+        self.start = time.time()
+        self.ms = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self):
+        return {"trace": self.trace_id, "span": self.span_id, "parent": self.parent_id, "name": self.name,
+                "start": round(self.start, 3), "ms": round(self.ms, 1), "attrs": self.attrs}
+
+
+class JsonlExporter:
+    def __init__(self, path=TRACE_PATH, max_bytes=TRACE_MAX_BYTES, backups=TRACE_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+        self._file = None
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line + "\n")
+            self._rotate_past(2 * self.max_bytes)
+
+    def flush(self):
+        """Flushes, and rotates the file if it has grown past `max_bytes` (so a trace stays in one file)."""
+        with self._lock:
+            if self._file:
+                self._file.flush()
+                self._rotate_past(self.max_bytes)
+
+    def _rotate_past(self, limit):
+        if self._file.tell() < limit:
+            return
+        self._file.close()
+        self._file = None
+        if self.backups < 1:
+            os.remove(self.path)
+            return
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+
+class Tracer:
+    def __init__(self, exporter=None, enabled=TRACE_ENABLED):
+        self.exporter = exporter or JsonlExporter()
+        self.enabled = enabled
+        self._finished = {}  # trace_id -> [Span], for traces opened with trace()
+        self._lock = threading.Lock()
+
+    def span(self, name: str, **attrs):
+        """Times the block as a child of the current span (a new, export-only trace if there is none)."""
+        return self._span(name, attrs)
+
+    def trace(self, name: str, **attrs):
+        """Opens a root span whose whole trace is kept in memory until finish_trace()."""
+        trace_id = uuid.uuid4().hex[:16]
+        if self.enabled:
+            with self._lock:
+                self._finished[trace_id] = []
+        return self._span(name, attrs, trace_id)
+
+    @contextmanager
+    def _span(self, name, attrs, trace_id=None):
+        if not self.enabled:
+            yield _NOOP
+            return
+        parent = None if trace_id else _current.get()
+        span = Span(name, trace_id or (parent.trace_id if parent else uuid.uuid4().hex[:16]),
+                    parent.span_id if parent else None, attrs)
+        token = _current.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs["error"] = type(e).__name__
+            raise
+        finally:
+            span.ms = (time.perf_counter() - started) * 1000
+            _current.reset(token)
+            with self._lock:
+                if span.trace_id in self._finished:
+                    self._finished[span.trace_id].append(span)
+            try:
+                self.exporter.export(span)
+            except OSError:
+                pass  # Tracing never takes the cycle down
+
+    def finish_trace(self, trace_id: str):
+        """Flushes the exporter and returns the trace's spans (forgetting them here)."""
+        try:
+            self.exporter.flush()
+        except OSError:
+            pass
+        with self._lock:
+            return self._finished.pop(trace_id, [])
+
+
+class _NoopSpan:
+    trace_id = span_id = None
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+tracer = Tracer()
+span = tracer.span
+trace = tracer.trace
+
+
+def annotate(**attrs):
+    """Adds attributes to the current span, if any."""
+    current = _current.get()
+    if current:
+        current.set(**attrs)
+
+
+def record_usage(response):
+    """Puts a model response's token counts on the current span."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        annotate(prompt_tokens=getattr(usage, "prompt_token_count", None),
+                 output_tokens=getattr(usage, "candidates_token_count", None))
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+def stats_by_name(spans):
+    """{span name: (count, p50 ms, p95 ms, total ms)}"""
+    durations = {}
+    for s in spans:
+        d = s.to_dict() if isinstance(s, Span) else s
+        durations.setdefault(d["name"], []).append(d["ms"])
+    return {name: (len(ms), percentile(ms, 50), percentile(ms, 95), sum(ms)) for name, ms in durations.items()}
+
+
+def report(spans, baseline=None):
+    """Per-span-name p50/p95 table; with `baseline` (an earlier cycle's spans) p95 drift is shown too."""
+    stats = stats_by_name(spans)
+    before = stats_by_name(baseline) if baseline else {}
+    lines = [f"⏱️  [Trace] {len(spans)} spans",
+             f"   {'span':<20} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'total s':>8}"]
+    for name, (n, p50, p95, total) in sorted(stats.items(), key=lambda kv: -kv[1][3]):
+        line = f"   {name:<20} {n:>5} {p50:>9.0f} {p95:>9.0f} {total / 1000:>8.1f}"
+        if name in before and before[name][2]:
+            line += f"  p95 {(p95 / before[name][2] - 1) * 100:+.0f}%"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def load_traces(path=TRACE_PATH):
+    """{trace_id: [span dicts]} in file order."""
+    traces = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                d = json.loads(line)
+                traces.setdefault(d["trace"], []).append(d)
+    return traces
+
+
+if __name__ == "__main__":
+    traces = [t for t in load_traces(sys.argv[1] if len(sys.argv) > 1 else TRACE_PATH).values()
+              if any(d["name"] == "cycle" for d in t)]
+    if not traces:
+        print("ℹ️ No traces recorded yet.")
+    else:
+        print(report(traces[-1], traces[-2] if len(traces) > 1 else None))
@@ -0,0 +1,40 @@
+"""
+Shared core: process-wide clients, created on first use.
+
+    from vta_core import db, llm, email
+
+`db` (Firestore), `llm` (Gemini client) and `email` (configured Resend module)
+are stand-ins that build the real client the first time one of their
+attributes is used, so importing a module costs no credentials and no
+network. Modules that build Firestore writes (outbox, dispatch_queue,
+retention) still import the google.cloud.firestore types at import time;
+only client setup is deferred. `browser_pool()` returns the process's shared
+BrowserPool. Submodules (`vta_core.clients`, `vta_core.bench`) are imported
+on first access too.
+"""
+import importlib
+from dotenv import load_dotenv
+from vta_core.lazy import Lazy
+
+# Config is plain environment; read .env once, up front, so module-level
+# os.getenv() settings see it no matter which module is imported first
+load_dotenv()
+
+_SUBMODULES = {"clients", "bench", "lazy"}
+
+db = Lazy("db", "vta_core.clients", "get_db")
+llm = Lazy("llm", "vta_core.clients", "get_llm")
+email = Lazy("email", "vta_core.clients", "get_email")
+
+
+def browser_pool():
+    return importlib.import_module("vta_core.clients").get_browser_pool()
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module(f"vta_core.{name}")
+    raise AttributeError(f"module 'vta_core' has no attribute {name!r}")
+
+
+__all__ = ["db", "llm", "email", "browser_pool"]
@@ -0,0 +1,81 @@
+import sys
+import json
+import argparse
+import subprocess
+import statistics
+
+# Import-Time Benchmark
+# Imports each module in a fresh interpreter and reports the median wall time,
+# whether the import built any client (Firebase app, Gemini, Resend) and the
+# slowest imports underneath it (from `python -X importtime`).
+#
+#   python -m vta_core.bench                      # the default module set
+#   python -m vta_core.bench vta_master -n 10 --top 8
+
+MODULES = ["vta_core", "vta_master", "scheduler", "generate_weekly_digest", "vta_publisher",
+           "dispatch_scored_alerts", "dispatch_worker", "send_alerts", "retention"]
+
+_PROBE = """
+import sys, time, json
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+fa = sys.modules.get("firebase_admin")
+clients = sys.modules.get("vta_core.clients")
+print(json.dumps({{
+    "seconds": elapsed,
+    "firebase_app": bool(fa and fa._apps),
+    "clients": sorted(clients._clients) if clients else [],
+    "sdks": sorted(m for m in ("firebase_admin", "google.genai", "playwright.async_api", "resend") if m in sys.modules),
+}}))
+"""
+
+
+def measure(module: str, runs: int = 5):
+    """Median import seconds over `runs` fresh interpreters, plus what the last import set up."""
+    samples, probe = [], None
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _PROBE.format(module=module)],
+                             capture_output=True, text=True)
+        if out.returncode != 0:
+            return {"module": module, "error": (out.stderr.strip().splitlines() or ["?"])[-1]}
+        probe = json.loads(out.stdout.strip().splitlines()[-1])
+        samples.append(probe["seconds"])
+    return {"module": module, "median_ms": statistics.median(samples) * 1000, **probe}
+
+
+def slowest_imports(module: str, top: int = 5):
+    """[(cumulative ms, imported package)] from -X importtime, slowest first."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                         capture_output=True, text=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]) / 1000, parts[2].rstrip()))
+    return sorted((r for r in rows if r[1].strip() != module), reverse=True)[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time benchmark")
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("-n", "--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=0, help="also list the N slowest nested imports")
+    args = parser.parse_args(argv)
+
+    print(f"⏱️  Import time (median of {args.runs} fresh interpreters)")
+    for module in args.modules:
+        result = measure(module, args.runs)
+        if "error" in result:
+            print(f"   {module:<24} ❌ {result['error']}")
+            continue
+        built = ", ".join(result["clients"]) or "none"
+        flag = "⚠️ " if result["firebase_app"] or result["clients"] else "  "
+        print(f"   {module:<24} {result['median_ms']:8.1f} ms  {flag}clients: {built}  "
+              f"sdks: {', '.join(result['sdks']) or 'none'}")
+        for ms, name in slowest_imports(module, args.top) if args.top else ():
+            print(f"      {ms:8.1f} ms  {name.strip()}")
+
+
+if __name__ == "__main__":
+    main()
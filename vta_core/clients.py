@@ -0,0 +1,64 @@
+import os
+import threading
+
+# Client factories behind the vta_core stand-ins. Each SDK is imported and
+# each client built the first time it is needed, once per process.
+
+SERVICE_ACCOUNT_PATH = os.getenv("VTA_SERVICE_ACCOUNT", "serviceAccount.json")
+
+_lock = threading.Lock()
+_clients = {}
+
+
+def _once(name, build):
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = build()
+    return client
+
+
+def _build_db():
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(credentials.Certificate(SERVICE_ACCOUNT_PATH))
+    return firestore.client()
+
+
+def _build_llm():
+    from google import genai
+    return genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+
+
+def _build_email():
+    import resend
+    resend.api_key = os.getenv("RESEND_API_KEY")
+    return resend
+
+
+def _build_browser_pool():
+    from browser_pool import BrowserPool
+    return BrowserPool()
+
+
+def get_db():
+    """Firestore client (initializes the Firebase app on first call)."""
+    return _once("db", _build_db)
+
+
+def get_llm():
+    """Gemini client."""
+    return _once("llm", _build_llm)
+
+
+def get_email():
+    """The `resend` module with its API key set."""
+    return _once("email", _build_email)
+
+
+def get_browser_pool():
+    """The process's shared BrowserPool (Chromium itself starts on the first page)."""
+    return _once("browser_pool", _build_browser_pool)
@@ -0,0 +1,24 @@
+import importlib
+
+
+class Lazy:
+    """
+    Stands in for a client built by `module.factory()`. The factory (and its
+    module) is imported and called on first attribute access; the factory
+    caches its result, so every stand-in shares one instance.
+    """
+    __slots__ = ("_name", "_module", "_factory")
+
+    def __init__(self, name: str, module: str, factory: str):
+        self._name = name
+        self._module = module
+        self._factory = factory
+
+    def resolve(self):
+        return getattr(importlib.import_module(self._module), self._factory)()
+
+    def __getattr__(self, attr):
+        return getattr(self.resolve(), attr)
+
+    def __repr__(self):
+        return f"<lazy {self._name}>"
@@ -1,59 +1,40 @@
 import os
+import sys
 import asyncio
 import json
 import re
-from datetime import datetime, timedelta
-from playwright.async_api import async_playwright
-from google import genai
-from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, firestore
+from datetime import datetime
 from google.cloud.firestore_v1.base_query import FieldFilter
+from dispatch_queue import QUEUE_COLLECTION, build_queue_entry, should_enqueue
+from outbox import Outbox, OUTBOX_PATH
+from dashboard_views import DashboardViews
+from retention import with_expiry
+from meeting_archive import put_text, get_text
+from fair_scheduler import FairScheduler, tier_of
+from weekly_aggregate import WeeklyAggregate
+from browser_pool import pool_or_new
+from board_cadence import BoardCadence, PortalBudget
+from board_leases import BoardLeases, board_lease_id
+from cycle_journal import CycleJournal, board_run_id
+from cycle_pipeline import Pipeline, Stage
+from tracing import tracer, trace, span, annotate, record_usage, report as trace_report
+from metrics import (BOARDS_SCOUTED, SCRAPE_BYTES, CACHE_REQUESTS, SIGNALS, llm_call, score_bucket)
+from vta_core import db, llm as client
 
 # 1. SETUP
 MODEL_ID = "gemini-2.5-flash-lite-preview-09-2025"
-load_dotenv()
-
-if not firebase_admin._apps:
-    cred = credentials.Certificate("serviceAccount.json")
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
-client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
-
-# 2. DATABASE HYGIENE
-def cleanup_old_signals():
-    print("🧹 [Hygiene] Scanning for stale archived signals...")
-    cutoff = datetime.now() - timedelta(days=21)
-    
-    stale_query = db.collection("signals")\
-        .where(filter=FieldFilter("status", "==", "archived"))\
-        .where(filter=FieldFilter("timestamp", "<", cutoff))
-    
-    batch = db.batch()
-    count = 0
-    docs = stale_query.stream()
-    
-    for doc in docs:
-        batch.delete(doc.reference)
-        count += 1
-        if count % 400 == 0:
-            batch.commit()
-            batch = db.batch()
-            
-    if count > 0:
-        batch.commit()
-        print(f"   Deleted {count} stale signals older than {cutoff.date()}.")
-    else:
-        print("   Database is clean.")
+MAX_SCRAPE_CHARS = 45000 # What the Watchdog sees; the archive keeps everything
+OUTBOX_DRAIN_SECONDS = 120 # How long the cycle waits for queued writes before exiting
 
-# 3. THE SCOUT (H3-Surgical Peek)
-async def get_latest_meeting_fingerprint(url: str, board_name: str):
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
+# 2. THE SCOUT (H3-Surgical Peek)
+
+async def get_latest_meeting_fingerprint(pool, url: str, board_name: str):
+    async with pool.page() as page:
         try:
-            await page.goto(url, wait_until="networkidle", timeout=45000)
-            await asyncio.sleep(5) 
+            with span("browser.navigate", url=url):
+                await page.goto(url, wait_until="networkidle", timeout=45000)
+            with span("browser.wait"):
+                await asyncio.sleep(5) 
 
             h3_selector = f"h3:has-text('{board_name}')"
             header = page.locator(h3_selector).first
@@ -61,34 +42,29 @@ async def get_latest_meeting_fingerprint(url: str, board_name: str):
             
             if await header.count() > 0:
                 card_text = await container.inner_text() if await container.count() > 0 else await header.inner_text()
-                fingerprint = " ".join(card_text.split())
-                await browser.close()
-                return fingerprint
+                return " ".join(card_text.split())
             else:
-                await browser.close()
                 return None
         except Exception:
-            await browser.close()
             return None
 
-# 4. THE SCRAPER
-async def scrape_portal_content(url: str, board_name: str):
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
+# 3. THE SCRAPER
+async def scrape_portal_content(pool, url: str, board_name: str):
+    async with pool.page() as page:
         try:
-            await page.goto(url, wait_until="networkidle")
-            await page.click(f"text='{board_name}'")
-            await asyncio.sleep(5) 
-            content = await page.evaluate("() => document.body.innerText")
-            await browser.close()
-            return content[:45000]
+            with span("browser.navigate", url=url):
+                await page.goto(url, wait_until="networkidle")
+                await page.click(f"text='{board_name}'")
+            with span("browser.wait"):
+                await asyncio.sleep(5) 
+            text = await page.evaluate("() => document.body.innerText")
+            annotate(scraped_chars=len(text or ""))
+            return text
         except Exception as e:
             print(f"❌ Scraper Error: {e}")
-            await browser.close()
             return None
 
-# 5. THE LIBRARIAN (Fixed JSON Parser)
+# 4. THE LIBRARIAN (Fixed JSON Parser)
 def analyze_meeting_holistically(board_name: str, raw_text: str):
     print(f"🏛️  [The Librarian] Analyzing {board_name} for public impact...")
     
@@ -114,7 +90,9 @@ def analyze_meeting_holistically(board_name: str, raw_text: str):
     """
     
     try:
-        response = client.models.generate_content(model=MODEL_ID, contents=prompt)
+        with span("llm.librarian", board=board_name, prompt_chars=len(prompt)), llm_call("librarian") as call:
+            response = call.response = client.models.generate_content(model=MODEL_ID, contents=prompt)
+            record_usage(response)
         text = response.text
         
         # 🛠️ FIX: Use Regex to find the JSON object {...}
@@ -139,114 +117,452 @@ def analyze_meeting_holistically(board_name: str, raw_text: str):
             "public_analysis": "Error during analysis."
         }
 
+# 5. THE WATCHDOG (Per-Profile Risk Scoring)
+def score_for_profile(prof: dict, raw_text: str):
+    """
+    Scores the text for one interest profile.
+    Returns (score, analysis) or None when the model reports NO_SIGNAL.
+    """
+    prompt = f"""
+    You are a "Paranoid Risk Assessor" for the {prof['industry']} industry.
+    User Keywords: {prof['keywords']}
+    Exclusions: {prof['exclusions']}
+
+    Analyze the text. 
+    - If there is ANY remote relevance (even minor), Score it 1-5.
+    - If there is clear direct impact, Score it 6-8.
+    - If there is critical urgency, Score it 9-10.
+
+    Return your response in this EXACT format:
+    SCORE: [1-10]
+    REASON: [Short explanation of the score]
+    ANALYSIS: [Full professional briefing]
+
+    Only return "NO_SIGNAL" if 100% unrelated.
+    
+    TEXT: {raw_text}
+    """
+
+    with span("llm.watchdog", industry=prof['industry'], prompt_chars=len(prompt)), llm_call("watchdog") as call:
+        response = call.response = client.models.generate_content(model=MODEL_ID, contents=prompt)
+        record_usage(response)
+        if "NO_SIGNAL" in response.text:
+            call.outcome = "no_signal"
+    output = response.text
+
+    if "NO_SIGNAL" in output:
+        return None
+    score_match = re.search(r"SCORE:\s*(\d+)", output)
+    score = int(score_match.group(1)) if score_match else 1
+    return score, output
+
+def summarize_industry_week(industry: str, previous: str, top_entries: list):
+    """Folds this week's best signals for one industry into its running digest paragraph."""
+    items = "\n".join(f"- [{e.get('score', 0)}/10] {e.get('board_name')}: {e.get('excerpt', '')}" for e in top_entries)
+    prompt = f"""
+    You keep a running weekly briefing paragraph for the {industry} industry.
+    Rewrite it in at most 4 sentences so it covers the strongest items below.
+    Plain text only.
+
+    CURRENT PARAGRAPH: {previous or "(none yet)"}
+
+    TOP ITEMS THIS WEEK:
+    {items}
+    """
+    with span("llm.summary", industry=industry, prompt_chars=len(prompt)), llm_call("summary") as call:
+        response = call.response = client.models.generate_content(model=MODEL_ID, contents=prompt)
+        record_usage(response)
+    return response.text.strip()
+
+def load_subscriber_tiers(sub_ids, cache: dict):
+    """Fills `cache` with subscriber_id -> tier for any ids not seen yet this cycle."""
+    wanted = {sid for sid in sub_ids if sid}
+    missing = [sid for sid in wanted if sid not in cache]
+    CACHE_REQUESTS.inc(len(wanted) - len(missing), cache="subscriber_tier", result="hit")
+    CACHE_REQUESTS.inc(len(missing), cache="subscriber_tier", result="miss")
+    if missing:
+        refs = [db.collection("subscribers").document(sid) for sid in missing]
+        for snap in db.get_all(refs):
+            cache[snap.id] = tier_of(snap.to_dict() if snap.exists else None)
+    return cache
+
 # 6. THE MASTER LOOP
-async def run_vta_production_cycle():
+# The cycle is a pipeline (see cycle_pipeline.py): later boards are scouted
+# while earlier ones are scraped and analyzed, and bounded queues keep the
+# browser-bound stages from running far ahead of the model-bound ones.
+#
+#   scout (lease, fingerprint) -> scrape -> analyze (Librarian, Watchdog)
+#     -> persist (outbox + journal) -> dispatch (flush, release, deliver)
+SCOUT_WORKERS = int(os.getenv("VTA_SCOUT_WORKERS", "2"))
+SCRAPE_WORKERS = int(os.getenv("VTA_SCRAPE_WORKERS", "2"))
+ANALYZE_WORKERS = int(os.getenv("VTA_ANALYZE_WORKERS", "4"))
+DELIVER_IN_CYCLE = os.getenv("VTA_CYCLE_DISPATCH", "1") == "1" # Send alerts as boards finish
+last_trace = None # Previous cycle's spans, for p95 drift in the trace report
+
+async def run_vta_production_cycle(pool=None, check_all=False):
+    """
+    One scout cycle. `pool` is a shared BrowserPool; standalone runs get their own.
+    Only boards whose adaptive cadence says they are due are checked, unless `check_all`.
+    """
+    global last_trace
+    async with pool_or_new(pool) as pool:
+        with trace("cycle", check_all=check_all) as root:
+            await _production_cycle(pool, check_all)
+    spans = tracer.finish_trace(root.trace_id)
+    summary = trace_report(spans, last_trace)
+    last_trace = spans # Baseline for the next cycle in a long-lived process
+    print(f"\n{summary}")
+    return summary
+
+class Cycle:
+    """Collaborators shared by every board in one production cycle."""
+
+    def __init__(self, pool, outbox):
+        self.pool = pool
+        self.outbox = outbox
+        self.views = DashboardViews(db, outbox)
+        self.weekly = WeeklyAggregate(db, outbox)
+        self.cadence = BoardCadence(db, outbox)
+        self.leases = BoardLeases(db)
+        self.budget = PortalBudget(self.leases.store) # Shared by every worker through the lease store
+        self.journal = CycleJournal(outbox)
+        # Writes journaled under a lease that has since changed hands are dropped, with their checkpoints
+        outbox.fence_check = self.leases.store.current_token
+        outbox.on_fenced = self.journal.forget_board
+        self.tiers = {}
+        self.alerts_waiting = False
+
+class BoardJob:
+    """One board's trip through the pipeline."""
+
+    def __init__(self, org_id: str, portal_url: str, board_key: str, board_name: str):
+        self.org_id = org_id
+        self.portal_url = portal_url
+        self.board_key = board_key
+        self.board_name = board_name
+        self.lease = None
+        self.fingerprint = None
+        self.run_id = None
+        self.done = {} # Journaled stages from an earlier, interrupted run
+        self.full_text = None
+        self.text_hash = None
+        self.record_id = None
+        self.analyzed = False
+        self.failed = False
+        self.alerts = 0
+
+async def _production_cycle(pool, check_all=False):
     print(f"🚀 [{datetime.now().strftime('%H:%M:%S')}] Starting VTA Intelligence Cycle v3.0 (Archive Mode)")
 
-    cleanup_old_signals()
+    # Firestore writes go through the local journal; replay anything a previous run left behind
+    outbox = Outbox(db)
+    cycle = Cycle(pool, outbox)
+    if outbox.pending_count():
+        print(f"♻️  [Outbox] Replaying {outbox.pending_count()} unflushed writes...")
+        await outbox.drain(OUTBOX_DRAIN_SECONDS)
+    stop_flusher = asyncio.Event()
+    flusher = asyncio.create_task(outbox.run_flusher(stop_flusher))
+    cycle.journal.prune()
 
-    orgs = db.collection("organizations").stream()
-    
-    for org_doc in orgs:
+    due = []
+    not_due = 0
+    for org_doc in db.collection("organizations").stream():
         org_data = org_doc.to_dict()
-        portal_url = org_data.get("portal_url")
-        boards = org_data.get("boards", {})
-        bookmarks = org_data.get("last_processed", {})
+        for board_key, board_name in cycle.cadence.overdue_order(org_doc.id, org_data.get("boards", {})):
+            if check_all or cycle.cadence.is_due(org_doc.id, board_key, board_name):
+                due.append(BoardJob(org_doc.id, org_data.get("portal_url"), board_key, board_name))
+            else:
+                not_due += 1
 
-        for board_key, board_name in boards.items():
-            print(f"\n📡 [Step 1: Check] Board: {board_name}")
-            
-            current_fp = await get_latest_meeting_fingerprint(portal_url, board_name)
-            last_seen = bookmarks.get(board_key, "")
+    pipeline = build_pipeline(cycle)
+    await pipeline.run(due)
+    if cycle.alerts_waiting:
+        await deliver_alerts(cycle)
+    print(f"\n{pipeline.report()}")
 
-            if current_fp is None:
-                print(f"⏭️  Skipping: Board not visible.")
-                continue
+    if not_due:
+        print(f"\n💤 {not_due} boards not due yet (adaptive cadence).")
 
-            if current_fp == last_seen:
-                print(f"⏭️  Skipping: Already processed.")
-                continue
+    # Keep the Friday digest's per-industry paragraphs current
+    await asyncio.to_thread(cycle.weekly.refresh_summaries, summarize_industry_week)
 
-            print(f"🆕 NEW CONTENT FOUND: {board_name}...")
-            raw_text = await scrape_portal_content(portal_url, board_name)
-            if not raw_text: continue
-
-            # --- PHASE 2: INGEST FIRST (The Librarian) ---
-            archive_data = analyze_meeting_holistically(board_name, raw_text)
-            
-            record_id = re.sub(r'\W+', '_', board_key) + "_" + datetime.now().strftime("%Y%m%d")
-            
-            db.collection("meeting_records").document(record_id).set({
-                "board_name": board_name,
-                "org_id": org_doc.id,
-                "timestamp": datetime.now(),
-                
-                # NEW FIELDS FOR DASHBOARD
-                "summary": archive_data.get("summary"),
-                "topics": archive_data.get("topics"),
-                "keywords": archive_data.get("keywords"),
-                "score": archive_data.get("public_score", 0),          # Public Score
-                "analysis": archive_data.get("public_analysis", ""),   # Public Analysis
-                
-                "raw_text_snippet": raw_text[:2000]
-            })
-            print(f"   💾 Meeting Archived (Public Score: {archive_data.get('public_score')}/10).")
-
-            # --- PHASE 3: FILTER LATER (The Watchdog) ---
-            profiles = db.collection("interest_profiles").where(filter=FieldFilter("active", "==", True)).stream()
-            
-            for prof_doc in profiles:
-                prof = prof_doc.to_dict()
-                print(f"   🧠 [Watchdog] Checking for {prof['industry']}...")
-
-                prompt = f"""
-                You are a "Paranoid Risk Assessor" for the {prof['industry']} industry.
-                User Keywords: {prof['keywords']}
-                Exclusions: {prof['exclusions']}
-
-                Analyze the text. 
-                - If there is ANY remote relevance (even minor), Score it 1-5.
-                - If there is clear direct impact, Score it 6-8.
-                - If there is critical urgency, Score it 9-10.
-
-                Return your response in this EXACT format:
-                SCORE: [1-10]
-                REASON: [Short explanation of the score]
-                ANALYSIS: [Full professional briefing]
-
-                Only return "NO_SIGNAL" if 100% unrelated.
-                
-                TEXT: {raw_text}
-                """
-
-                response = client.models.generate_content(model=MODEL_ID, contents=prompt)
-                output = response.text
-
-                if "NO_SIGNAL" not in output:
-                    score_match = re.search(r"SCORE:\s*(\d+)", output)
-                    score = int(score_match.group(1)) if score_match else 1
-                    
-                    db.collection("signals").add({
-                        "subscriber_id": prof['subscriber_id'],
-                        "profile_id": prof_doc.id,
-                        "industry": prof['industry'],
-                        "score": score,
-                        "analysis": output,
-                        "related_meeting_id": record_id, # Link back to the master record
-                        "timestamp": datetime.now(),
-                        "status": "unread" if score >= 7 else "archived"
-                    })
-                    print(f"      ✅ ALERT GENERATED (Score: {score}/10)")
-                else:
-                    print(f"      🛑 No alert needed.")
-
-            # Update Bookmark
-            db.collection("organizations").document(org_doc.id).update({
-                f"last_processed.{board_key}": current_fp
-            })
-            print(f"   🔖 Bookmark Updated.")
+    stop_flusher.set()
+    await flusher
+    remaining = await outbox.drain(OUTBOX_DRAIN_SECONDS)
+    if remaining:
+        print(f"⚠️  [Outbox] {remaining} writes still pending; they will be replayed next run.")
+    if outbox.dead_count():
+        print(f"❌ [Outbox] {outbox.dead_count()} dead-lettered writes in {OUTBOX_PATH}; see last_error.")
+    outbox.close()
 
     print(f"\n🏁 [{datetime.now().strftime('%H:%M:%S')}] Cycle Complete.")
 
+def build_pipeline(cycle):
+    async def release(job, _error=None):
+        if job.lease:
+            await job.lease.release()
+
+    dispatch = Stage("dispatch", lambda job, emit: finish_board(cycle, job, dispatch))
+    return Pipeline(
+        Stage("scout", lambda job, emit: scout_board(cycle, job, emit), SCOUT_WORKERS, on_error=release),
+        Stage("scrape", lambda job, emit: scrape_board(cycle, job, emit), SCRAPE_WORKERS, on_error=release),
+        Stage("analyze", lambda job, emit: analyze_board(cycle, job, emit), ANALYZE_WORKERS),
+        # One writer keeps each board's items in order (archive, signals, then bookmark)
+        Stage("persist", lambda item, emit: persist_item(cycle, item, emit), 1),
+        dispatch,
+    )
+
+async def scout_board(cycle, job, emit):
+    """Claims the board and checks its fingerprint; changed boards move on to scraping."""
+    annotate(org=job.org_id, board=job.board_name)
+    # Other scout workers may be sharing this board set
+    job.lease = await cycle.leases.claim(board_lease_id(job.org_id, job.board_key))
+    if job.lease is None:
+        print(f"\n🔒 Skipping {job.board_name}: another worker holds it.")
+        BOARDS_SCOUTED.inc(outcome="locked")
+        return
+    # Our own unflushed writes from the previous token carry over if nobody held the board in between.
+    # Firestore, SQLite and disk calls below run off the event loop so the other stages keep moving
+    await asyncio.to_thread(cycle.outbox.refence, job.lease.lease_id, job.lease.token)
+    # One portal load for the fingerprint; a changed board pays for its scrape separately
+    if not await asyncio.to_thread(cycle.budget.try_acquire, job.portal_url):
+        print(f"\n⏳ Deferring {job.board_name}: portal request budget spent for this hour.")
+        BOARDS_SCOUTED.inc(outcome="deferred")
+        return await job.lease.release()
+    print(f"\n📡 [Step 1: Check] Board: {job.board_name}")
+
+    current_fp = await get_latest_meeting_fingerprint(cycle.pool, job.portal_url, job.board_name)
+    # Read the bookmark now, under the lease: another worker may have just processed this board
+    last_seen = await asyncio.to_thread(read_bookmark, job.org_id, job.board_key)
+    next_at = await asyncio.to_thread(cycle.cadence.record_check, job.org_id, job.board_key, job.board_name,
+                                      changed=current_fp is not None and current_fp != last_seen)
+    print(f"   🗓️  {job.board_name}: next check {next_at.strftime('%a %H:%M')}")
+
+    if current_fp is None:
+        print(f"⏭️  Skipping {job.board_name}: Board not visible.")
+        BOARDS_SCOUTED.inc(outcome="hidden")
+        return await job.lease.release()  # Only the schedule changed; nothing to hand over
+
+    if current_fp == last_seen:
+        print(f"⏭️  Skipping {job.board_name}: Already processed.")
+        BOARDS_SCOUTED.inc(outcome="unchanged")
+        return await job.lease.release()
+
+    # Resume from the journal if an earlier run died partway through this content
+    job.fingerprint = current_fp
+    job.run_id = board_run_id(job.org_id, job.board_key, current_fp)
+    job.done = await asyncio.to_thread(cycle.journal.stages, job.run_id)
+    if "bookmarked" in job.done:
+        print(f"⏭️  Skipping {job.board_name}: Already processed (bookmark still flushing).")
+        BOARDS_SCOUTED.inc(outcome="unchanged")
+        return await job.lease.release()
+    if job.done:
+        print(f"♻️  Resuming {job.board_name} after: {', '.join(sorted(job.done))}")
+    BOARDS_SCOUTED.inc(outcome="changed")
+    await emit(job)
+
+def read_bookmark(org_id: str, board_key: str):
+    """The fingerprint this board was last processed at ("" if never)."""
+    with span("firestore.read", collection="organizations"):
+        org_snap = db.collection("organizations").document(org_id).get(field_paths=["last_processed"])
+    return ((org_snap.to_dict() or {}).get("last_processed") or {}).get(board_key, "")
+
+async def scrape_board(cycle, job, emit):
+    """Fetches the meeting packet (or reads it back from the archive on resume)."""
+    annotate(org=job.org_id, board=job.board_name)
+    if "scraped" in job.done:
+        job.text_hash = job.done["scraped"]["text_hash"]
+        job.full_text = await asyncio.to_thread(get_text, job.text_hash)
+        CACHE_REQUESTS.inc(cache="packet", result="hit" if job.full_text is not None else "miss")
+    if job.full_text is None:
+        # The scrape loads the portal a second time
+        if not await asyncio.to_thread(cycle.budget.try_acquire, job.portal_url):
+            print(f"⏳ Deferring scrape of {job.board_name}: portal request budget spent for this hour.")
+            return await job.lease.release()  # Not bookmarked, so a later check picks it up again
+        print(f"🆕 NEW CONTENT FOUND: {job.board_name}...")
+        job.full_text = await scrape_portal_content(cycle.pool, job.portal_url, job.board_name)
+        if not job.full_text:
+            return await job.lease.release()
+
+        # Keep the complete packet so prompts can be re-run without re-scraping
+        job.text_hash = await asyncio.to_thread(put_text, job.full_text)
+        annotate(scraped_chars=len(job.full_text))
+        SCRAPE_BYTES.observe(len(job.full_text.encode()))
+        await asyncio.to_thread(cycle.journal.mark, job.run_id, "scraped", {"text_hash": job.text_hash})
+    await emit(job)
+
+async def analyze_board(cycle, job, emit):
+    """
+    Librarian then Watchdog. Each result is handed to persist as soon as it exists;
+    the closing ("end", job) item always follows, even if analysis stops early.
+    """
+    annotate(org=job.org_id, board=job.board_name)
+    try:
+        raw_text = job.full_text[:MAX_SCRAPE_CHARS]
+
+        # --- PHASE 2: INGEST FIRST (The Librarian) ---
+        if "archived" in job.done:
+            job.record_id = job.done["archived"]["record_id"]
+            CACHE_REQUESTS.inc(cache="librarian", result="hit")
+        else:
+            CACHE_REQUESTS.inc(cache="librarian", result="miss")
+            # Model calls run off the event loop so lease heartbeats and other stages keep going
+            archive_data = await asyncio.to_thread(analyze_meeting_holistically, job.board_name, raw_text)
+            if job.lease.lost.is_set():
+                return
+            job.record_id = re.sub(r'\W+', '_', job.board_key) + "_" + datetime.now().strftime("%Y%m%d")
+            await emit(("archive", job, archive_data))
+
+        # --- PHASE 3: FILTER LATER (The Watchdog) ---
+        # Pro subscribers are scored first under LLM rate limits; basic ones still get their share
+        profiles = await asyncio.to_thread(load_active_profiles, cycle)
+        watchdog_queue = FairScheduler()
+        for prof_id, prof in profiles:
+            if f"profile:{prof_id}" in job.done:
+                continue  # Scored (and its signal journaled) before the crash
+            watchdog_queue.push((prof_id, prof), prof.get("subscriber_id"), cycle.tiers.get(prof.get("subscriber_id")))
+
+        for prof_id, prof in watchdog_queue.drain():
+            print(f"   🧠 [Watchdog] {job.board_name}: checking for {prof['industry']}...")
+            with span("profile", profile=prof_id, board=job.board_name):
+                result = await asyncio.to_thread(score_for_profile, prof, raw_text)
+            if job.lease.lost.is_set():
+                print(f"   🔒 Lease lost; leaving {job.board_name} to its new holder.")
+                return
+            await emit(("signal", job, (prof_id, prof, result)))
+        print(f"   ⚖️  [Watchdog] {job.board_name}: {watchdog_queue.summary()}")
+        job.analyzed = True
+    finally:
+        await emit(("end", job, None))
+
+def load_active_profiles(cycle):
+    profiles = [(d.id, d.to_dict()) for d in db.collection("interest_profiles").where(filter=FieldFilter("active", "==", True)).stream()]
+    load_subscriber_tiers((p.get("subscriber_id") for _, p in profiles), cycle.tiers)
+    return profiles
+
+async def persist_item(cycle, item, emit):
+    """Journals one analysis result; on a board's closing item, writes the bookmark and passes the board on."""
+    kind, job, payload = item
+    annotate(org=job.org_id, board=job.board_name, kind=kind)
+    try:
+        if job.failed or job.lease.lost.is_set():
+            return
+        # Journal and Firestore work runs in threads, off the event loop (the fence rides along).
+        # Writes are fenced with the lease token, so they are dropped if the board changes hands
+        with cycle.outbox.fenced(job.lease.lease_id, job.lease.token):
+            if kind == "archive":
+                await asyncio.to_thread(archive_meeting, cycle, job.run_id, job.org_id, job.board_key, job.board_name,
+                                        job.record_id, payload, job.full_text, job.text_hash)
+            elif kind == "signal":
+                prof_id, prof, result = payload
+                if await asyncio.to_thread(record_signal, cycle, job.run_id, prof_id, prof, job.record_id, job.board_name, result):
+                    job.alerts += 1
+            elif job.analyzed:
+                await asyncio.to_thread(bookmark_board, cycle, job)
+                print(f"   🔖 {job.board_name}: Bookmark Updated.")
+    except Exception:
+        job.failed = True  # Later items of this board are dropped; the journal resumes it next run
+        raise
+    finally:
+        if kind == "end":
+            await emit(job)
+
+async def finish_board(cycle, job, stage):
+    """Flushes the board's writes, hands its lease back and delivers any alerts it raised."""
+    annotate(org=job.org_id, board=job.board_name, alerts=job.alerts)
+    try:
+        # Our writes (bookmark included) must be visible before the next holder looks.
+        # Only this board's fenced rows count; a stuck write elsewhere does not hold the lease
+        if await cycle.outbox.drain(OUTBOX_DRAIN_SECONDS, fence=(job.lease.lease_id, job.lease.token)):
+            job.lease.lost.set()  # Let it expire instead of handing over unflushed state
+    finally:
+        await job.lease.release()
+    if job.alerts and DELIVER_IN_CYCLE:
+        cycle.alerts_waiting = True
+    # Coalesce: deliver once the boards behind this one have finished too
+    if cycle.alerts_waiting and stage.depth == 0:
+        await deliver_alerts(cycle)
+
+async def deliver_alerts(cycle):
+    from dispatch_scored_alerts import build_briefing
+    from email_delivery import run_dispatch
+    cycle.alerts_waiting = False
+    stats = await run_dispatch(db, build_briefing)
+    print(f"   📬 [Dispatch] {stats.summary()}")
+
+def bookmark_board(cycle, job):
+    with cycle.outbox.transaction():
+        cycle.outbox.update("organizations", job.org_id, {
+            f"last_processed.{job.board_key}": job.fingerprint
+        })
+        cycle.journal.mark(job.run_id, "bookmarked")
+
+def archive_meeting(cycle, run_id, org_id, board_key, board_name, record_id, archive_data, full_text, text_hash):
+    """Journals the meeting record, its dashboard card and the `archived` checkpoint atomically."""
+    raw_text = full_text[:MAX_SCRAPE_CHARS]
+    record = {
+        "board_name": board_name,
+        "org_id": org_id,
+        "timestamp": datetime.now(),
+        
+        # NEW FIELDS FOR DASHBOARD
+        "summary": archive_data.get("summary"),
+        "topics": archive_data.get("topics"),
+        "keywords": archive_data.get("keywords"),
+        "score": archive_data.get("public_score", 0),          # Public Score
+        "analysis": archive_data.get("public_analysis", ""),   # Public Analysis
+        
+        "raw_text_snippet": raw_text[:2000],
+        "raw_text_hash": text_hash,
+        "raw_text_chars": len(full_text)
+    }
+    # Fill the view cache first: no Firestore reads while the journal is locked
+    cycle.views.prefetch_meeting(org_id)
+    with cycle.outbox.transaction():
+        cycle.outbox.set("meeting_records", record_id, record)
+        cycle.views.record_meeting(org_id, board_key, record_id, record)
+        cycle.journal.mark(run_id, "archived", {"record_id": record_id})
+    print(f"   💾 {board_name}: Meeting Archived (Public Score: {archive_data.get('public_score')}/10).")
+
+def record_signal(cycle, run_id, prof_id, prof, record_id, board_name, result):
+    """
+    Journals one profile's signal writes and its `profile:<id>` checkpoint atomically.
+    Returns True if the signal was queued for dispatch.
+    """
+    outbox = cycle.outbox
+    queued = False
+    signal = None
+    if result:
+        score, output = result
+        signal = {
+            "subscriber_id": prof['subscriber_id'],
+            "profile_id": prof_id,
+            "industry": prof['industry'],
+            "score": score,
+            "analysis": output,
+            "related_meeting_id": record_id, # Link back to the master record
+            "timestamp": datetime.now(),
+            "status": "unread" if score >= 7 else "archived"
+        }
+        # Fill the view and aggregate caches first: no Firestore reads while the journal is locked
+        cycle.views.prefetch_signal(signal)
+        cycle.weekly.prefetch_signal(signal)
+    with outbox.transaction():
+        if signal:
+            sig_id = outbox.add("signals", with_expiry("signals", signal))
+            SIGNALS.inc(score=score_bucket(score))
+            # Hand alert-worthy signals to the dispatch queue
+            if should_enqueue(signal):
+                outbox.set(QUEUE_COLLECTION, sig_id, build_queue_entry(sig_id, signal))
+                queued = True
+            cycle.views.record_signal(sig_id, signal, board_name)
+            cycle.weekly.record_signal(sig_id, signal, board_name)
+        cycle.journal.mark(run_id, f"profile:{prof_id}", {"score": result[0] if result else None})
+    if result:
+        print(f"      ✅ ALERT GENERATED (Score: {result[0]}/10)")
+    else:
+        print(f"      🛑 No alert needed.")
+    return queued
+
 if __name__ == "__main__":
-    asyncio.run(run_vta_production_cycle())
\ No newline at end of file
+    asyncio.run(run_vta_production_cycle(check_all="--all" in sys.argv))
\ No newline at end of file
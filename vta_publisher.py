@@ -1,80 +1,189 @@
 import os
+import re
+import json
+import time
+import base64
 import asyncio
-from playwright.async_api import async_playwright
-from dotenv import load_dotenv
-
-load_dotenv()
+from contextlib import contextmanager
+import vta_core # Loads .env before the settings below are read
+from browser_pool import pool_or_new
 
 SUBSTACK_EMAIL = "your-email@aiyoda.app" # Replace with your login email
 SUBSTACK_PASSWORD = os.getenv("SUBSTACK_PASSWORD")
 SUBSTACK_URL = "https://aiyoda.substack.com/publish"
 
-async def post_to_substack(title: str, content_html: str):
+# Saved browser session (cookies + local storage), encrypted at rest.
+# Set SUBSTACK_SESSION_KEY to a Fernet key; otherwise one is derived from the
+# password with scrypt and a random salt stored at the start of the file.
+SESSION_PATH = os.getenv("VTA_SUBSTACK_SESSION", "substack_session.enc")
+SALT_BYTES = 16
+SESSION_CHECK_TIMEOUT = 8000 # ms to wait for the editor before treating the session as expired
+AUTOSAVE_TIMEOUT = 20000 # ms to wait for the editor's draft save request
+
+# Hands the whole rendered document to the editor as one paste, exactly as a
+# browser clipboard paste would; ProseMirror parses the HTML in a single step.
+# Returns how many characters the paste added to the editor.
+PASTE_HTML_JS = """([html, text]) => {
+    const editor = document.activeElement;
+    const before = editor.innerText.length;
+    const data = new DataTransfer();
+    data.setData('text/html', html);
+    data.setData('text/plain', text);
+    const event = new ClipboardEvent('paste', {clipboardData: data, bubbles: true, cancelable: true});
+    editor.dispatchEvent(event);
+    return editor.innerText.length - before;
+}"""
+
+# The document's plain text, plus the text of each of its DOM text nodes. One
+# DOM text node has one set of inline marks, so ProseMirror keeps its text in
+# one JSON string; text spanning <strong>/<em>/<a> is split across several.
+PLAIN_TEXT_JS = """(html) => {
+    const div = document.createElement('div');
+    div.innerHTML = html;
+    const walker = document.createTreeWalker(div, NodeFilter.SHOW_TEXT);
+    const runs = [];
+    for (let node = walker.nextNode(); node; node = walker.nextNode()) runs.push(node.textContent);
+    return [div.innerText, runs];
+}"""
+
+def _is_draft_save(response, marker=None):
+    request = response.request
+    if not ("/api/v1/drafts" in response.url and request.method in ("POST", "PUT") and response.ok):
+        return False
+    # Title/subtitle autosaves may still be in flight; only the one carrying the body counts
+    return marker is None or marker in (request.post_data or "")
+
+def _body_marker(runs):
     """
-    Uses Playwright to log in to Substack and create a new draft.
+    A run of plain words from within one text node of the body (usually the
+    first heading) that survives JSON encoding unchanged, or None.
+    """
+    for run in runs:
+        match = re.search(r"[A-Za-z0-9][A-Za-z0-9 ]{23,}", " ".join(run.split()))
+        if match:
+            return match.group(0)[:40].strip()
+    return None
+
+async def _body_saved(page, saved, on_save, later_saves):
+    """
+    Waits for the draft save carrying the body. If none is recognised in
+    time, a draft save that followed the paste is accepted instead.
+    """
+    try:
+        return await saved
+    except Exception:
+        if not later_saves:
+            raise
+        print("   ⚠️ [Publisher] Body text not found in the draft saves; accepting the save after the paste.")
+        return later_saves[-1]
+    finally:
+        page.remove_listener("response", on_save)
+
+def _discard(future):
+    """Cancels a pending wait and marks its outcome as seen, so nothing is logged as unretrieved."""
+    future.cancel()
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+def _fernet(salt: bytes):
+    """The session cipher: SUBSTACK_SESSION_KEY, or a scrypt key from the password and `salt`."""
+    from cryptography.fernet import Fernet
+    from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+    secret = os.getenv("SUBSTACK_SESSION_KEY")
+    if secret:
+        return Fernet(secret.encode())
+    if not SUBSTACK_PASSWORD:
+        return None
+    key = Scrypt(salt=salt, length=32, n=2**15, r=8, p=1).derive(SUBSTACK_PASSWORD.encode())
+    return Fernet(base64.urlsafe_b64encode(key))
+
+def load_session():
+    """The saved storage_state, or None if there is none or it cannot be decrypted."""
+    if not os.path.exists(SESSION_PATH):
+        return None
+    try:
+        with open(SESSION_PATH, "rb") as f:
+            blob = f.read()
+        fernet = _fernet(blob[:SALT_BYTES])
+        if not fernet:
+            return None
+        return json.loads(fernet.decrypt(blob[SALT_BYTES:]))
+    except Exception as e:
+        print(f"   ⚠️ [Publisher] Ignoring saved session: {e}")
+        return None
+
+async def save_session(context):
+    salt = os.urandom(SALT_BYTES)
+    fernet = _fernet(salt)
+    if not fernet:
+        return
+    token = fernet.encrypt(json.dumps(await context.storage_state()).encode())
+    tmp = f"{SESSION_PATH}.tmp"
+    with open(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as f:
+        f.write(salt + token)
+    os.replace(tmp, SESSION_PATH)
+
+class StepTimer:
+    """Wall time of each publish step, printed as one line at the end."""
+
+    def __init__(self):
+        self.steps = []
+
+    @contextmanager
+    def step(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append((name, time.perf_counter() - started))
+
+    def summary(self):
+        total = sum(s for _, s in self.steps)
+        return " | ".join(f"{name} {s:.1f}s" for name, s in self.steps) + f" | total {total:.1f}s"
+
+async def open_editor(page):
+    """Goes to the editor. Returns False if Substack bounced us to sign-in (session expired)."""
+    await page.goto(SUBSTACK_URL, wait_until="domcontentloaded")
+    try:
+        await page.get_by_placeholder("Enter title").wait_for(timeout=SESSION_CHECK_TIMEOUT)
+        return True
+    except Exception:
+        return False
+
+async def post_to_substack(title: str, content_html: str, pool=None):
+    """
+    Uses Playwright to create a new Substack draft, reusing the saved session
+    and logging in only when it has expired. `pool` is a shared BrowserPool;
+    standalone runs get their own browser.
     """
     print(f"🚀 [Publisher] Starting automated draft for: {title}")
-    
-    async with async_playwright() as p:
-        # Launch browser (Headless=False useful for debugging login)
-        browser = await p.chromium.launch(headless=True) 
-        context = await browser.new_context()
-        page = await context.new_page()
+    timer = StepTimer()
+    launched = time.perf_counter()
 
+    async with pool_or_new(pool) as pool, pool.page(storage_state=load_session()) as page:
+        timer.steps.append(("launch", time.perf_counter() - launched))
         try:
-            # 1. Login Flow
-            print("🔑 Logging in to Substack...")
-            await page.goto("https://substack.com/sign-in")
-            
-            # Substack login can be tricky. We target the specific "Sign in with password" flow
-            await page.fill('input[name="email"]', SUBSTACK_EMAIL)
-            
-            # Sometimes there is a "Sign in with password" text link to click
-            # We assume the user has enabled password login
-            try:
-                await page.click("text=Sign in with password", timeout=3000)
-            except:
-                pass # The password field might just appear
-
-            await page.fill('input[name="password"]', SUBSTACK_PASSWORD)
-            await page.click('button[type="submit"]')
-            
-            # Wait for login to complete (look for the user avatar or dashboard)
-            await page.wait_for_url("**/home**", timeout=30000)
-            print("✅ Login Successful.")
+            # 1. Session check: the editor loads directly when the saved session is still valid
+            with timer.step("session"):
+                ready = await open_editor(page)
+            if ready:
+                print("✅ Reused saved Substack session.")
+            else:
+                with timer.step("login"):
+                    await login(page)
+                    await save_session(page.context)
+
+                # 2. Go to Publisher Dashboard
+                with timer.step("editor"):
+                    if not await open_editor(page):
+                        raise RuntimeError("Editor did not load after login")
 
-            # 2. Go to Publisher Dashboard
             print("📝 Creating New Post...")
-            await page.goto(SUBSTACK_URL)
-            await asyncio.sleep(3) # Let the editor load
-
-            # 3. Fill Title
-            # Substack editor selectors are dynamic, but usually have aria-labels or placeholders
-            await page.get_by_placeholder("Enter title").fill(title)
-            await page.get_by_placeholder("Enter subtitle").fill("Weekly Intelligence Digest | Vancouver Transparency Agent")
-
-            # 4. Fill Content
-            # The editor is a "contenteditable" div. We can type or paste.
-            # For HTML content, we need to be clever. 
-            # Simple text insertion:
-            editor = page.locator('.zk-editor') # This class name changes often.
-            if await editor.count() == 0:
-                # Fallback to role
-                editor = page.get_by_role("textbox").nth(2) # Title, Subtitle, Body
-            
-            await editor.click()
-            
-            # We simulate "typing" the content or using clipboard paste
-            # For this simple version, we strip HTML tags for safety or use simplified text
-            clean_text = content_html.replace("<br>", "\n").replace("<div>", "").replace("</div>", "")
-            await page.keyboard.insert_text(clean_text)
-
-            # 5. Save and Exit
-            print("💾 Saving Draft...")
-            await asyncio.sleep(5) # Auto-save triggers
-            
-            # Optionally click "Settings" or verify "Saved" status
-            # await page.click('[data-testid="post-settings-button"]')
+            with timer.step("content"):
+                saved = await fill_draft(page, title, content_html)
+            # 5. Save: the paste triggers the editor's autosave; wait for that request instead of sleeping
+            with timer.step("save"):
+                print("💾 Saving Draft...")
+                await saved
             
             print(f"✅ Draft '{title}' saved to Substack!")
             
@@ -83,7 +192,67 @@ async def post_to_substack(title: str, content_html: str):
             await page.screenshot(path="debug_publisher_error.png")
             
         finally:
-            await browser.close()
+            print(f"⏱️  [Publisher] {timer.summary()}")
+
+async def login(page):
+    print("🔑 Logging in to Substack...")
+    await page.goto("https://substack.com/sign-in")
+    
+    # Substack login can be tricky. We target the specific "Sign in with password" flow
+    await page.fill('input[name="email"]', SUBSTACK_EMAIL)
+    
+    # Sometimes there is a "Sign in with password" text link to click
+    # We assume the user has enabled password login
+    try:
+        await page.click("text=Sign in with password", timeout=3000)
+    except:
+        pass # The password field might just appear
+
+    await page.fill('input[name="password"]', SUBSTACK_PASSWORD)
+    await page.click('button[type="submit"]')
+    
+    # Wait for login to complete (look for the user avatar or dashboard)
+    await page.wait_for_url("**/home**", timeout=30000)
+    print("✅ Login Successful.")
+
+async def fill_draft(page, title: str, content_html: str):
+    """Fills title, subtitle and body. Returns an awaitable for the body's autosave response."""
+    # 3. Fill Title
+    # Substack editor selectors are dynamic, but usually have aria-labels or placeholders
+    await page.get_by_placeholder("Enter title").fill(title)
+    await page.get_by_placeholder("Enter subtitle").fill("Weekly Intelligence Digest | Vancouver Transparency Agent")
+
+    # 4. Fill Content
+    # The editor is a "contenteditable" div. We can type or paste.
+    # For HTML content, we need to be clever. 
+    # Simple text insertion:
+    editor = page.locator('.zk-editor') # This class name changes often.
+    if await editor.count() == 0:
+        # Fallback to role
+        editor = page.get_by_role("textbox").nth(2) # Title, Subtitle, Body
+    
+    await editor.click()
+    
+    # Paste the rendered HTML in one operation so headings and lists survive
+    plain_text, runs = await page.evaluate(PLAIN_TEXT_JS, content_html)
+    # Start listening before the paste so the save request cannot slip past
+    marker = _body_marker(runs)
+    saved = asyncio.ensure_future(page.wait_for_event(
+        "response", predicate=lambda r: _is_draft_save(r, marker), timeout=AUTOSAVE_TIMEOUT))
+    later_saves = []
+    on_save = lambda r: _is_draft_save(r) and later_saves.append(r)
+    page.on("response", on_save)
+    try:
+        pasted_chars = await page.evaluate(PASTE_HTML_JS, [content_html, plain_text])
+        if pasted_chars <= 0:
+            # The editor ignored the synthetic paste; fall back to inserting the text
+            print("   ⚠️ [Publisher] Paste rejected, inserting plain text instead.")
+            await page.keyboard.insert_text(plain_text)
+    except BaseException:
+        _discard(saved)
+        page.remove_listener("response", on_save)
+        raise
+    return _body_saved(page, saved, on_save, later_saves)
 
 if __name__ == "__main__":
     # Test Run
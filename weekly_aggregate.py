@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+from outbox import increment
+from dashboard_views import topic_key
+
+# Weekly Aggregate
+# One rolling document per digest week in `weekly_aggregates`, updated by every
+# cycle as it writes signals (through the outbox, like the dashboard views).
+# The Friday digest reads this single document instead of scanning the week's
+# signals:
+#
+#   total, by_industry, by_board, score_hist    counters
+#   top_industry.<key>, top_board.<key>         best TOP_N signals, with excerpts
+#   summaries.<industry>                        running paragraph per industry
+#
+# A digest week closes when the Friday job runs (DIGEST_WEEKDAY at DIGEST_HOUR)
+# and is identified by that Friday's date.
+#
+# The counters are Increments, so each signal's update is journaled under a
+# key derived from the signal ID: the outbox ignores a second append of it and
+# applies it to Firestore exactly once, however often the journal is replayed.
+
+AGGREGATE_COLLECTION = "weekly_aggregates"
+DIGEST_WEEKDAY = 4 # Friday, matching scheduler.py
+DIGEST_HOUR = 9
+TOP_N = 5
+EXCERPT_CHARS = 400
+
+
+def week_bounds(when: datetime):
+    """(start, end) of the digest week containing `when`; `end` is the closing Friday 09:00."""
+    end = (when + timedelta(days=(DIGEST_WEEKDAY - when.weekday()) % 7)).replace(
+        hour=DIGEST_HOUR, minute=0, second=0, microsecond=0)
+    if end <= when:
+        end += timedelta(days=7)
+    return end - timedelta(days=7), end
+
+
+def digest_week_id(when: datetime):
+    return week_bounds(when)[1].strftime("%Y-%m-%d")
+
+
+def last_closed_week_id(now=None):
+    """The week the Friday job should publish: the one that closed most recently."""
+    return week_bounds(now or datetime.now())[0].strftime("%Y-%m-%d")
+
+
+def _top_entry(signal_id: str, signal: dict, board_name):
+    return {
+        "signal_id": signal_id,
+        "score": signal.get("score", 0),
+        "industry": signal.get("industry"),
+        "board_name": board_name,
+        "related_meeting_id": signal.get("related_meeting_id"),
+        "excerpt": signal.get("analysis", "")[:EXCERPT_CHARS],
+        "timestamp": signal.get("timestamp"),
+    }
+
+
+def _push_top(entries: list, entry: dict):
+    entries = [e for e in entries if e.get("signal_id") != entry["signal_id"]] + [entry]
+    entries.sort(key=lambda e: e.get("score", 0), reverse=True)
+    return entries[:TOP_N]
+
+
+class WeeklyAggregate:
+    """Queues incremental updates to the weekly aggregate alongside the cycle's own writes."""
+
+    def __init__(self, db, outbox):
+        self.db = db
+        self.outbox = outbox
+        self._weeks = {}  # week_id -> aggregate doc, read once per cycle
+        self._touched = {}  # week_id -> industry keys whose summary is stale
+
+    def _week(self, week_id: str):
+        if week_id not in self._weeks:
+            snap = self.db.collection(AGGREGATE_COLLECTION).document(week_id).get()
+            self._weeks[week_id] = (snap.to_dict() or {}) if snap.exists else {}
+        return self._weeks[week_id]
+
+    def prefetch_signal(self, signal: dict):
+        """Loads what `record_signal` reads, so it can run inside an outbox transaction without I/O."""
+        self._week(digest_week_id(signal.get("timestamp") or datetime.now()))
+
+    def record_signal(self, signal_id: str, signal: dict, board_name: str = None):
+        when = signal.get("timestamp") or datetime.now()
+        week_id = digest_week_id(when)
+        doc = self._week(week_id)
+        start, end = week_bounds(when)
+
+        industry = str(signal.get("industry") or "General")
+        board = str(board_name or "Unknown Board")
+        ind_key, board_key = topic_key(industry), topic_key(board)
+        entry = _top_entry(signal_id, signal, board_name)
+        top_industry = doc.setdefault("top_industry", {})
+        top_board = doc.setdefault("top_board", {})
+        top_industry[ind_key] = _push_top(top_industry.get(ind_key, []), entry)
+        top_board[board_key] = _push_top(top_board.get(board_key, []), entry)
+        doc.setdefault("industry_labels", {})[ind_key] = industry
+
+        self.outbox.set(AGGREGATE_COLLECTION, week_id, {
+            "week_id": week_id,
+            "week_start": start,
+            "week_end": end,
+            "total": increment(1),
+            "by_industry": {ind_key: increment(1)},
+            "by_board": {board_key: increment(1)},
+            "score_hist": {str(signal.get("score", 0)): increment(1)},
+            "industry_labels": {ind_key: industry},
+            "board_labels": {board_key: board},
+            "top_industry": {ind_key: top_industry[ind_key]},
+            "top_board": {board_key: top_board[board_key]},
+            "updated_at": datetime.now(),
+        }, merge=True, key=f"weekly__{week_id}__{signal_id}")
+        self._touched.setdefault(week_id, set()).add(ind_key)
+
+    def refresh_summaries(self, summarize):
+        """
+        Re-summarizes each industry this cycle touched.
+        `summarize(industry, previous_paragraph, top_entries)` returns the new paragraph.
+        """
+        for week_id, keys in self._touched.items():
+            doc = self._weeks[week_id]
+            summaries = doc.setdefault("summaries", {})
+            for key in sorted(keys):
+                label = (doc.get("industry_labels") or {}).get(key, key)
+                try:
+                    paragraph = summarize(label, summaries.get(key), doc["top_industry"][key])
+                except Exception as e:
+                    print(f"   ⚠️ [Weekly] Summary for {label} failed: {e}")
+                    continue
+                summaries[key] = paragraph
+                self.outbox.set(AGGREGATE_COLLECTION, week_id, {
+                    "summaries": {key: paragraph},
+                    "updated_at": datetime.now(),
+                }, merge=True)
+        self._touched.clear()